@@ -0,0 +1,148 @@
+import heapq
+import itertools
+import threading
+import time
+
+from metrics import REGISTRY
+
+LLM_ACTIVE = REGISTRY.gauge('road_safety_llm_active', 'LLM calls currently running')
+LLM_QUEUED = REGISTRY.gauge('road_safety_llm_queued', 'LLM calls waiting for a slot')
+ADMISSIONS = REGISTRY.counter('road_safety_llm_admissions_total', 'LLM admission decisions', labels=('outcome',))
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request can't get an LLM slot in time; `reason` says why"""
+
+    def __init__(self, reason, message):
+        super().__init__(message)
+        self.reason = reason
+
+
+class _Waiter:
+    def __init__(self, priority, seq):
+        self.priority = priority
+        self.seq = seq
+
+    def __lt__(self, other):
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+class AdmissionController:
+    """Bounded concurrency pool with a priority FIFO queue in front of it.
+
+    At most `max_concurrency` calls run at once. Others wait in priority order
+    (lower number first, FIFO within a priority), up to `max_queue_depth`
+    waiters. A waiter that can't start within its deadline is rejected. When
+    the expected wait (the requests ahead times the average service time)
+    already exceeds the deadline, the request is rejected up front.
+    """
+
+    def __init__(self, max_concurrency=1, max_queue_depth=16, queue_timeout=60.0):
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_queue_depth = max_queue_depth
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self._queue = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        # Exponentially weighted average of slot hold time, for wait estimates
+        self.avg_service_s = None
+
+    def _position(self, waiter):
+        return sum(1 for other in self._queue if other < waiter) + 1
+
+    def _update_gauges(self):
+        LLM_ACTIVE.set(self.active)
+        LLM_QUEUED.set(len(self._queue))
+
+    def _reject(self, reason, message):
+        ADMISSIONS.inc(outcome=f"rejected_{reason}")
+        raise AdmissionRejected(reason, message)
+
+    def acquire(self, priority=0, timeout=None, on_position=None):
+        """Wait for a slot; use as `with controller.acquire(...) as waited_s:`"""
+        return _Slot(self, priority, self.queue_timeout if timeout is None else timeout, on_position)
+
+    def _enter(self, priority, timeout, on_position):
+        start = time.perf_counter()
+        deadline = start + timeout
+        with self._cond:
+            if self.active < self.max_concurrency and not self._queue:
+                self.active += 1
+                self._update_gauges()
+                ADMISSIONS.inc(outcome='admitted')
+                return 0.0
+            if len(self._queue) >= self.max_queue_depth:
+                self._reject('queue_full', f"LLM queue is full ({self.max_queue_depth} waiting)")
+            ahead = len(self._queue) + self.active - self.max_concurrency + 1
+            if self.avg_service_s and ahead * self.avg_service_s / self.max_concurrency > timeout:
+                self._reject('deadline', f"Expected wait exceeds {timeout:.0f}s")
+
+            waiter = _Waiter(priority, next(self._seq))
+            heapq.heappush(self._queue, waiter)
+            self._update_gauges()
+            # A higher-priority arrival moves others back; let them report it
+            self._cond.notify_all()
+            last_position = None
+            admitted = False
+            try:
+                while not (self._queue[0] is waiter and self.active < self.max_concurrency):
+                    position = self._position(waiter)
+                    if on_position and position != last_position:
+                        last_position = position
+                        on_position(position)
+                    remaining = deadline - time.perf_counter()
+                    if remaining <= 0:
+                        self._reject('deadline', f"Waited {timeout:.0f}s for an LLM slot")
+                    self._cond.wait(min(remaining, 0.5))
+                heapq.heappop(self._queue)
+                self.active += 1
+                admitted = True
+                ADMISSIONS.inc(outcome='admitted')
+            finally:
+                if not admitted:
+                    # Rejected, or the caller went away (e.g. on_position raised a UI rerun
+                    # or KeyboardInterrupt); a waiter left behind would block the queue head
+                    self._queue.remove(waiter)
+                    heapq.heapify(self._queue)
+                self._update_gauges()
+                # Whoever is now at the head may be able to start
+                self._cond.notify_all()
+        return time.perf_counter() - start
+
+    def _exit(self, held_s):
+        with self._cond:
+            self.active -= 1
+            if self.avg_service_s is None:
+                self.avg_service_s = held_s
+            else:
+                self.avg_service_s = 0.8 * self.avg_service_s + 0.2 * held_s
+            self._update_gauges()
+            self._cond.notify_all()
+
+    def stats(self):
+        with self._cond:
+            return {
+                'active': self.active,
+                'queued': len(self._queue),
+                'max_concurrency': self.max_concurrency,
+                'max_queue_depth': self.max_queue_depth,
+                'avg_service_s': self.avg_service_s
+            }
+
+
+class _Slot:
+    def __init__(self, controller, priority, timeout, on_position):
+        self.controller = controller
+        self.priority = priority
+        self.timeout = timeout
+        self.on_position = on_position
+        self.acquired_at = None
+
+    def __enter__(self):
+        waited_s = self.controller._enter(self.priority, self.timeout, self.on_position)
+        self.acquired_at = time.perf_counter()
+        return waited_s
+
+    def __exit__(self, *exc):
+        self.controller._exit(time.perf_counter() - self.acquired_at)
@@ -0,0 +1,233 @@
+import contextlib
+import copy
+import json
+import os
+import threading
+import time
+from collections import Counter, defaultdict
+
+from collection_manager import DEFAULT_COLLECTION
+
+try:
+    import fcntl
+except ImportError:  # Windows: saves from one process at a time are still merged, just not locked
+    fcntl = None
+
+# The quick-example chips in the web interface; always worth precomputing
+QUICK_EXAMPLES = [
+    "How to fix a damaged STOP sign?",
+    "What are speed hump requirements?",
+    "Missing road markings on highway"
+]
+
+
+@contextlib.contextmanager
+def _file_lock(path):
+    """Hold an exclusive lock on `path`.lock across processes"""
+    if fcntl is None:
+        yield
+        return
+    with open(path + '.lock', 'a') as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+class AnswerStore:
+    """Recommendations computed ahead of time for frequent queries.
+
+    Entries are keyed by collection, normalized query and request options.
+    Each records the index generation and model it was computed against, and
+    `get` only returns an entry whose generation and model still match, so
+    a stale answer is never served. The store is a JSON file
+    (PRECOMPUTED_ANSWERS_PATH), so the offline warm-up job and the app share
+    it; the app picks up a rewritten file on its next lookup. Both reloads
+    and saves merge with the file instead of replacing it, so entries written
+    by another process survive. For a key changed on both sides, the newer
+    `computed_at` wins.
+    """
+
+    def __init__(self, path=None):
+        self.path = path if path is not None else os.getenv('PRECOMPUTED_ANSWERS_PATH', './precomputed_answers.json')
+        self._entries = {}
+        # Unsaved local changes: keys put, and popped key -> computed_at of the popped entry
+        self._dirty = set()
+        self._removed = {}
+        self._mtime = None
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self._reload_if_changed()
+
+    @staticmethod
+    def key(collection, query_key, top_k, fast_path, llm_followup):
+        return json.dumps([collection or DEFAULT_COLLECTION, query_key, top_k, bool(fast_path), bool(llm_followup)])
+
+    def _reload_if_changed(self):
+        if not self.path:
+            return
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except OSError:
+            return
+        if mtime == self._mtime:
+            return
+        stored = self._read()
+        if stored is None:
+            return
+        with self._lock:
+            self._merge(stored)
+            self._mtime = mtime
+
+    def _read(self):
+        """The entries in the file, {} if there is none yet, or None if it can't be read"""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Could not read precomputed answers from {self.path}: {str(e)}")
+            return None
+
+    def _merge(self, stored):
+        """Take the file's entries, keeping unsaved local changes unless the file's entry is newer; needs _lock"""
+        merged = dict(stored)
+        for key in self._dirty:
+            entry = self._entries.get(key)
+            other = merged.get(key)
+            if entry is not None and (other is None or other.get('computed_at', '') <= entry['computed_at']):
+                merged[key] = entry
+        for key, computed_at in self._removed.items():
+            if key in merged and merged[key].get('computed_at', '') <= computed_at:
+                del merged[key]
+        self._entries = merged
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._entries
+
+    def get(self, key, generation, model):
+        """The stored result for `key` if it was computed against `generation` with `model`, else None"""
+        self._reload_if_changed()
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None or entry['generation'] != generation or entry['model'] != model:
+            return None
+        return copy.deepcopy(entry['result'])
+
+    def put(self, key, query, result, generation, model, collection=None, top_k=3, fast_path=False,
+            llm_followup=False):
+        entry = {
+            'query': query,
+            'collection': collection or DEFAULT_COLLECTION,
+            'top_k': top_k,
+            'fast_path': bool(fast_path),
+            'llm_followup': bool(llm_followup),
+            'generation': generation,
+            'model': model,
+            'computed_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            # Round-trip through JSON now so what is served matches what is saved
+            'result': json.loads(json.dumps(result, default=str))
+        }
+        with self._lock:
+            self._entries[key] = entry
+            self._dirty.add(key)
+            self._removed.pop(key, None)
+
+    def pop(self, key):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            self._dirty.discard(key)
+            if entry is not None:
+                self._removed[key] = entry.get('computed_at', '')
+            return entry
+
+    def entries(self, collection=None):
+        """[(key, entry)] for one collection, or all of them"""
+        with self._lock:
+            items = list(self._entries.items())
+        if collection is None:
+            return items
+        return [(key, entry) for key, entry in items if entry['collection'] == collection]
+
+    def stale(self, collection, generation):
+        """Entries of `collection` computed against another index generation"""
+        return [(key, entry) for key, entry in self.entries(collection) if entry['generation'] != generation]
+
+    def save(self):
+        """Merge local changes into the file; other writers' entries are kept"""
+        if not self.path:
+            return
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Re-read, merge and write under one lock, so a concurrent save can't drop what this one adds
+        with self._save_lock, _file_lock(self.path):
+            stored = self._read()
+            with self._lock:
+                if stored is not None:
+                    self._merge(stored)
+                entries = dict(self._entries)
+                removed = dict(self._removed)
+            # Write to a temp file first so the app never reads a half-written store
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(entries, f, indent=2, default=str)
+            os.replace(tmp_path, self.path)
+            with self._lock:
+                self._mtime = os.stat(self.path).st_mtime_ns
+                # Changes made while writing stay pending for the next save
+                self._dirty = {key for key in self._dirty if self._entries.get(key) is not entries.get(key)}
+                for key, computed_at in removed.items():
+                    if self._removed.get(key) == computed_at:
+                        del self._removed[key]
+
+
+class QueryLog:
+    """Append-only JSON-lines log of asked queries (QUERY_LOG_PATH; unset disables it)"""
+
+    def __init__(self, path=None):
+        self.path = path if path is not None else os.getenv('QUERY_LOG_PATH') or None
+        self._lock = threading.Lock()
+
+    def record(self, query, collection=None, top_k=3):
+        if not self.path:
+            return
+        line = json.dumps({'ts': time.time(), 'query': query, 'collection': collection or DEFAULT_COLLECTION,
+                           'top_k': top_k})
+        try:
+            with self._lock, open(self.path, 'a', encoding='utf-8') as f:
+                f.write(line + '\n')
+        except OSError as e:
+            print(f"⚠️ Could not write query log {self.path}: {str(e)}")
+
+    def top_queries(self, key_fn, limit=100, collection=None):
+        """The `limit` most asked queries as [(query, count)], grouping spellings with the same `key_fn(query)`.
+
+        Each group is represented by its most common spelling.
+        """
+        if not self.path or not os.path.exists(self.path):
+            return []
+        counts = Counter()
+        spellings = defaultdict(Counter)
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if collection is not None and record.get('collection', DEFAULT_COLLECTION) != collection:
+                    continue
+                query = (record.get('query') or '').strip()
+                if not query:
+                    continue
+                key = key_fn(query)
+                counts[key] += 1
+                spellings[key][query] += 1
+        return [(spellings[key].most_common(1)[0][0], count) for key, count in counts.most_common(limit)]
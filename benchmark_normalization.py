@@ -0,0 +1,106 @@
+"""Encode throughput and store size before and after record normalization.
+
+"Before" embeds the legacy composite text (name, category and problem
+followed by the full `content`, which repeats them) and stores records as
+loaded. "After" embeds the minimal composite text and stores normalized
+records with derivable fields dropped.
+
+    python benchmark_normalization.py
+    python benchmark_normalization.py --replicate 20 --repeat 5
+"""
+import argparse
+import json
+import pickle
+import sys
+import time
+
+import numpy as np
+
+from embedding_pipeline import RoadSafetyEmbeddingPipeline
+from record_normalizer import expand_record, normalize_records
+
+# Fix Windows encoding
+if sys.platform == 'win32':
+    sys.stdout.reconfigure(encoding='utf-8')
+
+
+def legacy_composite_text(intervention):
+    """The pre-normalization composite text: identifiers, then content, then code and clause again"""
+    name = intervention.get('type', '') or intervention.get('name', '')
+    problem = intervention.get('problem', '')
+    problem = ', '.join(problem) if isinstance(problem, list) else problem
+    parts = [p for p in (name, intervention.get('category', ''), problem) if p]
+    parts.append(intervention.get('content', '') or intervention.get('data', '') or intervention.get('description', ''))
+    if intervention.get('code'):
+        parts.append(f"Code {intervention['code']}")
+    if intervention.get('clause'):
+        parts.append(f"Clause {intervention['clause']}")
+    return " ".join(parts)
+
+
+def measure_encode(pipeline, texts, repeat):
+    # Warm up so model load time isn't counted
+    pipeline.encode_texts(texts[:8])
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        pipeline.encode_texts(texts)
+        runs.append(time.perf_counter() - start)
+    best = min(runs)
+    return {
+        'texts': len(texts),
+        'chars_mean': round(float(np.mean([len(t) for t in texts])), 1),
+        'words_mean': round(float(np.mean([len(t.split()) for t in texts])), 1),
+        'encode_s': round(best, 4),
+        'texts_per_s': round(len(texts) / best, 1) if best else None
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--data', default='interventions.json')
+    parser.add_argument('--replicate', type=int, default=10, help="Copies of the dataset to encode per run")
+    parser.add_argument('--repeat', type=int, default=3, help="Timed runs per variant; the fastest is kept")
+    parser.add_argument('--output', default='benchmark_normalization.json')
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("Record Normalization Benchmark")
+    print("=" * 60)
+
+    with open(args.data, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    normalized = normalize_records(data)
+    lossless = all(expand_record(n) == r for n, r in zip(normalized, data))
+    print(f"Records: {len(data)}   round-trip lossless: {lossless}")
+
+    pipeline = RoadSafetyEmbeddingPipeline(vector_db_path=None)
+    corpus = data * args.replicate
+    results = {}
+    for label, records, make_text in (('before', data, legacy_composite_text),
+                                      ('after', normalized, pipeline._create_composite_text)):
+        encode = measure_encode(pipeline, [make_text(r) for r in corpus], args.repeat)
+        store_bytes = len(pickle.dumps(records))
+        results[label] = {**encode, 'store_bytes': store_bytes}
+        print(f"   {label:<6} {encode['words_mean']:>6} words/text   {encode['texts_per_s']:>9} texts/s   "
+              f"store {store_bytes / 1024:>8.1f} KiB")
+
+    before, after = results['before'], results['after']
+    speedup = after['texts_per_s'] / before['texts_per_s'] if before['texts_per_s'] else None
+    shrink = 1 - after['store_bytes'] / before['store_bytes']
+    print(f"\nEncode throughput: {speedup:.2f}x   record store: {shrink:.1%} smaller")
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump({
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'config': vars(args),
+            'lossless': lossless,
+            'results': results,
+            'encode_speedup': round(speedup, 3) if speedup else None,
+            'store_reduction': round(shrink, 4)
+        }, f, indent=2)
+    print(f"Results written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
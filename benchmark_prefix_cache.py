@@ -0,0 +1,121 @@
+"""TTFT benchmark: legacy single prompt vs stable system prompt over the chat API.
+
+The legacy layout puts the user query near the top of one big prompt, so no
+two requests share more than the first sentence. The chat layout sends the
+fixed SYSTEM_PROMPT first, so its KV cache can be reused across requests.
+
+Runs against the stub server with prefix caching simulated (default) or a
+real Ollama instance via --host:
+
+    python benchmark_prefix_cache.py
+    python benchmark_prefix_cache.py --host http://localhost:11434 --model llama3.2:3b
+"""
+import argparse
+import json
+import sys
+import time
+
+import numpy as np
+
+from benchmark_retrieval import DEFAULT_QUERIES
+from embedding_pipeline import RoadSafetyEmbeddingPipeline
+from ollama_integration import SYSTEM_PROMPT, RoadSafetyRAG
+from stub_ollama import StubOllamaConfig, StubOllamaServer
+
+# Fix Windows encoding
+if sys.platform == 'win32':
+    sys.stdout.reconfigure(encoding='utf-8')
+
+
+def legacy_prompt(user_query, context):
+    """The pre-chat prompt layout: intro, query, context, then the instructions"""
+    intro, instructions = SYSTEM_PROMPT.split('\n\n', 1)
+    return f'{intro}\n\nUser Query: "{user_query}"\n\n{context}\n\n{instructions}'
+
+
+def measure(rag, queries, mode, top_k):
+    ttfts = []
+    prompt_tokens = []
+    for query in queries:
+        retrieved = rag.pipeline.search_interventions(query, top_k=top_k)
+        context, _ = rag.context_builder.build(retrieved['interventions'])
+        stats = {}
+        if mode == 'legacy':
+            rag.query_ollama(legacy_prompt(query, context), stats=stats)
+        else:
+            rag.chat_ollama(rag.build_messages(query, context), stats=stats)
+        ttfts.append(stats.get('ttft_s', 0.0))
+        if stats.get('prompt_tokens'):
+            prompt_tokens.append(stats['prompt_tokens'])
+    ms = np.array(ttfts) * 1000.0
+    return {
+        'mode': mode,
+        'requests': len(queries),
+        'ttft_p50_ms': round(float(np.percentile(ms, 50)), 2),
+        'ttft_p95_ms': round(float(np.percentile(ms, 95)), 2),
+        'ttft_mean_ms': round(float(ms.mean()), 2),
+        'prompt_tokens_mean': round(float(np.mean(prompt_tokens)), 1) if prompt_tokens else None
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--data', default='interventions.json')
+    parser.add_argument('--host', help="Real Ollama host; omit to use the stub server")
+    parser.add_argument('--model', default=None)
+    parser.add_argument('--rounds', type=int, default=3, help="Passes over the query set per mode")
+    parser.add_argument('--top-k', type=int, default=3)
+    parser.add_argument('--prefill-rate', type=float, default=200.0, help="Stub prompt tokens per second")
+    parser.add_argument('--output', default='benchmark_prefix_cache.json')
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("Prompt Prefix Cache Benchmark")
+    print("=" * 60)
+
+    with open(args.data, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+
+    server = None
+    if not args.host:
+        config = StubOllamaConfig(token_rate=0, latency=0.01, prefill_rate=args.prefill_rate,
+                                  response_tokens=8, prefix_cache=True)
+        server = StubOllamaServer(config=config).start()
+
+    try:
+        rag = RoadSafetyRAG(pipeline=RoadSafetyEmbeddingPipeline(vector_db_path=None))
+        rag.pipeline.add_interventions_to_db(data)
+        rag.ollama_host = args.host or server.url
+        if args.model:
+            rag.ollama_model = args.model
+        print(f"Target: {rag.ollama_host} ({'real Ollama' if args.host else 'stub, prefix cache simulated'})")
+
+        queries = DEFAULT_QUERIES * args.rounds
+        results = []
+        for mode in ('legacy', 'chat'):
+            # Warm up so model load time isn't counted as TTFT
+            measure(rag, queries[:1], mode, args.top_k)
+            results.append(measure(rag, queries, mode, args.top_k))
+            r = results[-1]
+            print(f"   {mode:<7} TTFT p50 {r['ttft_p50_ms']:>9} ms   p95 {r['ttft_p95_ms']:>9} ms   "
+                  f"prompt ~{r['prompt_tokens_mean']} tokens")
+    finally:
+        if server:
+            server.stop()
+
+    legacy, chat = results
+    reduction = 1 - chat['ttft_p50_ms'] / legacy['ttft_p50_ms'] if legacy['ttft_p50_ms'] else 0.0
+    print(f"\nTTFT p50 reduction with stable system prompt: {reduction:.1%}")
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump({
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'config': vars(args),
+            'results': results,
+            'ttft_p50_reduction': round(reduction, 4)
+        }, f, indent=2)
+    print(f"Results written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
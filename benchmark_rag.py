@@ -0,0 +1,190 @@
+"""End-to-end RAG latency benchmark against a local stub Ollama server.
+
+Runs RoadSafetyRAG.get_recommendations over interventions.json at several
+concurrency levels and reports per-stage timings (encode, search, context
+build, prompt build, admission queue wait, TTFT, generation) plus prompt size
+and throughput. Pass --baseline to compare against a stored run and fail on
+regressions.
+No GPU, model download for the LLM, or network access is needed.
+`--backend mock` skips HTTP entirely and uses the in-process MockBackend.
+
+    python benchmark_rag.py --concurrency 1,4,8 --token-rate 30 --output rag.json
+    python benchmark_rag.py --baseline rag_baseline.json --tolerance 0.2
+"""
+import argparse
+import json
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from benchmark_retrieval import DEFAULT_QUERIES, flatten
+from embedding_pipeline import RoadSafetyEmbeddingPipeline
+from llm_backends import MockBackend
+from ollama_integration import RoadSafetyRAG
+from stub_ollama import StubOllamaConfig, StubOllamaServer
+
+# Fix Windows encoding
+if sys.platform == 'win32':
+    sys.stdout.reconfigure(encoding='utf-8')
+
+STAGES = ['encode_s', 'similarity_s', 'topk_s', 'search_s', 'context_build_s', 'prompt_build_s', 'queue_s', 'ttft_s', 'generation_s', 'llm_s', 'enrich_s', 'total_s']
+
+
+# Metrics where a larger value is better; timings are "lower is better"
+HIGHER_IS_BETTER = ('throughput_rps',)
+# Timing regressions smaller than this in absolute terms are ignored
+MIN_REGRESSION_MS = 5.0
+
+
+def summarize(values):
+    if not values:
+        return None
+    ms = np.array(values) * 1000.0
+    return {
+        'p50_ms': round(float(np.percentile(ms, 50)), 3),
+        'p95_ms': round(float(np.percentile(ms, 95)), 3),
+        'p99_ms': round(float(np.percentile(ms, 99)), 3),
+        'mean_ms': round(float(ms.mean()), 3)
+    }
+
+
+def run_level(rag, queries, concurrency, requests, top_k):
+    jobs = [queries[i % len(queries)] for i in range(requests)]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(lambda q: rag.get_recommendations(q, top_k=top_k), jobs))
+    wall_s = time.perf_counter() - start
+
+    # A coalesced result carries its leader's timings; count it, but don't sample them twice
+    coalesced = sum(1 for r in results if r.get('coalesced'))
+    measured = [r for r in results if not r.get('coalesced')]
+    stages = {}
+    for stage in STAGES:
+        stages[stage] = summarize([r['timings'][stage] for r in measured if stage in r.get('timings', {})])
+    prompt_chars = [r['usage']['prompt_chars'] for r in results if 'usage' in r]
+    prompt_tokens = [r['usage']['prompt_tokens'] for r in results if r.get('usage', {}).get('prompt_tokens')]
+    return {
+        'concurrency': concurrency,
+        'requests': requests,
+        'wall_s': round(wall_s, 3),
+        'throughput_rps': round(requests / wall_s, 3),
+        'coalesced': coalesced,
+        'stages': stages,
+        'prompt_chars_mean': round(float(np.mean(prompt_chars)), 1) if prompt_chars else None,
+        'prompt_tokens_mean': round(float(np.mean(prompt_tokens)), 1) if prompt_tokens else None
+    }
+
+
+def compare_to_baseline(results, baseline, tolerance):
+    """Return a list of human-readable regressions beyond the given tolerance"""
+    regressions = []
+    current = {r['concurrency']: r for r in results['levels']}
+    for previous in baseline.get('levels', []):
+        run = current.get(previous['concurrency'])
+        if run is None:
+            continue
+        old_metrics = flatten('', previous, {})
+        new_metrics = flatten('', run, {})
+        for key, old in old_metrics.items():
+            new = new_metrics.get(key)
+            if new is None or not old:
+                continue
+            if key.endswith(HIGHER_IS_BETTER):
+                change = (old - new) / old
+            elif key.endswith('_ms') and '.p99_ms' not in key:
+                # p99 over a handful of requests is a single sample, and sub-millisecond
+                # stages jitter by multiples, so neither is worth failing a build over
+                if new - old < MIN_REGRESSION_MS:
+                    continue
+                change = (new - old) / old
+            else:
+                continue
+            if change > tolerance:
+                regressions.append(f"concurrency {previous['concurrency']} {key}: {old} -> {new} ({change:+.1%} worse)")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--data', default='interventions.json')
+    parser.add_argument('--concurrency', default='1,2,4,8')
+    parser.add_argument('--requests', type=int, default=16, help="Requests per concurrency level")
+    parser.add_argument('--top-k', type=int, default=3)
+    parser.add_argument('--token-rate', type=float, default=50.0)
+    parser.add_argument('--latency', type=float, default=0.05)
+    parser.add_argument('--prefill-rate', type=float, default=500.0)
+    parser.add_argument('--response-tokens', type=int, default=64)
+    parser.add_argument('--parallel', type=int, default=1, help="Concurrent generations the stub allows")
+    parser.add_argument('--backend', choices=['stub', 'mock'], default='stub')
+    parser.add_argument('--output', default='benchmark_rag.json')
+    parser.add_argument('--baseline', help="Previous results JSON to compare against")
+    parser.add_argument('--tolerance', type=float, default=0.25, help="Allowed relative slowdown before failing")
+    parser.add_argument('--query-cache', action='store_true', help="Keep the query embedding and result caches on")
+    parser.add_argument('--coalesce', action='store_true', help="Let identical concurrent requests share one computation")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("End-to-end RAG Benchmark (stub Ollama)")
+    print("=" * 60)
+
+    with open(args.data, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+
+    config = StubOllamaConfig(args.token_rate, args.latency, args.prefill_rate, args.response_tokens, args.parallel)
+    with StubOllamaServer(config=config) as server:
+        pipeline = RoadSafetyEmbeddingPipeline(vector_db_path=None)
+        if not args.query_cache:
+            # The query set repeats, so cached results would hide the retrieval stages
+            pipeline.embedding_cache.max_size = pipeline.result_cache.max_size = 0
+        if args.backend == 'mock':
+            rag = RoadSafetyRAG(backend=MockBackend(latency=args.latency, token_rate=args.token_rate,
+                                                    response_tokens=args.response_tokens), pipeline=pipeline)
+            print(f"Mock backend: {args.token_rate} tok/s, {args.latency}s latency")
+        else:
+            rag = RoadSafetyRAG(pipeline=pipeline)
+            rag.ollama_host = server.url
+            print(f"Stub server: {server.url} ({args.token_rate} tok/s, {args.latency}s latency, {args.parallel} slot(s))")
+        # The query set repeats too, so at concurrency > 1 coalescing would share results like a cache
+        rag.coalesce_enabled = args.coalesce
+        rag.pipeline.add_interventions_to_db(data)
+
+        # Warm up model and connection pools outside the measurements
+        rag.get_recommendations(DEFAULT_QUERIES[0], top_k=args.top_k)
+
+        levels = []
+        for concurrency in [int(c) for c in args.concurrency.split(',') if c.strip()]:
+            level = run_level(rag, DEFAULT_QUERIES, concurrency, args.requests, args.top_k)
+            levels.append(level)
+            stages = level['stages']
+            print(f"\nConcurrency {concurrency}: {level['throughput_rps']} req/s, prompt ~{level['prompt_chars_mean']} chars")
+            if level['coalesced']:
+                print(f"   {level['coalesced']}/{level['requests']} requests coalesced (not sampled in stage timings)")
+            for stage in STAGES:
+                if stages.get(stage):
+                    print(f"   {stage:<16} p50 {stages[stage]['p50_ms']:>10} ms   p95 {stages[stage]['p95_ms']:>10} ms")
+
+    results = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'config': vars(args),
+        'levels': levels
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare_to_baseline(results, baseline, args.tolerance)
+        if regressions:
+            print(f"\n[REGRESSION] {len(regressions)} metric(s) worse than baseline by more than {args.tolerance:.0%}:")
+            for line in regressions:
+                print(f"   - {line}")
+            sys.exit(1)
+        print(f"\n[OK] No regressions beyond {args.tolerance:.0%} against {args.baseline}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,269 @@
+"""Retrieval benchmark: ingest, index build, memory, latency, QPS and recall@k.
+
+Builds synthetic corpora from interventions.json at several scales, runs every
+search backend against the same query set and writes the results as JSON.
+Pass --baseline to compare against a stored run and fail on regressions.
+
+    python benchmark_retrieval.py --scales 1000,100000 --output bench.json
+    python benchmark_retrieval.py --baseline bench_baseline.json
+"""
+import argparse
+import json
+import os
+import resource
+import sys
+import time
+
+import numpy as np
+
+from embedding_pipeline import RoadSafetyEmbeddingPipeline
+from sharded_index import ShardedIndex
+
+# Fix Windows encoding
+if sys.platform == 'win32':
+    sys.stdout.reconfigure(encoding='utf-8')
+
+DEFAULT_QUERIES = [
+    "damaged stop sign",
+    "speed hump requirements",
+    "missing road markings",
+    "height issue with signs",
+    "How to fix a damaged STOP sign?",
+    "What are speed hump requirements?",
+    "Missing road markings on highway",
+    "faded pedestrian crossing",
+    "obstructed warning sign near school",
+    "improper placement of give way sign"
+]
+
+# Metrics where a larger value is better; everything else is "lower is better"
+HIGHER_IS_BETTER = ('qps', 'docs_per_s', 'recall_at_k')
+
+
+def rank_brute(pipeline, query_embedding, top_k, embeddings):
+    return pipeline.rank(query_embedding, top_k=top_k, min_similarity=0.0, embeddings=embeddings)
+
+
+def rank_sharded(pipeline, query_embedding, top_k, shard_index):
+    return pipeline.rank(query_embedding, top_k=top_k, min_similarity=0.0, shard_index=shard_index)
+
+
+# name -> (prepare(pipeline, embeddings) -> state, search(pipeline, query_embedding, top_k, state))
+BACKENDS = {
+    'brute': (lambda pipeline, embeddings: embeddings, rank_brute),
+    'sharded': (lambda pipeline, embeddings: ShardedIndex.build(embeddings, num_shards=pipeline.num_shards), rank_sharded)
+}
+
+
+def percentiles(samples_s):
+    ms = np.array(samples_s) * 1000.0
+    return {
+        'p50_ms': round(float(np.percentile(ms, 50)), 4),
+        'p95_ms': round(float(np.percentile(ms, 95)), 4),
+        'p99_ms': round(float(np.percentile(ms, 99)), 4),
+        'mean_ms': round(float(ms.mean()), 4)
+    }
+
+
+def peak_rss_mb():
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is bytes on macOS and kilobytes on Linux
+    return usage / (1024 * 1024) if sys.platform == 'darwin' else usage / 1024
+
+
+def build_synthetic_corpus(base_data, base_embeddings, size, noise=0.05, seed=0):
+    """Replicate the base records to `size`, jittering embeddings so rows stay distinct"""
+    rng = np.random.default_rng(seed)
+    reps = np.arange(size) % len(base_data)
+    data = []
+    for i, base_idx in enumerate(reps):
+        record = dict(base_data[base_idx])
+        record['S. No.'] = i + 1
+        data.append(record)
+    embeddings = base_embeddings[reps].astype(np.float32)
+    embeddings += rng.normal(0, noise, embeddings.shape).astype(np.float32)
+    embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+    return data, embeddings
+
+
+def exact_top_k(embeddings, query_embedding, top_k):
+    similarities = embeddings @ query_embedding.flatten()
+    top = np.argpartition(-similarities, top_k - 1)[:top_k]
+    return set(int(i) for i in top)
+
+
+def measure_ingest(pipeline, data, sample_size):
+    sample = data[:sample_size]
+    start = time.perf_counter()
+    pipeline.build_index(sample)
+    elapsed = time.perf_counter() - start
+    return {
+        'sample_size': len(sample),
+        'seconds': round(elapsed, 4),
+        'docs_per_s': round(len(sample) / elapsed, 2) if elapsed > 0 else None
+    }
+
+
+def run_scale(pipeline, base_data, base_embeddings, size, queries, args):
+    print(f"\n--- {size:,} records ---")
+    rss_before = peak_rss_mb()
+    data, embeddings = build_synthetic_corpus(base_data, base_embeddings, size, seed=args.seed)
+
+    ingest = measure_ingest(pipeline, data, min(size, args.ingest_sample))
+    ingest['extrapolated_full_seconds'] = round(size / ingest['docs_per_s'], 2) if ingest['docs_per_s'] else None
+    print(f"   Ingest: {ingest['docs_per_s']} docs/s")
+
+    start = time.perf_counter()
+    pipeline.swap_index(data, embeddings)
+    swap_s = time.perf_counter() - start
+
+    encode_times = []
+    query_embeddings = []
+    for query in queries:
+        start = time.perf_counter()
+        query_embeddings.append(pipeline.embedding_model.encode([query], normalize_embeddings=True))
+        encode_times.append(time.perf_counter() - start)
+
+    truth = [exact_top_k(embeddings, q, args.top_k) for q in query_embeddings]
+
+    result = {
+        'size': size,
+        'dim': int(embeddings.shape[1]),
+        'ingest': ingest,
+        'memory': {
+            'embeddings_mb': round(embeddings.nbytes / (1024 * 1024), 2),
+            'peak_rss_mb': round(peak_rss_mb(), 2),
+            'rss_growth_mb': round(peak_rss_mb() - rss_before, 2)
+        },
+        'query_encode': percentiles(encode_times),
+        'backends': {}
+    }
+
+    for name in args.backends:
+        prepare, search = BACKENDS[name]
+        start = time.perf_counter()
+        state = prepare(pipeline, embeddings)
+        build_s = time.perf_counter() - start + swap_s
+
+        # Warm up once so lazy allocations don't land in the first sample
+        search(pipeline, query_embeddings[0], args.top_k, state)
+
+        latencies = []
+        hits = 0
+        for _ in range(args.repeat):
+            for q_emb, expected in zip(query_embeddings, truth):
+                start = time.perf_counter()
+                ranked = search(pipeline, q_emb, args.top_k, state)
+                latencies.append(time.perf_counter() - start)
+                hits += len(expected & set(idx for idx, _ in ranked))
+        total = sum(latencies)
+        result['backends'][name] = {
+            'index_build_s': round(build_s, 4),
+            'search': percentiles(latencies),
+            'qps': round(len(latencies) / total, 2) if total > 0 else None,
+            'recall_at_k': round(hits / (args.top_k * len(latencies)), 4)
+        }
+        stats = result['backends'][name]
+        print(f"   {name}: p50 {stats['search']['p50_ms']} ms, p99 {stats['search']['p99_ms']} ms, "
+              f"{stats['qps']} QPS, recall@{args.top_k} {stats['recall_at_k']}")
+
+    # Release the corpus before building the next scale
+    pipeline.swap_index([], None)
+    return result
+
+
+def flatten(prefix, value, out):
+    if isinstance(value, dict):
+        for key, child in value.items():
+            flatten(f"{prefix}.{key}" if prefix else key, child, out)
+    elif isinstance(value, (int, float)) and not isinstance(value, bool):
+        out[prefix] = value
+    return out
+
+
+def compare_to_baseline(results, baseline, tolerance):
+    """Return a list of human-readable regressions beyond the given tolerance"""
+    regressions = []
+    current = {str(r['size']): r for r in results['scales']}
+    for previous in baseline.get('scales', []):
+        run = current.get(str(previous['size']))
+        if run is None:
+            continue
+        old_metrics = flatten('', previous, {})
+        new_metrics = flatten('', run, {})
+        for key, old in old_metrics.items():
+            new = new_metrics.get(key)
+            if new is None or not old or key.startswith(('size', 'dim', 'memory.peak', 'ingest.sample')):
+                continue
+            if key.endswith(HIGHER_IS_BETTER):
+                change = (old - new) / old
+            elif key.endswith(('_ms', '_s', 'seconds', '_mb')):
+                change = (new - old) / old
+            else:
+                continue
+            if change > tolerance:
+                regressions.append(f"{previous['size']:,} {key}: {old} -> {new} ({change:+.1%} worse)")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--data', default='interventions.json')
+    parser.add_argument('--scales', default='1000,100000,1000000')
+    parser.add_argument('--backends', default=','.join(BACKENDS))
+    parser.add_argument('--top-k', type=int, default=5)
+    parser.add_argument('--repeat', type=int, default=5, help="Passes over the query set per backend")
+    parser.add_argument('--ingest-sample', type=int, default=2000, help="Records actually encoded to measure ingest throughput")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default='benchmark_retrieval.json')
+    parser.add_argument('--baseline', help="Previous results JSON to compare against")
+    parser.add_argument('--tolerance', type=float, default=0.15, help="Allowed relative slowdown before failing")
+    args = parser.parse_args()
+    args.backends = [b.strip() for b in args.backends.split(',') if b.strip()]
+    unknown = [b for b in args.backends if b not in BACKENDS]
+    if unknown:
+        parser.error(f"unknown backend(s): {', '.join(unknown)}; choose from {', '.join(BACKENDS)}")
+
+    print("=" * 60)
+    print("Retrieval Benchmark")
+    print("=" * 60)
+
+    with open(args.data, 'r', encoding='utf-8') as f:
+        base_data = json.load(f)
+    # Never read or overwrite the real index from a benchmark
+    pipeline = RoadSafetyEmbeddingPipeline(vector_db_path=None)
+    base_embeddings = pipeline.build_index(base_data)
+    print(f"Base corpus: {len(base_data)} interventions, dim {base_embeddings.shape[1]}")
+
+    results = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'config': {
+            'top_k': args.top_k,
+            'repeat': args.repeat,
+            'queries': len(DEFAULT_QUERIES),
+            'backends': args.backends,
+            'cpu_count': os.cpu_count()
+        },
+        'scales': []
+    }
+    for size in [int(s) for s in args.scales.split(',') if s.strip()]:
+        results['scales'].append(run_scale(pipeline, base_data, base_embeddings, size, DEFAULT_QUERIES, args))
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare_to_baseline(results, baseline, args.tolerance)
+        if regressions:
+            print(f"\n[REGRESSION] {len(regressions)} metric(s) worse than baseline by more than {args.tolerance:.0%}:")
+            for line in regressions:
+                print(f"   - {line}")
+            sys.exit(1)
+        print(f"\n[OK] No regressions beyond {args.tolerance:.0%} against {args.baseline}")
+
+
+if __name__ == '__main__':
+    main()
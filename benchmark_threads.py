@@ -0,0 +1,235 @@
+"""Thread layout benchmark: sweep worker processes x threads per worker and recommend one for this host.
+
+Every layout runs the same number of concurrent clients (--concurrency),
+spread over P worker processes. Each worker is started with the
+ROAD_SAFETY_* runtime variables (see runtime_config.py), pinned to its share
+of the CPUs, and uses cores // P intra-op and BLAS threads. A "defaults"
+layout runs the same processes with library defaults, to show the cost of
+oversubscription. Each layout measures two phases: end-to-end query latency
+and QPS, then batch encoding throughput.
+
+    python benchmark_threads.py
+    python benchmark_threads.py --concurrency 8 --duration 20 --output threads.json
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import numpy as np
+
+from runtime_config import available_cpus
+
+# Fix Windows encoding
+if sys.platform == 'win32':
+    sys.stdout.reconfigure(encoding='utf-8')
+
+QUERIES = [
+    "damaged stop sign",
+    "speed hump requirements",
+    "missing road markings",
+    "faded pedestrian crossing",
+    "obstructed warning sign near school",
+    "improper placement of give way sign"
+]
+
+
+def percentiles(samples_ms):
+    ms = np.array(samples_ms) if samples_ms else np.zeros(1)
+    return {
+        'p50_ms': round(float(np.percentile(ms, 50)), 2),
+        'p95_ms': round(float(np.percentile(ms, 95)), 2),
+        'p99_ms': round(float(np.percentile(ms, 99)), 2)
+    }
+
+
+def candidate_layouts(cpus):
+    """(name, processes, env) for pinned P x cpus//P layouts, plus an unpinned defaults run"""
+    layouts = []
+    processes = 1
+    while processes <= cpus:
+        threads = cpus // processes
+        env = {
+            'ROAD_SAFETY_INTRA_OP_THREADS': str(threads),
+            'ROAD_SAFETY_INTER_OP_THREADS': '1',
+            'ROAD_SAFETY_BLAS_THREADS': str(threads),
+            'TOKENIZERS_PARALLELISM': 'false',
+            'ROAD_SAFETY_CPU_AFFINITY': 'auto',
+            'ROAD_SAFETY_WORKERS': str(processes)
+        }
+        layouts.append((f"{processes}x{threads}", processes, env))
+        processes *= 2
+    layouts.append((f"{cpus}xdefaults", cpus, {}))
+    return layouts
+
+
+# ---------------------------------------------------------------- worker side
+
+def worker_main(args):
+    """One worker process: load, report ready, then run each phase the parent asks for"""
+    from embedding_pipeline import RoadSafetyEmbeddingPipeline
+    from benchmark_retrieval import build_synthetic_corpus
+
+    # stdout carries the JSON protocol; pipeline progress prints go to stderr
+    protocol, sys.stdout = sys.stdout, sys.stderr
+    with open(args.data, 'r', encoding='utf-8') as f:
+        base_data = json.load(f)
+    pipeline = RoadSafetyEmbeddingPipeline(vector_db_path=None)
+    # The query set repeats; measure encoding and search, not the query caches
+    pipeline.embedding_cache.max_size = pipeline.result_cache.max_size = 0
+    base_embeddings = pipeline.build_index(base_data)
+    data, embeddings = build_synthetic_corpus(base_data, base_embeddings, args.corpus)
+    pipeline.swap_index(data, embeddings)
+    texts = [pipeline._create_composite_text(r) for r in base_data]
+    # Warm up so lazy initialisation doesn't land in the first sample
+    pipeline.search_interventions(QUERIES[0], top_k=args.top_k)
+    print(json.dumps({'ready': True, 'runtime': pipeline.runtime}), file=protocol, flush=True)
+
+    for command in sys.stdin:
+        command = command.strip()
+        if command == 'search':
+            result = run_search_phase(pipeline, args)
+        elif command == 'encode':
+            start = time.perf_counter()
+            pipeline.encode_texts(texts)
+            result = {'docs': len(texts), 'seconds': time.perf_counter() - start}
+        else:
+            break
+        print(json.dumps(result), file=protocol, flush=True)
+
+
+def run_search_phase(pipeline, args):
+    latencies = []
+    lock = threading.Lock()
+    deadline = time.perf_counter() + args.duration
+
+    def client(offset):
+        i = offset
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            pipeline.search_interventions(QUERIES[i % len(QUERIES)], top_k=args.top_k)
+            elapsed = (time.perf_counter() - start) * 1000.0
+            with lock:
+                latencies.append(elapsed)
+            i += 1
+
+    clients = [threading.Thread(target=client, args=(n,)) for n in range(args.clients)]
+    for thread in clients:
+        thread.start()
+    for thread in clients:
+        thread.join()
+    return {'latencies_ms': latencies}
+
+
+# ---------------------------------------------------------------- parent side
+
+def run_layout(name, processes, env, args):
+    print(f"\n--- {name}: {processes} process(es) ---")
+    clients_total = max(args.concurrency, processes)
+    workers = []
+    for index in range(processes):
+        worker_env = dict(os.environ, **env)
+        if env:
+            worker_env['ROAD_SAFETY_WORKER_INDEX'] = str(index)
+        # Spread the concurrent clients as evenly as possible over the workers
+        clients = clients_total // processes + (1 if index < clients_total % processes else 0)
+        command = [sys.executable, os.path.abspath(__file__), '--worker', '--clients', str(clients),
+                   '--data', args.data, '--corpus', str(args.corpus), '--duration', str(args.duration),
+                   '--top-k', str(args.top_k)]
+        workers.append(subprocess.Popen(command, env=worker_env, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                        text=True, bufsize=1))
+    try:
+        runtimes = [json.loads(w.stdout.readline())['runtime'] for w in workers]
+
+        def phase(command):
+            for w in workers:
+                w.stdin.write(command + '\n')
+                w.stdin.flush()
+            start = time.perf_counter()
+            results = [json.loads(w.stdout.readline()) for w in workers]
+            return results, time.perf_counter() - start
+
+        searches, search_s = phase('search')
+        encodes, encode_s = phase('encode')
+    finally:
+        for w in workers:
+            w.stdin.close()
+            w.wait()
+
+    latencies = [ms for result in searches for ms in result['latencies_ms']]
+    docs = sum(result['docs'] for result in encodes)
+    result = {
+        'layout': name,
+        'processes': processes,
+        'clients': clients_total,
+        'env': env,
+        'applied': runtimes[0].get('applied') if runtimes else {},
+        'search': dict(percentiles(latencies), queries=len(latencies),
+                       qps=round(len(latencies) / search_s, 2) if search_s > 0 else None),
+        'encode_docs_per_s': round(docs / encode_s, 2) if encode_s > 0 else None
+    }
+    print(f"   search: {result['search']['qps']} QPS, p50 {result['search']['p50_ms']} ms, "
+          f"p95 {result['search']['p95_ms']} ms")
+    print(f"   encode: {result['encode_docs_per_s']} docs/s")
+    return result
+
+
+def recommend(results, tolerance):
+    """Highest QPS among layouts whose p95 is within `tolerance` of the best p95"""
+    best_p95 = min(r['search']['p95_ms'] for r in results)
+    eligible = [r for r in results if r['search']['p95_ms'] <= best_p95 * (1 + tolerance)]
+    return max(eligible, key=lambda r: (r['search']['qps'] or 0, r['encode_docs_per_s'] or 0))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--data', default='interventions.json')
+    parser.add_argument('--corpus', type=int, default=20000, help="Synthetic corpus size searched by each worker")
+    parser.add_argument('--concurrency', type=int, default=None, help="Concurrent clients per layout (default: CPUs)")
+    parser.add_argument('--duration', type=float, default=10.0, help="Seconds of querying per layout")
+    parser.add_argument('--top-k', type=int, default=5)
+    parser.add_argument('--tolerance', type=float, default=0.25, help="p95 slack allowed when picking by QPS")
+    parser.add_argument('--output', default='benchmark_threads.json')
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--clients', type=int, default=1, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.worker:
+        worker_main(args)
+        return
+
+    cpus = available_cpus()
+    args.concurrency = args.concurrency or cpus
+    print("=" * 60)
+    print("Thread Layout Benchmark")
+    print("=" * 60)
+    print(f"CPUs available: {cpus}, concurrent clients: {args.concurrency}")
+
+    results = [run_layout(name, processes, env, args) for name, processes, env in candidate_layouts(cpus)]
+    best = recommend(results, args.tolerance)
+
+    print("\n" + "=" * 60)
+    print(f"Recommended layout: {best['layout']} ({best['search']['qps']} QPS, p95 {best['search']['p95_ms']} ms)")
+    if best['env']:
+        print(f"Run {best['processes']} worker process(es), each with:")
+        for key, value in best['env'].items():
+            print(f"   {key}={value}")
+        print("   ROAD_SAFETY_WORKER_INDEX=<0..{}>".format(best['processes'] - 1))
+    else:
+        print("Library defaults won; leave the ROAD_SAFETY_* thread variables unset")
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump({
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'config': {'cpus': cpus, 'concurrency': args.concurrency, 'duration_s': args.duration,
+                       'corpus': args.corpus},
+            'layouts': results,
+            'recommended': best['layout']
+        }, f, indent=2)
+    print(f"\nResults written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
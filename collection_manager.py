@@ -0,0 +1,132 @@
+import os
+import re
+import threading
+from collections import OrderedDict
+
+from embedding_pipeline import RoadSafetyEmbeddingPipeline
+from metrics import REGISTRY
+from model_registry import DEFAULT_ENCODER, get_encoder
+
+COLLECTIONS_LOADED = REGISTRY.gauge('road_safety_collections_loaded', 'Collections currently held in memory')
+COLLECTIONS_BYTES = REGISTRY.gauge('road_safety_collections_bytes', 'Estimated memory held by loaded collections')
+COLLECTION_EVICTIONS = REGISTRY.counter('road_safety_collection_evictions_total', 'Collections unloaded to stay under budget')
+
+COLLECTION_NAME = re.compile(r'^[A-Za-z0-9][A-Za-z0-9_.-]{0,63}$')
+DEFAULT_COLLECTION = 'default'
+
+
+class CollectionManager:
+    """Named intervention indexes, e.g. one per state agency or manual edition.
+
+    Each collection is a RoadSafetyEmbeddingPipeline persisted as
+    `<root_dir>/<name>.pkl`. The default collection keeps using the legacy
+    ./road_safety_index.pkl. Collections load on first use and all share one
+    encoder. Once the estimated size of the loaded collections exceeds
+    `memory_budget_mb`, the least recently used ones are unloaded. Every
+    ingest is saved to disk, so an evicted collection just reloads on its
+    next use. The default collection and collections with an ingest in
+    progress are never evicted.
+    """
+
+    def __init__(self, root_dir=None, memory_budget_mb=None, model_name=DEFAULT_ENCODER,
+                 default_path="./road_safety_index.pkl"):
+        self.root_dir = root_dir or os.getenv('COLLECTIONS_DIR', './collections')
+        budget = memory_budget_mb if memory_budget_mb is not None else float(os.getenv('COLLECTIONS_MEMORY_MB', '512'))
+        self.memory_budget_bytes = int(budget * 1024 * 1024)
+        self.default_path = default_path
+        # Resolved like the pipeline does, so collections share the registry entry the pipeline uses
+        self.encoder = get_encoder(model_name, backend=os.getenv('EMBEDDING_BACKEND', 'torch'),
+                                   device=os.getenv('EMBEDDING_DEVICE'))
+        self._loaded = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _path(self, name):
+        if name == DEFAULT_COLLECTION:
+            return self.default_path
+        return os.path.join(self.root_dir, f"{name}.pkl")
+
+    def _check_name(self, name):
+        if not COLLECTION_NAME.match(name or ''):
+            raise ValueError(f"Invalid collection name: {name!r} (letters, digits, '_', '-', '.')")
+
+    def names(self):
+        """Every collection on disk or in memory, default first"""
+        names = {DEFAULT_COLLECTION}
+        if os.path.isdir(self.root_dir):
+            names.update(f[:-4] for f in os.listdir(self.root_dir) if f.endswith('.pkl'))
+        with self._lock:
+            names.update(self._loaded)
+        return [DEFAULT_COLLECTION] + sorted(names - {DEFAULT_COLLECTION})
+
+    def exists(self, name):
+        with self._lock:
+            if name in self._loaded:
+                return True
+        return os.path.exists(self._path(name))
+
+    def get(self, name=None, create=False):
+        """Return the pipeline for `name`, loading it if needed; unknown names raise KeyError unless create=True"""
+        name = name or DEFAULT_COLLECTION
+        self._check_name(name)
+        with self._lock:
+            pipeline = self._loaded.get(name)
+            if pipeline is not None:
+                self._loaded.move_to_end(name)
+                return pipeline
+        if not create and name != DEFAULT_COLLECTION and not os.path.exists(self._path(name)):
+            raise KeyError(f"Unknown collection: {name}")
+
+        if name != DEFAULT_COLLECTION:
+            os.makedirs(self.root_dir, exist_ok=True)
+        # Load outside the lock so one slow collection doesn't block lookups of the others
+        pipeline = RoadSafetyEmbeddingPipeline(vector_db_path=self._path(name), embedding_model=self.encoder,
+                                               collection=name)
+        with self._lock:
+            # Another thread may have loaded it meanwhile; keep the first copy
+            pipeline = self._loaded.setdefault(name, pipeline)
+            self._loaded.move_to_end(name)
+        self.enforce_budget(keep=name)
+        return pipeline
+
+    def create(self, name):
+        return self.get(name, create=True)
+
+    def search_interventions(self, collection, query, **kwargs):
+        return self.get(collection).search_interventions(query, **kwargs)
+
+    def memory_bytes(self):
+        with self._lock:
+            pipelines = list(self._loaded.values())
+        return sum(p.memory_bytes() for p in pipelines)
+
+    def enforce_budget(self, keep=None):
+        """Unload least recently used collections until the loaded set fits the budget"""
+        with self._lock:
+            sizes = OrderedDict((name, p.memory_bytes()) for name, p in self._loaded.items())
+            total = sum(sizes.values())
+            for name in list(sizes):
+                if total <= self.memory_budget_bytes:
+                    break
+                # The default collection is also held by RoadSafetyRAG.pipeline, so unloading frees nothing
+                if name in (keep, DEFAULT_COLLECTION) or self._loaded[name].is_writing():
+                    continue
+                del self._loaded[name]
+                total -= sizes[name]
+                COLLECTION_EVICTIONS.inc()
+            COLLECTIONS_LOADED.set(len(self._loaded))
+            COLLECTIONS_BYTES.set(total)
+        return total
+
+    def unload(self, name):
+        with self._lock:
+            pipeline = self._loaded.pop(name, None)
+            COLLECTIONS_LOADED.set(len(self._loaded))
+        return pipeline is not None
+
+    def stats(self):
+        with self._lock:
+            loaded = list(self._loaded.items())
+        return {
+            'loaded': [{'name': name, 'records': len(p.data), 'bytes': p.memory_bytes()} for name, p in loaded],
+            'memory_budget_bytes': self.memory_budget_bytes
+        }
@@ -0,0 +1,110 @@
+import math
+import re
+
+SENTENCE_SPLIT = re.compile(r'(?<=[.;])\s+|\n+')
+
+
+class ContextBuilder:
+    """Builds the retrieved-interventions block of the prompt within a token budget.
+
+    Records are taken in retrieval order (highest similarity first). Empty fields
+    are skipped, and a description that repeats an earlier record's is replaced by
+    a back-reference. When the budget runs short, descriptions are cut at sentence
+    boundaries and the lowest-ranked records are dropped.
+    """
+
+    def __init__(self, token_budget=800, tokenizer=None, min_description_tokens=24):
+        self.token_budget = token_budget
+        self.tokenizer = tokenizer
+        self.min_description_tokens = min_description_tokens
+
+    def count_tokens(self, text):
+        if not text:
+            return 0
+        if self.tokenizer is not None:
+            return len(self.tokenizer.encode(text, add_special_tokens=False))
+        # Roughly four characters per token for English text
+        return math.ceil(len(text) / 4)
+
+    def _description(self, item):
+        # A chunked index already pinpointed the relevant passage; send only that
+        if item.get('matched_chunk'):
+            return item['matched_chunk']
+        # `data`/`description` is the detailed text; `content` only restates the other fields
+        return item.get('description') or item.get('data') or item.get('content') or ''
+
+    def _header_lines(self, position, item):
+        name = item.get('name') or item.get('type') or 'N/A'
+        problem_types = item.get('problem_type', [])
+        if not problem_types and item.get('problem'):
+            problem_types = [item.get('problem')]
+        lines = [f"{position}. {name}"]
+        if item.get('category'):
+            lines.append(f"   - Category: {item.get('category')}")
+        if problem_types:
+            lines.append(f"   - Problem: {', '.join(problem_types)}")
+        return lines
+
+    def _footer_lines(self, item):
+        lines = []
+        if item.get('code'):
+            lines.append(f"   - Code: {item.get('code')}")
+        if item.get('clause'):
+            lines.append(f"   - Clause: {item.get('clause')}")
+        lines.append(f"   - Similarity Score: {item.get('similarity_score', 0):.3f}")
+        return lines
+
+    def _trim(self, text, max_tokens):
+        """Keep whole sentences from the start of `text` while they fit in max_tokens"""
+        if self.count_tokens(text) <= max_tokens:
+            return text, False
+        kept = []
+        used = 0
+        for sentence in SENTENCE_SPLIT.split(text):
+            cost = self.count_tokens(sentence) + 1
+            if used + cost > max_tokens:
+                break
+            kept.append(sentence)
+            used += cost
+        if not kept:
+            # A single long sentence: cut it by characters instead
+            kept = [text[:max(0, max_tokens * 4 - 1)]]
+        return ' '.join(kept).rstrip() + ' …', True
+
+    def build(self, interventions):
+        """Return (context, info) where info reports tokens used and what was trimmed"""
+        blocks = []
+        used = 0
+        seen_descriptions = {}
+        info = {'token_budget': self.token_budget, 'included': 0, 'truncated': 0, 'dropped': 0}
+
+        for item in interventions:
+            position = len(blocks) + 1
+            header = self._header_lines(position, item)
+            footer = self._footer_lines(item)
+            # +2 for the blank line separating records
+            fixed_cost = self.count_tokens('\n'.join(header + footer)) + 2
+            remaining = self.token_budget - used - fixed_cost
+            if remaining < 0 or (blocks and remaining < self.min_description_tokens // 2):
+                info['dropped'] += 1
+                continue
+
+            description = self._description(item).strip()
+            if description in seen_descriptions:
+                description_line = f"   - Description: same as #{seen_descriptions[description]}"
+            elif description:
+                seen_descriptions[description] = position
+                text, truncated = self._trim(description, remaining - 4)
+                info['truncated'] += int(truncated)
+                description_line = f"   - Description: {text}" if text.strip(' …') else None
+            else:
+                description_line = None
+
+            lines = header + ([description_line] if description_line else []) + footer
+            block = '\n'.join(lines)
+            blocks.append(block)
+            used += self.count_tokens(block) + 2
+            info['included'] += 1
+
+        info['tokens'] = used
+        return '\n\n'.join(blocks), info
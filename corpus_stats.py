@@ -0,0 +1,64 @@
+import threading
+from collections import Counter
+
+STAT_FIELDS = {
+    'categories': 'category',
+    'problems': 'problem',
+    'codes': 'code'
+}
+
+
+class CorpusStats:
+    """Counts of records per category, problem and code, kept up to date as records are added or removed.
+
+    `snapshot()` is cached until the next change, so UI reruns that only
+    read the stats never touch the corpus.
+    """
+
+    def __init__(self, records=None):
+        self.total = 0
+        self.counts = {name: Counter() for name in STAT_FIELDS}
+        self._lock = threading.Lock()
+        self._snapshot = None
+        if records:
+            self.add(records)
+
+    def _values(self, record, field):
+        value = record.get(field)
+        if not value:
+            return []
+        # Old-format records may list several problems
+        return value if isinstance(value, list) else [value]
+
+    def _update(self, records, sign):
+        with self._lock:
+            for record in records:
+                self.total += sign
+                for name, field in STAT_FIELDS.items():
+                    for value in self._values(record, field):
+                        self.counts[name][value] += sign
+                        if self.counts[name][value] <= 0:
+                            del self.counts[name][value]
+            self._snapshot = None
+
+    def add(self, records):
+        self._update(records, 1)
+
+    def remove(self, records):
+        self._update(records, -1)
+
+    def copy(self):
+        with self._lock:
+            clone = CorpusStats()
+            clone.total = self.total
+            clone.counts = {name: counter.copy() for name, counter in self.counts.items()}
+            return clone
+
+    def snapshot(self):
+        """Return {'total': n, 'categories': {...}, 'problems': {...}, 'codes': {...}}, most common first"""
+        with self._lock:
+            if self._snapshot is None:
+                self._snapshot = {'total': self.total}
+                for name, counter in self.counts.items():
+                    self._snapshot[name] = dict(counter.most_common())
+            return self._snapshot
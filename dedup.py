@@ -0,0 +1,67 @@
+import numpy as np
+
+
+class NearDuplicateDetector:
+    """Clusters near-identical records by embedding similarity without an all-pairs scan.
+
+    Each of `num_tables` hash tables buckets the rows by the signs of
+    `num_bits` random projections (SimHash). Rows that land in the same bucket
+    in any table are compared exactly. Pairs with cosine >= `threshold` are
+    merged with union-find, so clusters are single-link. Every row is labelled
+    with its cluster representative, which is the lowest index in the cluster,
+    i.e. the first record ingested.
+    """
+
+    def __init__(self, threshold=0.95, num_bits=12, num_tables=6, seed=0, block_size=512):
+        self.threshold = threshold
+        self.num_bits = num_bits
+        self.num_tables = num_tables
+        self.seed = seed
+        self.block_size = block_size
+
+    def find_clusters(self, embeddings):
+        """Return an array mapping each row to the row that represents its cluster"""
+        n = len(embeddings)
+        parent = np.arange(n)
+        if n < 2:
+            return parent
+
+        def find(i):
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        vectors = vectors / (np.linalg.norm(vectors, axis=1, keepdims=True) + 1e-8)
+        rng = np.random.default_rng(self.seed)
+        weights = 1 << np.arange(self.num_bits, dtype=np.int64)
+
+        for _ in range(self.num_tables):
+            planes = rng.standard_normal((vectors.shape[1], self.num_bits)).astype(np.float32)
+            codes = ((vectors @ planes) > 0).astype(np.int64) @ weights
+            order = np.argsort(codes, kind='stable')
+            boundaries = np.flatnonzero(np.diff(codes[order])) + 1
+            for bucket in np.split(order, boundaries):
+                if len(bucket) < 2:
+                    continue
+                # Compare in blocks so one crowded bucket can't allocate a huge matrix
+                for start in range(0, len(bucket), self.block_size):
+                    block = bucket[start:start + self.block_size]
+                    rows, cols = np.nonzero(vectors[block] @ vectors[bucket].T >= self.threshold)
+                    for a, b in zip(block[rows], bucket[cols]):
+                        root_a, root_b = find(a), find(b)
+                        if root_a != root_b:
+                            # Keep the lower index as the root so it becomes the representative
+                            parent[max(root_a, root_b)] = min(root_a, root_b)
+
+        return np.array([find(i) for i in range(n)], dtype=np.int64)
+
+
+def cluster_members(clusters):
+    """Map each representative with at least one duplicate to its member rows, itself first"""
+    members = {}
+    for row, rep in enumerate(clusters):
+        if row != rep:
+            members.setdefault(int(rep), [int(rep)]).append(row)
+    return members
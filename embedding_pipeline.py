@@ -1,16 +1,86 @@
 import numpy as np
-from sentence_transformers import SentenceTransformer
 import json
 import pickle
 import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from corpus_stats import CorpusStats
+from dedup import NearDuplicateDetector, cluster_members
+from model_registry import DEFAULT_ENCODER, get_encoder
+from metrics import CORPUS_SIZE, INDEX_VERSION, REQUESTS, record_cache_lookup, record_timings
+from profiling import PROFILER
+from query_normalizer import LRUCache, QueryNormalizer, load_synonyms
+from sharded_index import ShardedIndex
+from record_normalizer import expand_record, is_derived, normalize_records
+from runtime_config import apply_runtime_config, available_cpus
+from text_index import TextIndex
 
 class RoadSafetyEmbeddingPipeline:
-    def __init__(self, model_name='all-MiniLM-L6-v2'):
-        self.embedding_model = SentenceTransformer(model_name)
-        self.vector_db_path = "./road_safety_index.pkl"
+    def __init__(self, model_name=DEFAULT_ENCODER, vector_db_path="./road_safety_index.pkl", reranker=None,
+                 embedding_model=None, device=None, collection='default'):
+        # Thread counts and CPU pinning are process-wide; applied before the first encoder load
+        self.runtime = apply_runtime_config()
+        # Encoders come from the process-wide registry, so pipelines on one model share a single copy
+        self.embedding_model = embedding_model or get_encoder(
+            model_name, backend=os.getenv('EMBEDDING_BACKEND', 'torch'), device=device or os.getenv('EMBEDDING_DEVICE'))
+        self.vector_db_path = vector_db_path
+        # Labels this index's gauges, so collections in one process don't overwrite each other
+        self.collection = collection
+        # Optional cross-encoder stage; RERANKER_MODEL enables it without code changes
+        if reranker is None and os.getenv('RERANKER_MODEL'):
+            from reranker import CrossEncoderReranker
+            reranker = CrossEncoderReranker(
+                model_name=os.getenv('RERANKER_MODEL'),
+                candidate_pool=int(os.getenv('RERANKER_POOL', '20')),
+                latency_budget_ms=float(os.getenv('RERANKER_BUDGET_MS', '200'))
+            )
+        self.reranker = reranker
+        # Optional chunking of long records into overlapping passages (sizes in words)
+        self.chunk_size = int(os.getenv('INDEX_CHUNK_WORDS', '0')) or None
+        self.chunk_overlap = int(os.getenv('INDEX_CHUNK_OVERLAP', '32'))
+        self.chunk_pooling = os.getenv('INDEX_CHUNK_POOLING', 'max')
+        # Optional near-duplicate collapsing at ingest (cosine threshold, e.g. 0.95)
+        dedup_threshold = float(os.getenv('INDEX_DEDUP_THRESHOLD', '0'))
+        self.dedup = NearDuplicateDetector(threshold=dedup_threshold) if dedup_threshold else None
+        # 'brute' scans the whole matrix on one thread; 'sharded' splits it across a thread pool,
+        # or across shard servers listed in INDEX_REMOTE_SHARDS (host:port,...)
+        self.search_backend = os.getenv('INDEX_SEARCH_BACKEND', 'brute')
+        self.num_shards = int(os.getenv('INDEX_SHARDS', '0')) or None
+        self.shard_addresses = [a.strip() for a in os.getenv('INDEX_REMOTE_SHARDS', '').split(',') if a.strip()]
+        self.shard_index = None
+        self._shard_executor = None
+        # Row -> record index and row -> passage text when the index is chunked or deduplicated
+        self.row_parents = None
+        self.chunks = None
+        # Record -> representative record, and representative -> members, when deduplicated
+        self.clusters = None
+        self.cluster_members = {}
         self.data = []
         self.embeddings = None
-        if os.path.exists(self.vector_db_path):
+        self.corpus_stats = CorpusStats()
+        self.text_index = TextIndex()
+        self._record_bytes = 0
+        # Queries are folded to a canonical key (IRC codes per the corpus) before the caches below
+        self.query_normalizer = QueryNormalizer()
+        # Read once here: a bad QUERY_SYNONYMS file should warn, not fail every index swap
+        try:
+            self.synonyms = load_synonyms()
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Could not load QUERY_SYNONYMS: {str(e)}; query synonyms disabled")
+            self.synonyms = {}
+        # Normalized key -> query embedding, and (key, index_version, options) -> search results
+        self.embedding_cache = LRUCache(int(os.getenv('QUERY_EMBEDDING_CACHE_SIZE', '1024')))
+        self.result_cache = LRUCache(int(os.getenv('QUERY_RESULT_CACHE_SIZE', '256')))
+        # Bumped on every index swap so callers can tell generations apart
+        self.index_version = 0
+        # Identifies the index content across processes and restarts; saved with the index
+        self.index_generation = None
+        self._index_lock = threading.Lock()
+        # Serializes read-modify-write updates such as appends
+        self._write_lock = threading.RLock()
+        if self.vector_db_path and os.path.exists(self.vector_db_path):
             self.load_database()
     
     def load_json_data(self, json_file_path):
@@ -20,16 +90,269 @@ class RoadSafetyEmbeddingPipeline:
         except:
             return []
     
-    def add_interventions_to_db(self, interventions_data):
+    def add_interventions_to_db(self, interventions_data, progress_callback=None):
         if not interventions_data:
             return False
-        self.data = interventions_data
-        texts = [self._create_composite_text(i) for i in self.data]
-        # Encode with normalization for better cosine similarity
-        self.embeddings = self.embedding_model.encode(texts, normalize_embeddings=True)
+        with self._write_lock:
+            index = self.prepare_index(interventions_data, progress_callback=progress_callback)
+            self.swap_index(interventions_data, **index)
+        self.save_database()
+        return True
+    
+    def append_interventions_to_db(self, interventions_data, progress_callback=None):
+        """Add records to the existing index, encoding only the new ones"""
+        if not interventions_data:
+            return False
+        with self._write_lock:
+            state = self._index_state()
+            chunked = state['row_parents'] is not None
+            if state['embeddings'] is None or self.dedup is not None or chunked != bool(self.chunk_size):
+                # Clusters span old and new records, and a layout change needs every row re-encoded
+                return self.add_interventions_to_db(state['data'] + list(interventions_data), progress_callback)
+            
+            index = self.prepare_index(interventions_data, progress_callback=progress_callback)
+            offset = len(state['data'])
+            merged = {'embeddings': np.vstack([state['embeddings'], index['embeddings']])}
+            if chunked:
+                merged['row_parents'] = np.concatenate([state['row_parents'], index['row_parents'] + offset])
+                merged['chunks'] = state['chunks'] + index['chunks']
+            stats = state['corpus_stats'].copy()
+            stats.add(interventions_data)
+            # Appending in place is safe: readers of the old generation search with max_row
+            state['text_index'].add(interventions_data)
+            self.swap_index(state['data'] + list(interventions_data), corpus_stats=stats,
+                            text_index=state['text_index'], **merged)
         self.save_database()
         return True
     
+    def encode_texts(self, texts, batch_size=64, progress_callback=None):
+        batches = []
+        for start in range(0, len(texts), batch_size):
+            # Encode with normalization for better cosine similarity
+            batches.append(self.embedding_model.encode(texts[start:start + batch_size], normalize_embeddings=True))
+            if progress_callback:
+                progress_callback(min(start + batch_size, len(texts)), len(texts))
+        return np.vstack(batches)
+    
+    def build_index(self, interventions_data, batch_size=64, progress_callback=None):
+        """Encode interventions without touching the live index"""
+        texts = [self._create_composite_text(i) for i in interventions_data]
+        return self.encode_texts(texts, batch_size, progress_callback)
+    
+    def prepare_index(self, interventions_data, progress_callback=None):
+        """Build everything swap_index needs, chunked when chunk_size is set"""
+        if not self.chunk_size:
+            index = {'embeddings': self.build_index(interventions_data, progress_callback=progress_callback)}
+            return self._collapse_duplicates(index, len(interventions_data))
+        
+        texts, row_parents, chunks = [], [], []
+        for parent, intervention in enumerate(interventions_data):
+            title = self._chunk_title(intervention)
+            for passage in self._split_passages(self._create_composite_text(intervention)):
+                # The title keeps each passage's embedding tied to its record
+                texts.append(f"{title}: {passage}" if title else passage)
+                row_parents.append(parent)
+                chunks.append(passage)
+        
+        def on_progress(done, total):
+            # Report progress in records rather than passages
+            if progress_callback:
+                progress_callback(row_parents[done - 1] + 1, len(interventions_data))
+        
+        index = {
+            'embeddings': self.encode_texts(texts, progress_callback=on_progress),
+            'row_parents': np.array(row_parents, dtype=np.int64),
+            'chunks': chunks
+        }
+        return self._collapse_duplicates(index, len(interventions_data))
+    
+    def _collapse_duplicates(self, index, record_count):
+        """Cluster near-duplicate records and keep only representative rows in the index"""
+        if self.dedup is None:
+            return index
+        embeddings = index['embeddings']
+        row_parents = index.get('row_parents')
+        if row_parents is None:
+            record_embeddings = embeddings
+            row_parents = np.arange(record_count, dtype=np.int64)
+        else:
+            # One vector per record: the mean of its passages
+            record_embeddings = np.zeros((record_count, embeddings.shape[1]), dtype=embeddings.dtype)
+            np.add.at(record_embeddings, row_parents, embeddings)
+        clusters = self.dedup.find_clusters(record_embeddings)
+        keep = clusters[row_parents] == row_parents
+        collapsed = {
+            'embeddings': embeddings[keep],
+            'row_parents': row_parents[keep],
+            'clusters': clusters
+        }
+        if index.get('chunks') is not None:
+            collapsed['chunks'] = [chunk for chunk, kept in zip(index['chunks'], keep) if kept]
+        return collapsed
+    
+    def _chunk_title(self, intervention):
+        name = intervention.get('type', '') or intervention.get('name', '')
+        category = intervention.get('category', '')
+        return f"{name} ({category})" if name and category else name
+    
+    def _split_passages(self, text):
+        """Overlapping word windows; short texts stay a single passage"""
+        words = text.split()
+        if len(words) <= self.chunk_size:
+            return [text]
+        stride = max(1, self.chunk_size - self.chunk_overlap)
+        passages = []
+        for start in range(0, len(words), stride):
+            passages.append(' '.join(words[start:start + self.chunk_size]))
+            if start + self.chunk_size >= len(words):
+                break
+        return passages
+    
+    def swap_index(self, data, embeddings, row_parents=None, chunks=None, clusters=None, corpus_stats=None,
+                   text_index=None, generation=None):
+        """Atomically replace the live data and embeddings; `generation` is only passed when reloading a saved index"""
+        # Drop fields that can be rebuilt from the rest of each record
+        data = normalize_records(data)
+        members = cluster_members(clusters) if clusters is not None else {}
+        if corpus_stats is None:
+            corpus_stats = CorpusStats(data)
+        if text_index is None:
+            text_index = TextIndex(data)
+        record_bytes = sum(len(str(value)) for record in data for value in record.values())
+        generation = generation or uuid.uuid4().hex
+        shard_index = self._build_shard_index(embeddings, generation)
+        query_normalizer = QueryNormalizer.for_corpus(corpus_stats.snapshot()['codes'], text_index, self.synonyms)
+        with self._index_lock:
+            self.data = data
+            self.embeddings = embeddings
+            self.row_parents = row_parents
+            self.chunks = chunks
+            self.clusters = clusters
+            self.cluster_members = members
+            self.corpus_stats = corpus_stats
+            self.text_index = text_index
+            self._record_bytes = record_bytes
+            self.shard_index = shard_index
+            self.query_normalizer = query_normalizer
+            self.index_generation = generation
+            self.index_version += 1
+            CORPUS_SIZE.set(len(data), collection=self.collection)
+            INDEX_VERSION.set(self.index_version, collection=self.collection)
+    
+    def _build_shard_index(self, embeddings, generation=None):
+        if self.search_backend != 'sharded' or embeddings is None or len(embeddings) == 0:
+            return None
+        if self._shard_executor is None:
+            # One pool for every generation, so swaps never strand a reader on a closed pool
+            workers = max(self.num_shards or available_cpus(), len(self.shard_addresses))
+            self._shard_executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='shard')
+        if self.shard_addresses:
+            remote = None
+            try:
+                remote = ShardedIndex.connect(self.shard_addresses, executor=self._shard_executor)
+                remote.check_coverage(len(embeddings))
+                # Same rows aren't enough: an older save of the index can have them too
+                if remote.generation != generation:
+                    raise RuntimeError(f"remote shards serve generation {remote.generation}, index is {generation}")
+                return remote
+            except (OSError, EOFError, RuntimeError, ValueError) as e:
+                if remote is not None:
+                    remote.close()
+                print(f"⚠️ Not using remote shards: {str(e)}; searching locally")
+        return ShardedIndex.build(embeddings, num_shards=self.num_shards, executor=self._shard_executor)
+    
+    def memory_bytes(self):
+        """Rough resident size of the current generation: vectors plus about 3x the record text"""
+        with self._index_lock:
+            arrays = sum(a.nbytes for a in (self.embeddings, self.row_parents, self.clusters) if a is not None)
+            # Record text is held by the records, the text index and (when chunked) the passages
+            return arrays + 3 * self._record_bytes
+    
+    def is_writing(self):
+        """True while an ingest or append holds this pipeline"""
+        if not self._write_lock.acquire(blocking=False):
+            return True
+        self._write_lock.release()
+        return False
+    
+    def snapshot(self):
+        """Return a consistent (data, embeddings) pair for readers"""
+        with self._index_lock:
+            return self.data, self.embeddings
+    
+    def _index_state(self):
+        with self._index_lock:
+            return {
+                'data': self.data,
+                'embeddings': self.embeddings,
+                'row_parents': self.row_parents,
+                'chunks': self.chunks,
+                'clusters': self.clusters,
+                'cluster_members': self.cluster_members,
+                'corpus_stats': self.corpus_stats,
+                'text_index': self.text_index,
+                'shard_index': self.shard_index,
+                'query_normalizer': self.query_normalizer,
+                'index_version': self.index_version,
+                'index_generation': self.index_generation
+            }
+    
+    def stats(self):
+        """Cached corpus counts: {'total', 'categories', 'problems', 'codes'}; treat as read-only"""
+        with self._index_lock:
+            corpus_stats = self.corpus_stats
+        return corpus_stats.snapshot()
+    
+    def query_key(self, query):
+        """Cache key for a query: its normalized, order-insensitive form under the live index"""
+        with self._index_lock:
+            query_normalizer = self.query_normalizer
+        return query_normalizer.key(query)
+    
+    def text_search(self, term, fields=None, limit=20, offset=0, cursor=None):
+        """Substring search over name/description/problem/category with paging.
+        
+        Page by `offset`, or by passing the previous page's `next_cursor` as
+        `cursor`, which skips ahead without re-reading earlier matches.
+        Returns {'rows', 'interventions', 'total_count', 'offset', 'next_offset',
+        'next_cursor'}; the next_* keys are None on the last page.
+        """
+        state = self._index_state()
+        data = state['data']
+        # Ask for one extra row to learn whether another page exists
+        rows, total = state['text_index'].search(term, fields=fields, limit=limit + 1, offset=offset,
+                                                 max_row=len(data), after=cursor)
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        return {
+            'rows': rows,
+            'interventions': [data[row] for row in rows],
+            'total_count': total,
+            'offset': offset,
+            'next_offset': offset + len(rows) if has_more and cursor is None else None,
+            'next_cursor': rows[-1] if has_more else None
+        }
+    
+    def get_record(self, row):
+        """The full record at `row`, with derived fields rebuilt"""
+        data, _ = self.snapshot()
+        return expand_record(data[row])
+    
+    def _pool_chunks(self, ranked_rows, row_parents, chunks):
+        """Collapse row hits to parent records; returns ([(parent, similarity)], {parent: passage} or None)"""
+        best = {}
+        pooled = {}
+        for row, score in ranked_rows:
+            parent = int(row_parents[row])
+            if parent not in best or score > best[parent][1]:
+                best[parent] = (row, score)
+            pooled[parent] = pooled.get(parent, 0.0) + score if self.chunk_pooling == 'sum' else max(pooled.get(parent, score), score)
+        order = sorted(pooled, key=lambda parent: pooled[parent], reverse=True)
+        # similarity_score stays the best passage's cosine so thresholds keep their meaning
+        if chunks is None:
+            return [(parent, best[parent][1]) for parent in order], None
+        return [(parent, best[parent][1]) for parent in order], {parent: chunks[best[parent][0]] for parent in order}
+    
     def _create_composite_text(self, intervention):
         # Handle both old and new data formats
         # New format: problem, category, type, data, code, clause, content
@@ -57,11 +380,12 @@ class RoadSafetyEmbeddingPipeline:
         code = intervention.get('code', '')
         clause = intervention.get('clause', '')
         
-        # Extract content if available - this has the full formatted text
+        # Extract content if available, unless it only restates the fields above
         content = intervention.get('content', '')
+        if content and is_derived(intervention, 'content'):
+            content = ''
         
-        # Build comprehensive composite text for better embeddings
-        # Include all relevant information that users might search for
+        # Build a composite text that names each fact once
         parts = []
         
         # Primary identifiers
@@ -72,7 +396,7 @@ class RoadSafetyEmbeddingPipeline:
         if problem_types:
             parts.append(f"{problem_types}")
         
-        # Detailed description - use content if available as it's more comprehensive
+        # Detailed description - hand-written content if available, else the data field
         if content:
             parts.append(content)
         elif description:
@@ -101,23 +425,129 @@ class RoadSafetyEmbeddingPipeline:
         # Join with spaces for better embedding
         return " ".join(parts)
     
-    def search_interventions(self, query, top_k=5, min_similarity=0.3):
-        if self.embeddings is None or len(self.data) == 0:
+    def search_interventions(self, query, top_k=5, min_similarity=0.3, profile=False, rerank=None,
+                             collapse_duplicates=True):
+        """Semantic search; `rerank` (default: on when a reranker is configured) re-scores the candidate pool.
+        
+        On a deduplicated index each hit is a cluster representative. With
+        `collapse_duplicates=False` its near-duplicates follow it in the results.
+        The query is normalized first. Its embedding is cached by normalized key,
+        and its results by key, index generation and options; a result cache hit
+        is marked 'cached'. Profiled calls bypass the result cache.
+        """
+        use_rerank = self.reranker is not None if rerank is None else (rerank and self.reranker is not None)
+        with PROFILER.profile('search_interventions', force=profile):
+            return self._search_interventions(query, top_k, min_similarity, use_rerank, collapse_duplicates,
+                                              use_cache=not profile)
+    
+    def _search_interventions(self, query, top_k, min_similarity, use_rerank=False, collapse_duplicates=True,
+                              use_cache=True):
+        # Read one generation so a concurrent swap can't mix data and embeddings
+        state = self._index_state()
+        data, embeddings, row_parents, chunks = state['data'], state['embeddings'], state['row_parents'], state['chunks']
+        members = state['cluster_members']
+        if embeddings is None or len(data) == 0:
             return {'interventions': [], 'total_count': 0}
         
+        start = time.perf_counter()
+        text, key = state['query_normalizer'].normalize(query)
+        cache_key = (key, state['index_version'], top_k, min_similarity, use_rerank, collapse_duplicates)
+        if use_cache:
+            cached = self.result_cache.get(cache_key)
+            record_cache_lookup('search_results', cached is not None)
+            if cached is not None:
+                REQUESTS.inc(kind='search')
+                # Callers may annotate the interventions, so every hit gets its own copies
+                return {**cached, 'interventions': [dict(item) for item in cached['interventions']],
+                        'cached': True, 'timings': {'cache_s': time.perf_counter() - start}}
+        
         # Encode query
-        query_embedding = self.embedding_model.encode([query], normalize_embeddings=True)
+        query_embedding = self.embedding_cache.get(key)
+        record_cache_lookup('query_embedding', query_embedding is not None)
+        if query_embedding is None:
+            query_embedding = self.embedding_model.encode([text], normalize_embeddings=True)
+            self.embedding_cache.put(key, query_embedding)
+        encoded_at = time.perf_counter()
         
-        # Normalize embeddings for better cosine similarity
-        if self.embeddings is not None:
-            # Normalize embeddings
-            norms = np.linalg.norm(self.embeddings, axis=1, keepdims=True)
-            normalized_embeddings = self.embeddings / (norms + 1e-8)
-            
-            # Calculate cosine similarity
-            similarities = np.dot(normalized_embeddings, query_embedding.T).flatten()
+        timings = {'encode_s': encoded_at - start}
+        pool = max(top_k, self.reranker.candidate_pool) if use_rerank else top_k
+        matched_chunks = None
+        if row_parents is not None:
+            # Several passages can hit the same record, so over-fetch before pooling
+            rows_per_record = int(np.ceil(len(row_parents) / len(data)))
+            ranked_rows = self.rank(query_embedding, top_k=pool * (rows_per_record + 1), min_similarity=min_similarity,
+                                    embeddings=embeddings, timings=timings, shard_index=state['shard_index'])
+            ranked, matched_chunks = self._pool_chunks(ranked_rows, row_parents, chunks)
+            ranked = ranked[:pool]
         else:
-            return {'interventions': [], 'total_count': 0}
+            ranked = self.rank(query_embedding, top_k=pool, min_similarity=min_similarity, embeddings=embeddings,
+                               timings=timings, shard_index=state['shard_index'])
+        ranked_at = time.perf_counter()
+        timings['search_s'] = ranked_at - encoded_at
+        
+        rerank_scores = None
+        if use_rerank:
+            if matched_chunks is not None:
+                texts = [matched_chunks[idx] for idx, _ in ranked]
+            else:
+                texts = [self._create_composite_text(data[idx]) for idx, _ in ranked]
+            reranked = self.reranker.rerank(text, ranked, texts, [hash(t) for t in texts], top_k)
+            if reranked is not None:
+                ranked, rerank_scores = reranked
+            timings['rerank_s'] = time.perf_counter() - ranked_at
+            ranked_at = time.perf_counter()
+        ranked = ranked[:top_k]
+        if members and not collapse_duplicates:
+            # Duplicates share their representative's score; the index holds no vectors for them
+            ranked = [(member, score) for idx, score in ranked for member in members.get(idx, [idx])][:top_k]
+        
+        results = self.format_results(ranked, data)
+        if rerank_scores is not None:
+            for item, score in zip(results['interventions'], rerank_scores):
+                item['rerank_score'] = round(score, 4)
+        if matched_chunks is not None:
+            for item, (idx, _) in zip(results['interventions'], ranked):
+                if idx in matched_chunks:
+                    item['matched_chunk'] = matched_chunks[idx]
+        if state['clusters'] is not None:
+            for item, (idx, _) in zip(results['interventions'], ranked):
+                rep = int(state['clusters'][idx])
+                item['cluster_size'] = len(members.get(rep, [rep]))
+                if rep != idx:
+                    item['duplicate_of'] = data[rep].get('S. No.') or data[rep].get('type') or data[rep].get('name', '')
+        results['reranked'] = rerank_scores is not None
+        timings['format_s'] = time.perf_counter() - ranked_at
+        results['timings'] = timings
+        REQUESTS.inc(kind='search')
+        record_timings(timings)
+        # A skipped rerank is a transient budget decision; don't pin it under the rerank key
+        if use_cache and (not use_rerank or rerank_scores is not None):
+            self.result_cache.put(cache_key, {**results, 'interventions': [dict(item) for item in results['interventions']]})
+        return results
+    
+    def rank(self, query_embedding, top_k=5, min_similarity=0.3, embeddings=None, timings=None, shard_index=None):
+        """Return [(index, similarity)] for the best matches of an encoded query"""
+        if shard_index is not None:
+            try:
+                return self._rank_sharded(query_embedding, top_k, min_similarity, shard_index, timings)
+            except (OSError, EOFError, RuntimeError) as e:
+                # A shard server went away; fail over to local shards of the same generation
+                print(f"⚠️ Sharded search failed: {str(e) or type(e).__name__}; searching local shards")
+                shard_index = self._fail_over(shard_index, embeddings)
+                return self._rank_sharded(query_embedding, top_k, min_similarity, shard_index, timings)
+        if embeddings is None:
+            _, embeddings = self.snapshot()
+        if embeddings is None or len(embeddings) == 0:
+            return []
+        
+        start = time.perf_counter()
+        # Normalize embeddings for better cosine similarity
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        normalized_embeddings = embeddings / (norms + 1e-8)
+        
+        # Calculate cosine similarity
+        similarities = np.dot(normalized_embeddings, query_embedding.T).flatten()
+        scanned_at = time.perf_counter()
         
         # Get top k indices, but filter by minimum similarity
         top_indices = np.argsort(similarities)[::-1][:top_k * 2]  # Get more candidates
@@ -127,9 +557,43 @@ class RoadSafetyEmbeddingPipeline:
             # If no results meet threshold, return top results anyway
             filtered_indices = top_indices[:top_k]
         
+        if timings is not None:
+            timings['similarity_s'] = scanned_at - start
+            timings['topk_s'] = time.perf_counter() - scanned_at
+        return [(int(idx), float(similarities[idx])) for idx in filtered_indices]
+    
+    def _fail_over(self, failed, embeddings=None):
+        """Local shards replacing `failed`, installed as live if `failed` still is"""
+        with self._index_lock:
+            if embeddings is None and self.shard_index is failed:
+                embeddings = self.embeddings
+        if embeddings is None:
+            raise RuntimeError("Remote shards failed and the index they served is no longer loaded")
+        local = ShardedIndex.build(embeddings, num_shards=self.num_shards, executor=self._shard_executor)
+        with self._index_lock:
+            if self.shard_index is failed:
+                self.shard_index = local
+        failed.close()
+        return local
+    
+    def _rank_sharded(self, query_embedding, top_k, min_similarity, shard_index, timings=None):
+        start = time.perf_counter()
+        # Same candidate pool and threshold fallback as the brute-force path
+        candidates = shard_index.search(query_embedding, top_k * 2)
+        scanned_at = time.perf_counter()
+        ranked = [(row, sim) for row, sim in candidates if sim >= min_similarity][:top_k] or candidates[:top_k]
+        if timings is not None:
+            timings['similarity_s'] = scanned_at - start
+            timings['topk_s'] = time.perf_counter() - scanned_at
+        return ranked
+    
+    def format_results(self, ranked, data=None):
+        """Turn rank() output into the result dict returned by search_interventions"""
+        if data is None:
+            data, _ = self.snapshot()
         results = {'interventions': []}
-        for i, idx in enumerate(filtered_indices):
-            intervention = self.data[idx]
+        for i, (idx, score) in enumerate(ranked):
+            intervention = data[idx]
             
             # Handle both old and new data formats
             name = intervention.get('type', '') or intervention.get('name', '')
@@ -157,7 +621,7 @@ class RoadSafetyEmbeddingPipeline:
                 'name': name,
                 'problem_type': problem_type if isinstance(problem_type, list) else [problem_type] if problem_type else [],
                 'road_type': road_type if isinstance(road_type, list) else [road_type] if road_type else [],
-                'similarity_score': round(float(similarities[idx]), 4),
+                'similarity_score': round(score, 4),
                 'description': description,
                 'category': category,
                 'code': intervention.get('code', ''),
@@ -165,22 +629,32 @@ class RoadSafetyEmbeddingPipeline:
                 'type': intervention.get('type', ''),
                 'problem': intervention.get('problem', ''),
                 'data': intervention.get('data', ''),
-                'content': intervention.get('content', ''),
+                'content': expand_record(intervention).get('content', ''),
                 'S. No.': intervention.get('S. No.', '')
             })
         results['total_count'] = len(results['interventions'])
         return results
     
     def save_database(self):
-        with open(self.vector_db_path, 'wb') as f:
-            pickle.dump({'data': self.data, 'embeddings': self.embeddings}, f)
+        if not self.vector_db_path:
+            return
+        state = self._index_state()
+        # Write to a temp file first so readers never see a half-written index
+        tmp_path = self.vector_db_path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            saved = {key: state[key] for key in ('data', 'embeddings', 'row_parents', 'chunks', 'clusters')}
+            saved['generation'] = state['index_generation']
+            pickle.dump(saved, f)
+        os.replace(tmp_path, self.vector_db_path)
     
     def load_database(self):
         try:
             with open(self.vector_db_path, 'rb') as f:
                 saved_data = pickle.load(f)
-                self.data = saved_data['data']
-                self.embeddings = saved_data['embeddings']
+                # Indexes saved before generations existed are identified by file size and mtime
+                stat = os.fstat(f.fileno())
+                generation = saved_data.get('generation') or f"{stat.st_size:x}-{stat.st_mtime_ns:x}"
+                self.swap_index(saved_data['data'], saved_data['embeddings'], saved_data.get('row_parents'),
+                                saved_data.get('chunks'), saved_data.get('clusters'), generation=generation)
         except:
-            self.data = []
-            self.embeddings = None
+            self.swap_index([], None)
@@ -0,0 +1,106 @@
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+
+class IndexingJob:
+    """Status record for one background re-indexing run"""
+
+    def __init__(self, label, total):
+        self.job_id = uuid.uuid4().hex[:12]
+        self.label = label
+        self.status = 'queued'
+        self.processed = 0
+        self.total = total
+        self.error = None
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+
+    @property
+    def progress(self):
+        if self.total == 0:
+            return 1.0 if self.status == 'done' else 0.0
+        return self.processed / self.total
+
+    @property
+    def finished(self):
+        return self.status in ('done', 'failed')
+
+    def to_dict(self):
+        return {
+            'job_id': self.job_id,
+            'label': self.label,
+            'status': self.status,
+            'processed': self.processed,
+            'total': self.total,
+            'progress': round(self.progress, 4),
+            'error': self.error,
+            'submitted_at': self.submitted_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at
+        }
+
+
+class IndexingWorker:
+    """Builds new indexes off the request path and swaps them into the pipeline.
+
+    Jobs run one at a time in submission order, so the last upload always wins.
+    Searches keep reading the previous generation until the swap happens.
+    """
+
+    def __init__(self, pipeline):
+        self.pipeline = pipeline
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='indexer')
+        self.jobs = {}
+        self._lock = threading.Lock()
+        self._latest_job_id = None
+
+    def submit(self, interventions_data, label='', append=False, pipeline=None):
+        """Queue a re-index; with append=True the records are added to the current index.
+
+        `pipeline` targets another index (e.g. a named collection) instead of the worker's own.
+        """
+        job = IndexingJob(label, len(interventions_data or []))
+        with self._lock:
+            self.jobs[job.job_id] = job
+            self._latest_job_id = job.job_id
+        self.executor.submit(self._run, job, interventions_data, append, pipeline or self.pipeline)
+        return job
+
+    def _run(self, job, interventions_data, append, pipeline):
+        job.status = 'running'
+        job.started_at = time.time()
+
+        def on_progress(processed, total):
+            job.processed = processed
+
+        try:
+            if not interventions_data:
+                raise ValueError("No interventions found in upload")
+            if append:
+                pipeline.append_interventions_to_db(interventions_data, progress_callback=on_progress)
+            else:
+                pipeline.add_interventions_to_db(interventions_data, progress_callback=on_progress)
+            job.status = 'done'
+        except Exception as e:
+            job.error = str(e)
+            job.status = 'failed'
+        finally:
+            job.finished_at = time.time()
+
+    def get_job(self, job_id):
+        with self._lock:
+            return self.jobs.get(job_id)
+
+    def latest_job(self):
+        with self._lock:
+            return self.jobs.get(self._latest_job_id)
+
+    def active_jobs(self):
+        with self._lock:
+            return [job for job in self.jobs.values() if not job.finished]
+
+    def shutdown(self, wait=True):
+        self.executor.shutdown(wait=wait)
@@ -0,0 +1,259 @@
+"""Pluggable LLM generator backends for RoadSafetyRAG.
+
+Every backend implements chat(messages) and generate(prompt). Both stream
+internally, call `on_token` for each text fragment, and fill an optional
+`stats` dict with ttft_s, generation_s, llm_s, prompt_tokens and
+completion_tokens. `capabilities` tells callers how hard a backend can be driven.
+Any failure, at connect time or mid-stream, raises BackendError.
+
+Pick one with LLM_BACKEND=ollama|openai|mock, or pass a backend to RoadSafetyRAG.
+"""
+import hashlib
+import http.client
+import json
+import os
+import subprocess
+import time
+import urllib.error
+import urllib.request
+
+
+class BackendError(Exception):
+    """The generator could not produce an answer; the message is safe to show to users"""
+
+
+class BackendCapabilities:
+    def __init__(self, streaming=True, batching=False, max_concurrency=1):
+        self.streaming = streaming
+        # Whether the server batches concurrent requests together (continuous batching)
+        self.batching = batching
+        self.max_concurrency = max_concurrency
+
+    def to_dict(self):
+        return {'streaming': self.streaming, 'batching': self.batching, 'max_concurrency': self.max_concurrency}
+
+
+class _StreamTimer:
+    """Collects streamed text and the timing stats shared by every backend"""
+
+    def __init__(self, stats, on_token):
+        self.stats = stats if stats is not None else {}
+        self.on_token = on_token
+        self.start = time.perf_counter()
+        self.first_token_at = None
+        self.parts = []
+
+    def add(self, text):
+        if not text:
+            return
+        if self.first_token_at is None:
+            self.first_token_at = time.perf_counter()
+        self.parts.append(text)
+        if self.on_token:
+            self.on_token(text)
+
+    def finish(self, prompt_tokens=None, completion_tokens=None):
+        end = time.perf_counter()
+        first_token_at = self.first_token_at or end
+        self.stats['ttft_s'] = first_token_at - self.start
+        self.stats['generation_s'] = end - first_token_at
+        self.stats['llm_s'] = end - self.start
+        self.stats['prompt_tokens'] = prompt_tokens
+        self.stats['completion_tokens'] = completion_tokens
+        return ''.join(self.parts).strip()
+
+
+class GeneratorBackend:
+    name = 'base'
+
+    def __init__(self, model, host=None, capabilities=None):
+        self.model = model
+        self.host = host
+        self.capabilities = capabilities or BackendCapabilities()
+
+    def chat(self, messages, stats=None, on_token=None):
+        raise NotImplementedError
+
+    def generate(self, prompt, stats=None, on_token=None):
+        return self.chat([{'role': 'user', 'content': prompt}], stats=stats, on_token=on_token)
+
+
+def _post_lines(url, body, timeout, headers=None):
+    request = urllib.request.Request(
+        url,
+        data=json.dumps(body).encode('utf-8'),
+        headers={'Content-Type': 'application/json', **(headers or {})}
+    )
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        for line in response:
+            line = line.strip()
+            if line:
+                yield line.decode('utf-8')
+
+
+class OllamaBackend(GeneratorBackend):
+    """Ollama via its Python client, the HTTP API, or the `ollama run` CLI as a last resort"""
+    name = 'ollama'
+
+    def __init__(self, model=None, host=None, keep_alive=None, timeout=60, max_concurrency=None):
+        host = host or os.getenv('OLLAMA_HOST', 'http://localhost:11434')
+        if '://' not in host:
+            host = 'http://' + host
+        if max_concurrency is None:
+            max_concurrency = int(os.getenv('OLLAMA_NUM_PARALLEL', '1'))
+        super().__init__(
+            model or os.getenv('OLLAMA_MODEL', 'llama3.2:3b'),
+            host,
+            BackendCapabilities(streaming=True, batching=False, max_concurrency=max_concurrency)
+        )
+        # Keep the model (and its prompt cache) loaded between requests
+        self.keep_alive = keep_alive or os.getenv('OLLAMA_KEEP_ALIVE', '30m')
+        self.timeout = timeout
+
+    def chat(self, messages, stats=None, on_token=None):
+        flat_prompt = "\n\n".join(m['content'] for m in messages)
+        return self._call('chat', {'messages': messages}, flat_prompt, stats, on_token)
+
+    def generate(self, prompt, stats=None, on_token=None):
+        return self._call('generate', {'prompt': prompt}, prompt, stats, on_token)
+
+    def _call(self, endpoint, payload, flat_prompt, stats, on_token):
+        timer = _StreamTimer(stats, on_token)
+        try:
+            # Try using ollama Python client first (if installed)
+            try:
+                import ollama
+                client = ollama.Client(host=self.host)
+                call = client.chat if endpoint == 'chat' else client.generate
+                chunks = call(model=self.model, stream=True, keep_alive=self.keep_alive, **payload)
+                return self._consume(chunks, timer)
+            except ImportError:
+                pass
+            # Talk to the Ollama HTTP API directly
+            try:
+                body = {'model': self.model, 'stream': True, 'keep_alive': self.keep_alive, **payload}
+                lines = _post_lines(f"{self.host}/api/{endpoint}", body, self.timeout)
+                return self._consume((json.loads(line) for line in lines), timer)
+            except urllib.error.HTTPError as e:
+                raise BackendError(f"Ollama error: {e.read().decode('utf-8', 'replace')}")
+            except urllib.error.URLError:
+                # No server reachable, fallback to subprocess
+                result = subprocess.run(
+                    ['ollama', 'run', self.model, flat_prompt],
+                    capture_output=True, text=True, timeout=self.timeout
+                )
+                if result.returncode == 0:
+                    timer.add(result.stdout)
+                    return timer.finish()
+                else:
+                    raise BackendError(f"Ollama error: {result.stderr}")
+        except BackendError:
+            raise
+        except (subprocess.TimeoutExpired, TimeoutError):
+            raise BackendError("Ollama request timed out. Please try again with a shorter query.")
+        except FileNotFoundError:
+            raise BackendError("Ollama is not installed or not in PATH. Please install Ollama from https://ollama.ai")
+        except Exception as e:
+            raise BackendError(f"Error connecting to Ollama: {str(e)}. Please ensure Ollama is running.")
+
+    def _consume(self, chunks, timer):
+        last = {}
+        for chunk in chunks:
+            # generate streams 'response'; chat streams 'message': {'content': ...}
+            message = chunk.get('message')
+            timer.add(message.get('content', '') if message else chunk.get('response', ''))
+            last = chunk
+        return timer.finish(last.get('prompt_eval_count'), last.get('eval_count'))
+
+
+class OpenAICompatibleBackend(GeneratorBackend):
+    """Any server speaking the OpenAI chat completions API: llama.cpp server, vLLM, LM Studio..."""
+    name = 'openai'
+
+    def __init__(self, model=None, host=None, api_key=None, timeout=60, max_concurrency=None, batching=True):
+        if max_concurrency is None:
+            max_concurrency = int(os.getenv('LLM_MAX_CONCURRENCY', '4'))
+        super().__init__(
+            model or os.getenv('LLM_MODEL', 'local-model'),
+            (host or os.getenv('OPENAI_BASE_URL', 'http://localhost:8080/v1')).rstrip('/'),
+            BackendCapabilities(streaming=True, batching=batching, max_concurrency=max_concurrency)
+        )
+        self.api_key = api_key or os.getenv('OPENAI_API_KEY', '')
+        self.timeout = timeout
+
+    def chat(self, messages, stats=None, on_token=None):
+        timer = _StreamTimer(stats, on_token)
+        body = {
+            'model': self.model,
+            'messages': messages,
+            'stream': True,
+            'stream_options': {'include_usage': True}
+        }
+        headers = {'Authorization': f"Bearer {self.api_key}"} if self.api_key else {}
+        usage = {}
+        done = False
+        try:
+            for line in _post_lines(f"{self.host}/chat/completions", body, self.timeout, headers):
+                # Server-sent events: "data: {...}" lines, terminated by "data: [DONE]"
+                if not line.startswith('data:'):
+                    continue
+                data = line[len('data:'):].strip()
+                if data == '[DONE]':
+                    done = True
+                    break
+                event = json.loads(data)
+                for choice in event.get('choices') or []:
+                    timer.add((choice.get('delta') or {}).get('content') or '')
+                usage = event.get('usage') or usage
+        except urllib.error.HTTPError as e:
+            raise BackendError(f"LLM server error: {e.read().decode('utf-8', 'replace')}")
+        except (urllib.error.URLError, TimeoutError) as e:
+            raise BackendError(f"Error connecting to LLM server at {self.host}: {str(e)}")
+        except (OSError, http.client.HTTPException, ValueError) as e:
+            # Connection reset, truncated body or a malformed event after the stream started
+            raise BackendError(f"LLM server at {self.host} broke off the response: {str(e)}")
+        if not done:
+            raise BackendError(f"LLM server at {self.host} broke off the response before [DONE]")
+        return timer.finish(usage.get('prompt_tokens'), usage.get('completion_tokens'))
+
+
+class MockBackend(GeneratorBackend):
+    """In-process, deterministic generator for tests and load tests without a model.
+
+    The same messages always produce the same text. Latency and token rate are
+    simulated with sleeps, so concurrency behaviour stays realistic.
+    """
+    name = 'mock'
+
+    def __init__(self, model='mock', latency=0.0, token_rate=0.0, response_tokens=32, max_concurrency=64):
+        super().__init__(model, 'mock://', BackendCapabilities(streaming=True, batching=True, max_concurrency=max_concurrency))
+        self.latency = latency
+        self.token_rate = token_rate
+        self.response_tokens = response_tokens
+
+    def chat(self, messages, stats=None, on_token=None):
+        timer = _StreamTimer(stats, on_token)
+        prompt = "\n\n".join(m['content'] for m in messages)
+        digest = hashlib.sha256(prompt.encode('utf-8')).hexdigest()
+        if self.latency:
+            time.sleep(self.latency)
+        for i in range(self.response_tokens):
+            if self.token_rate:
+                time.sleep(1.0 / self.token_rate)
+            timer.add(f"{'mock' if i == 0 else digest[i % len(digest)]} ")
+        return timer.finish(max(1, len(prompt) // 4), self.response_tokens)
+
+
+BACKENDS = {
+    'ollama': OllamaBackend,
+    'openai': OpenAICompatibleBackend,
+    'mock': MockBackend
+}
+
+
+def create_backend(name=None, **kwargs):
+    """Instantiate a backend by name, defaulting to LLM_BACKEND (or ollama)"""
+    name = (name or os.getenv('LLM_BACKEND', 'ollama')).strip().lower()
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown LLM backend '{name}'; choose from {', '.join(BACKENDS)}")
+    return BACKENDS[name](**kwargs)
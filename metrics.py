@@ -0,0 +1,204 @@
+"""Process-wide metrics with a Prometheus text exporter.
+
+Histograms, counters and gauges are kept in a module-level REGISTRY. The
+pipeline and RAG record into it on every call. start_metrics_server() serves
+REGISTRY.render() on /metrics for Prometheus to scrape.
+"""
+import bisect
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+TOKEN_BUCKETS = (16, 32, 64, 128, 256, 512, 1024, 2048, 4096, 8192)
+
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    escaped = [(k, str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')) for k, v in pairs]
+    return '{' + ','.join(f'{k}="{v}"' for k, v in escaped) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = 'untyped'
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if set(labels) != set(self.label_names):
+            raise ValueError(f"{self.name} expects labels {self.label_names}, got {tuple(labels)}")
+        return tuple(labels[name] for name in self.label_names)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.extend(self._render_value(key, value))
+        return lines
+
+    def _render_value(self, key, value):
+        return [f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}"]
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def get(self, **labels):
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+
+class Gauge(_Metric):
+    kind = 'gauge'
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def get(self, **labels):
+        with self._lock:
+            return self._values.get(self._key(labels))
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = {'counts': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            index = bisect.bisect_left(self.buckets, value)
+            if index < len(self.buckets):
+                state['counts'][index] += 1
+            state['sum'] += value
+            state['count'] += 1
+
+    def _render_value(self, key, state):
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets, state['counts']):
+            cumulative += count
+            lines.append(f"{self.name}_bucket{_format_labels(self.label_names, key, ('le', _format_value(float(bound))))} {cumulative}")
+        lines.append(f"{self.name}_bucket{_format_labels(self.label_names, key, ('le', '+Inf'))} {state['count']}")
+        lines.append(f"{self.name}_sum{_format_labels(self.label_names, key)} {_format_value(state['sum'])}")
+        lines.append(f"{self.name}_count{_format_labels(self.label_names, key)} {state['count']}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name, documentation, labels=()):
+        return self._register(Counter(name, documentation, labels))
+
+    def gauge(self, name, documentation, labels=()):
+        return self._register(Gauge(name, documentation, labels))
+
+    def histogram(self, name, documentation, labels=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(name, documentation, labels, buckets))
+
+    def render(self):
+        """Prometheus text exposition format (version 0.0.4)"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = MetricsRegistry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    'road_safety_stage_seconds', 'Time spent in each retrieval and generation stage', labels=('stage',))
+LLM_TOKENS = REGISTRY.histogram(
+    'road_safety_llm_tokens', 'Tokens per LLM call', labels=('kind',), buckets=TOKEN_BUCKETS)
+REQUESTS = REGISTRY.counter(
+    'road_safety_requests_total', 'Search and recommendation requests served', labels=('kind',))
+ANSWERS = REGISTRY.counter(
+    'road_safety_answers_total', 'Recommendations by answer source (llm, extractive, none)', labels=('source',))
+CORPUS_SIZE = REGISTRY.gauge(
+    'road_safety_corpus_size', 'Interventions in the live index', labels=('collection',))
+INDEX_VERSION = REGISTRY.gauge(
+    'road_safety_index_version', 'Generation number of the live index', labels=('collection',))
+CACHE_LOOKUPS = REGISTRY.counter(
+    'road_safety_cache_lookups_total', 'Cache lookups by outcome', labels=('cache', 'result'))
+CACHE_HIT_RATIO = REGISTRY.gauge(
+    'road_safety_cache_hit_ratio', 'Fraction of lookups served from cache', labels=('cache',))
+
+
+def record_timings(timings, keys=None):
+    """Observe every `<stage>_s` entry of a timings dict in STAGE_SECONDS"""
+    for key, value in timings.items():
+        if key.endswith('_s') and value is not None and (keys is None or key in keys):
+            STAGE_SECONDS.observe(value, stage=key[:-2])
+
+
+def record_cache_lookup(cache, hit):
+    CACHE_LOOKUPS.inc(cache=cache, result='hit' if hit else 'miss')
+    hits = CACHE_LOOKUPS.get(cache=cache, result='hit')
+    total = hits + CACHE_LOOKUPS.get(cache=cache, result='miss')
+    CACHE_HIT_RATIO.set(hits / total, cache=cache)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.split('?')[0] != '/metrics':
+            self.send_response(404)
+            self.end_headers()
+            return
+        body = self.server.registry.render().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def start_metrics_server(port, host='0.0.0.0', registry=REGISTRY):
+    """Serve /metrics from a daemon thread and return the server"""
+    httpd = ThreadingHTTPServer((host, port), _MetricsHandler)
+    httpd.daemon_threads = True
+    httpd.registry = registry
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    return httpd
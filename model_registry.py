@@ -0,0 +1,80 @@
+import threading
+
+DEFAULT_ENCODER = 'all-MiniLM-L6-v2'
+
+
+def _load_encoder(model_name, backend, device):
+    from sentence_transformers import SentenceTransformer
+    kwargs = {'device': device}
+    # Only newer sentence-transformers releases accept `backend`; torch is their default
+    if backend and backend != 'torch':
+        kwargs['backend'] = backend
+    return SentenceTransformer(model_name, **kwargs)
+
+
+def _load_cross_encoder(model_name, backend, device):
+    from sentence_transformers import CrossEncoder
+    kwargs = {'device': device}
+    if backend and backend != 'torch':
+        kwargs['backend'] = backend
+    return CrossEncoder(model_name, **kwargs)
+
+
+LOADERS = {
+    'encoder': _load_encoder,
+    'cross-encoder': _load_cross_encoder
+}
+
+
+class ModelRegistry:
+    """Process-wide cache of loaded models, keyed by (kind, name, backend, device).
+
+    Every pipeline, RAG instance and Streamlit session in the process gets
+    the same object for the same key, so each model is loaded into memory
+    once. Loads of different keys run in parallel. Concurrent requests for
+    one key wait for a single load.
+    """
+
+    def __init__(self):
+        self._models = {}
+        self._key_locks = {}
+        self._lock = threading.Lock()
+
+    def get(self, kind, model_name, backend='torch', device=None):
+        key = (kind, model_name, backend or 'torch', device)
+        with self._lock:
+            if key in self._models:
+                return self._models[key]
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        with key_lock:
+            with self._lock:
+                if key in self._models:
+                    return self._models[key]
+            model = LOADERS[kind](model_name, backend, device)
+            with self._lock:
+                self._models[key] = model
+            return model
+
+    def put(self, kind, model_name, model, backend='torch', device=None):
+        """Register an already-loaded model, e.g. a test double"""
+        with self._lock:
+            self._models[(kind, model_name, backend or 'torch', device)] = model
+
+    def loaded(self):
+        with self._lock:
+            return list(self._models)
+
+    def evict(self, kind, model_name, backend='torch', device=None):
+        with self._lock:
+            return self._models.pop((kind, model_name, backend or 'torch', device), None)
+
+
+MODELS = ModelRegistry()
+
+
+def get_encoder(model_name=DEFAULT_ENCODER, backend='torch', device=None):
+    return MODELS.get('encoder', model_name, backend, device)
+
+
+def get_cross_encoder(model_name, backend='torch', device=None):
+    return MODELS.get('cross-encoder', model_name, backend, device)
@@ -1,88 +1,29 @@
-import subprocess
-import json
+import copy
 import os
+import threading
+import time
+from admission import AdmissionController, AdmissionRejected
+from answer_store import AnswerStore, QueryLog
+from collection_manager import DEFAULT_COLLECTION
+from context_builder import ContextBuilder
 from embedding_pipeline import RoadSafetyEmbeddingPipeline
+from llm_backends import BackendError, create_backend
+from metrics import ANSWERS, LLM_TOKENS, REQUESTS, record_cache_lookup, record_timings
+from profiling import PROFILER
+from singleflight import SingleFlight
 
-class RoadSafetyRAG:
-    def __init__(self):
-        self.pipeline = RoadSafetyEmbeddingPipeline()
-        self.ollama_model = os.getenv('OLLAMA_MODEL', 'llama3.2:3b')
-    
-    def query_ollama(self, prompt):
-        """Query Ollama LLM with improved error handling"""
-        try:
-            # Try using ollama Python client first (if installed)
-            try:
-                import ollama
-                response = ollama.generate(model=self.ollama_model, prompt=prompt)
-                return response.get('response', '').strip()
-            except ImportError:
-                # Fallback to subprocess
-                result = subprocess.run(
-                    ['ollama', 'run', self.ollama_model, prompt],
-                    capture_output=True, text=True, timeout=60
-                )
-                if result.returncode == 0:
-                    return result.stdout.strip()
-                else:
-                    return f"Ollama error: {result.stderr}"
-        except subprocess.TimeoutExpired:
-            return "Ollama request timed out. Please try again with a shorter query."
-        except FileNotFoundError:
-            return "Ollama is not installed or not in PATH. Please install Ollama from https://ollama.ai"
-        except Exception as e:
-            return f"Error connecting to Ollama: {str(e)}. Please ensure Ollama is running."
-    
-    def get_recommendations(self, user_query, top_k=3):
-        """Get AI-powered recommendations based on retrieved interventions"""
-        retrieved = self.pipeline.search_interventions(user_query, top_k=top_k)
-        
-        if not retrieved['interventions']:
-            return {
-                "query": user_query,
-                "retrieved_interventions": [],
-                "recommendation": "No relevant interventions found for your query. Please try rephrasing or upload more intervention data."
-            }
-        
-        # Build comprehensive context
-        context_parts = []
-        for i, item in enumerate(retrieved['interventions']):
-            name = item.get('name', 'N/A')
-            description = item.get('description', 'N/A')
-            problem_types = item.get('problem_type', [])
-            if not problem_types:
-                problem = item.get('problem', '')
-                if problem:
-                    problem_types = [problem]
-            
-            problem_str = ', '.join(problem_types) if problem_types else 'N/A'
-            category = item.get('category', '')
-            code = item.get('code', '')
-            clause = item.get('clause', '')
-            
-            context_parts.append(
-                f"{i+1}. {name}\n"
-                f"   - Category: {category if category else 'N/A'}\n"
-                f"   - Problem: {problem_str}\n"
-                f"   - Description: {description}\n"
-                f"   - Code: {code if code else 'N/A'}\n"
-                f"   - Clause: {clause if clause else 'N/A'}\n"
-                f"   - Similarity Score: {item.get('similarity_score', 0):.3f}"
-            )
-        
-        context = "\n\n".join(context_parts)
-        
-        prompt = f"""You are an expert road safety consultant with deep knowledge of IRC codes and road safety standards. 
+# Stages timed by get_recommendations itself; retrieval stages are recorded by the pipeline
+RAG_STAGES = ('context_build_s', 'prompt_build_s', 'queue_s', 'ttft_s', 'generation_s', 'llm_s', 'enrich_s', 'extractive_s', 'total_s')
 
-User Query: "{user_query}"
+# Identical on every request so Ollama can reuse its KV cache for this prefix.
+# Anything request-specific belongs in the user message built by build_messages().
+SYSTEM_PROMPT = """You are an expert road safety consultant with deep knowledge of IRC codes and road safety standards.
 
-Based on the following relevant road safety interventions retrieved from the database, provide a detailed, actionable recommendation:
-
-{context}
+Each message gives you a user query and the relevant road safety interventions retrieved from the database. Based on those interventions, provide a detailed, actionable recommendation.
 
 Please provide a comprehensive response that includes:
 
-1. **Recommended Solution**: Clearly state which intervention(s) from the list above best addresses the user's query. Reference the specific intervention by name/type.
+1. **Recommended Solution**: Clearly state which intervention(s) from the list best addresses the user's query. Reference the specific intervention by name/type.
 
 2. **Why This Solution**: Explain in detail why this intervention is suitable for the specific problem mentioned in the query. Reference the technical details (code, clause) provided.
 
@@ -103,14 +44,136 @@ Please provide a comprehensive response that includes:
 
 Format your response in clear, professional language suitable for road safety planning. Be specific and reference the intervention details provided. Use bullet points for clarity."""
 
-        response = self.query_ollama(prompt)
+class RoadSafetyRAG:
+    def __init__(self, backend=None, pipeline=None, collections=None):
+        # Optional CollectionManager; requests can then name the collection to search
+        self.collections = collections
+        if pipeline is None:
+            pipeline = collections.get() if collections is not None else RoadSafetyEmbeddingPipeline()
+        self.pipeline = pipeline
+        # Generator backend (ollama, openai-compatible or mock); LLM_BACKEND picks the default
+        self.backend = backend or create_backend()
+        # Admission control so a single local model isn't thrashed by unlimited concurrent calls
+        self.admission = AdmissionController(
+            max_concurrency=self.backend.capabilities.max_concurrency,
+            max_queue_depth=int(os.getenv('LLM_MAX_QUEUE', '16')),
+            queue_timeout=float(os.getenv('LLM_QUEUE_TIMEOUT', '60'))
+        )
+        # Extractive fast path: skip the LLM when one intervention clearly answers the query
+        self.fast_path_enabled = os.getenv('RAG_FAST_PATH', '').strip().lower() in ('1', 'true', 'yes', 'on')
+        self.fast_path_threshold = float(os.getenv('RAG_FAST_PATH_THRESHOLD', '0.75'))
+        self.fast_path_margin = float(os.getenv('RAG_FAST_PATH_MARGIN', '0.08'))
+        # Identical concurrent requests share one computation (RAG_COALESCE=0 disables)
+        self.coalesce_enabled = os.getenv('RAG_COALESCE', '1').strip().lower() not in ('0', 'false', 'no', 'off')
+        self.inflight = SingleFlight('recommendation')
+        # Answers precomputed for frequent queries (see warm_answers.py); RAG_PRECOMPUTED=0 disables serving them
+        self.precomputed_enabled = os.getenv('RAG_PRECOMPUTED', '1').strip().lower() not in ('0', 'false', 'no', 'off')
+        self.answers = AnswerStore()
+        self.query_log = QueryLog()
+        self._checked_generations = {}
+        self._refreshing = set()
+        self._refresh_lock = threading.Lock()
+        self.context_builder = ContextBuilder(
+            token_budget=int(os.getenv('RAG_CONTEXT_TOKENS', '800')),
+            tokenizer=self._load_tokenizer(os.getenv('RAG_TOKENIZER'))
+        )
+    
+    # Kept for callers that predate pluggable backends
+    @property
+    def ollama_model(self):
+        return self.backend.model
+    
+    @ollama_model.setter
+    def ollama_model(self, model):
+        self.backend.model = model
+    
+    @property
+    def ollama_host(self):
+        return self.backend.host
+    
+    @ollama_host.setter
+    def ollama_host(self, host):
+        self.backend.host = host
+    
+    def _load_tokenizer(self, name):
+        """Optional Hugging Face tokenizer for exact counts; falls back to an estimate"""
+        if not name:
+            return None
+        try:
+            from transformers import AutoTokenizer
+            return AutoTokenizer.from_pretrained(name)
+        except Exception as e:
+            print(f"⚠️ Could not load tokenizer {name}, estimating tokens instead: {str(e)}")
+            return None
+    
+    def query_ollama(self, prompt, stats=None, profile=False, on_token=None):
+        """Send a single prompt to the generator backend.
         
-        # Enhance retrieved interventions with full data
+        Responses are streamed so time-to-first-token and generation time can be
+        reported through the optional `stats` dict.
+        """
+        with PROFILER.profile('query_ollama', force=profile):
+            return self.backend.generate(prompt, stats=stats, on_token=on_token)
+    
+    def chat_ollama(self, messages, stats=None, profile=False, on_token=None):
+        """Like query_ollama, but sends role-tagged messages"""
+        with PROFILER.profile('query_ollama', force=profile):
+            return self.backend.chat(messages, stats=stats, on_token=on_token)
+    
+    def build_messages(self, user_query, context):
+        """Stable system prompt first, then the request-specific query and context"""
+        return [
+            {'role': 'system', 'content': SYSTEM_PROMPT},
+            {'role': 'user', 'content': (
+                f'User Query: "{user_query}"\n\n'
+                f"Relevant road safety interventions retrieved from the database:\n\n{context}"
+            )}
+        ]
+    
+    def is_decisive(self, interventions):
+        """True when the top hit is strong enough and clearly ahead of the runner-up"""
+        if not interventions:
+            return False
+        top = interventions[0].get('similarity_score', 0)
+        runner_up = interventions[1].get('similarity_score', 0) if len(interventions) > 1 else 0
+        return top >= self.fast_path_threshold and top - runner_up >= self.fast_path_margin
+    
+    def extractive_answer(self, intervention):
+        """Templated answer built straight from one intervention's fields"""
+        name = intervention.get('type') or intervention.get('name') or 'N/A'
+        category = intervention.get('category')
+        code = intervention.get('code')
+        clause = intervention.get('clause')
+        problem = intervention.get('problem') or ', '.join(intervention.get('problem_type', []))
+        details = intervention.get('data') or intervention.get('description') or ''
+        
+        reference = ', '.join(part for part in [code, f"Clause {clause}" if clause else ''] if part)
+        lines = [f"**Recommended Solution**: {name}" + (f" ({category})" if category else '')]
+        if reference:
+            lines.append(f"**Standard**: {reference}")
+        if problem:
+            lines.append(f"**Problem Addressed**: {problem}")
+        if details:
+            lines.append(f"**Specifications**:\n\n{details}")
+        lines.append(f"_Answered directly from the matching intervention "
+                     f"(relevance {intervention.get('similarity_score', 0):.3f})._")
+        return "\n\n".join(lines)
+    
+    def pipeline_for(self, collection=None):
+        """The pipeline serving `collection`; None means this instance's own pipeline"""
+        if collection is None:
+            return self.pipeline
+        if self.collections is None:
+            raise ValueError("No collection manager configured")
+        return self.collections.get(collection)
+    
+    def _enrich(self, interventions, pipeline=None):
+        pipeline = pipeline or self.pipeline
         enhanced_interventions = []
-        for item in retrieved['interventions']:
+        for item in interventions:
             # Find full intervention data - match by name or type
             full_data = None
-            for i in self.pipeline.data:
+            for i in pipeline.data:
                 if (i.get('name') == item.get('name') or 
                     i.get('type') == item.get('name') or
                     i.get('type') == item.get('type')):
@@ -135,9 +198,260 @@ Format your response in clear, professional language suitable for road safety pl
                 'problem': full_data.get('problem', item.get('problem', 'N/A'))
             }
             enhanced_interventions.append(enhanced_item)
+        return enhanced_interventions
+    
+    def _generate(self, user_query, interventions, timings, profile=False, priority=0, on_queue_position=None,
+                  on_token=None):
+        """Build the prompt for the retrieved interventions and run the LLM; returns (text, usage).
         
-        return {
+        Raises AdmissionRejected when no LLM slot frees up before the queue deadline,
+        and BackendError when the generator fails.
+        """
+        # Build comprehensive context
+        stage_start = time.perf_counter()
+        context, context_info = self.context_builder.build(interventions)
+        timings['context_build_s'] = time.perf_counter() - stage_start
+        
+        stage_start = time.perf_counter()
+        messages = self.build_messages(user_query, context)
+        timings['prompt_build_s'] = time.perf_counter() - stage_start
+        
+        llm_stats = {}
+        with self.admission.acquire(priority=priority, on_position=on_queue_position) as waited_s:
+            timings['queue_s'] = waited_s
+            response = self.chat_ollama(messages, stats=llm_stats, profile=profile, on_token=on_token)
+        timings.update({k: v for k, v in llm_stats.items() if k.endswith('_s')})
+        if llm_stats.get('prompt_tokens'):
+            LLM_TOKENS.observe(llm_stats['prompt_tokens'], kind='prompt')
+        if llm_stats.get('completion_tokens'):
+            LLM_TOKENS.observe(llm_stats['completion_tokens'], kind='completion')
+        
+        return response, {
+            "prompt_chars": sum(len(m['content']) for m in messages),
+            "context_tokens": context_info['tokens'],
+            "context_records": context_info['included'],
+            "context_truncated": context_info['truncated'],
+            "context_dropped": context_info['dropped'],
+            "prompt_tokens": llm_stats.get('prompt_tokens'),
+            "completion_tokens": llm_stats.get('completion_tokens')
+        }
+    
+    def get_recommendations(self, user_query, top_k=3, profile=False, fast_path=None, llm_followup=False,
+                            priority=0, on_queue_position=None, on_token=None, collection=None):
+        """Get AI-powered recommendations based on retrieved interventions.
+        
+        `profile=True` captures search_interventions and query_ollama for this request.
+        With `fast_path` on (defaults to RAG_FAST_PATH) and a decisive top hit, the
+        answer is templated from that intervention and the LLM is skipped;
+        `llm_followup=True` still adds the LLM answer as 'detailed_recommendation'.
+        LLM calls queue by `priority` (lower first); `on_queue_position(n)` is called
+        while waiting, and a busy system yields answer_source 'rejected'. A failed
+        generation yields answer_source 'error'; if it was only the follow-up to a
+        fast-path answer, that answer is kept and 'followup_error' is set.
+        `on_token` receives the LLM output as it streams. `collection` searches a
+        named collection from the collection manager instead of the default pipeline.
+        
+        Concurrent calls with the same normalized query and parameters share one
+        computation and its token stream; joiners get a copy marked 'coalesced'.
+        A precomputed answer for the current index generation is returned at
+        once, marked 'precomputed'.
+        """
+        use_fast_path = self.fast_path_enabled if fast_path is None else fast_path
+        pipeline = self.pipeline_for(collection)
+        self.query_log.record(user_query, collection, top_k)
+        
+        stored_key = None
+        if self.precomputed_enabled and not profile:
+            start = time.perf_counter()
+            self._refresh_if_index_changed(collection, pipeline)
+            stored_key = self.answers.key(collection, pipeline.query_key(user_query), top_k, use_fast_path, llm_followup)
+            precomputed = self.answers.get(stored_key, pipeline.index_generation, self.backend.model)
+            record_cache_lookup('precomputed_answers', precomputed is not None)
+            if precomputed is not None:
+                return self._serve_precomputed(precomputed, user_query, collection, on_token, start)
+        
+        def compute(publish):
+            result = self._get_recommendations(user_query, top_k, profile, use_fast_path, llm_followup,
+                                               priority, on_queue_position, publish, pipeline)
+            if stored_key is not None and stored_key in self.answers and self._storable(result):
+                # A frequent query asked before the background refresh reached it
+                self.answers.put(stored_key, user_query, result, pipeline.index_generation, self.backend.model,
+                                 collection, top_k, use_fast_path, llm_followup)
+            if collection is not None:
+                result['collection'] = collection
+            return result
+        
+        if not self.coalesce_enabled:
+            return compute(on_token)
+        key = (pipeline.query_key(user_query), top_k, use_fast_path, llm_followup, self.backend.model,
+               collection, pipeline.index_generation)
+        result, shared = self.inflight.do(key, compute, on_token=on_token)
+        if shared:
+            # Callers may mutate their result (explain), so joiners get their own copy
+            result = copy.deepcopy(result)
+            result['query'] = user_query
+            result['coalesced'] = True
+        return result
+    
+    def _serve_precomputed(self, result, user_query, collection, on_token, start):
+        result['query'] = user_query
+        result['precomputed'] = True
+        if collection is not None:
+            result['collection'] = collection
+        if on_token:
+            # Stream callers get the stored LLM text in one piece
+            text = result.get('detailed_recommendation') if result.get('answer_source') == 'extractive' else (
+                result.get('recommendation') if result.get('answer_source') == 'llm' else None)
+            if text:
+                on_token(text)
+        result['timings'] = {'total_s': time.perf_counter() - start}
+        REQUESTS.inc(kind='recommendation')
+        ANSWERS.inc(source=result.get('answer_source', 'none'))
+        record_timings(result['timings'], keys=RAG_STAGES)
+        return result
+    
+    def precompute(self, queries, collection=None, top_k=3, fast_path=None, llm_followup=False, priority=5):
+        """Compute and store answers for `queries` against the collection's current index; returns how many were stored.
+        
+        Runs at low admission priority so live requests go first.
+        """
+        use_fast_path = self.fast_path_enabled if fast_path is None else fast_path
+        pipeline = self.pipeline_for(None if collection == DEFAULT_COLLECTION else collection)
+        stored = sum(1 for query in queries
+                     if self._precompute_one(query, collection, top_k, use_fast_path, llm_followup, priority, pipeline))
+        self.answers.save()
+        return stored
+    
+    @staticmethod
+    def _storable(result):
+        """Only successful generations are worth serving again; busy or failed ones are retried live"""
+        return result.get('answer_source') not in ('rejected', 'error') and not result.get('followup_error')
+    
+    def _precompute_one(self, query, collection, top_k, use_fast_path, llm_followup, priority, pipeline):
+        """Store one answer and return its key, or None if the model was busy or failed"""
+        generation = pipeline.index_generation
+        result = self._get_recommendations(query, top_k, False, use_fast_path, llm_followup, priority, None, None,
+                                           pipeline)
+        if not self._storable(result):
+            print(f"⚠️ Skipped precomputing '{query}': {result.get('followup_error') or result['recommendation']}")
+            return None
+        key = self.answers.key(collection, pipeline.query_key(query), top_k, use_fast_path, llm_followup)
+        self.answers.put(key, query, result, generation, self.backend.model, collection, top_k, use_fast_path,
+                         llm_followup)
+        return key
+    
+    def refresh_precomputed(self, collection=None, background=True, priority=5):
+        """Recompute stored answers made against an older index generation of `collection`.
+        
+        At most one refresh runs per collection; returns False if one already is.
+        """
+        name = collection or DEFAULT_COLLECTION
+        with self._refresh_lock:
+            if name in self._refreshing:
+                return False
+            self._refreshing.add(name)
+        
+        def refresh():
+            try:
+                pipeline = self.pipeline_for(None if name == DEFAULT_COLLECTION else name)
+                generation = pipeline.index_generation
+                for key, entry in self.answers.stale(name, generation):
+                    if self.answers.get(key, generation, self.backend.model) is not None:
+                        continue  # live traffic already refreshed it
+                    new_key = self._precompute_one(entry['query'], name, entry['top_k'], entry['fast_path'],
+                                                   entry['llm_followup'], priority, pipeline)
+                    # The new corpus may normalize the query differently, moving it to another key
+                    if new_key is not None and new_key != key:
+                        self.answers.pop(key)
+                self.answers.save()
+            except Exception as e:
+                print(f"⚠️ Refreshing precomputed answers for '{name}' failed: {str(e)}")
+            finally:
+                with self._refresh_lock:
+                    self._refreshing.discard(name)
+        
+        if background:
+            threading.Thread(target=refresh, name=f"refresh-answers-{name}", daemon=True).start()
+        else:
+            refresh()
+        return True
+    
+    def _refresh_if_index_changed(self, collection, pipeline):
+        name = collection or DEFAULT_COLLECTION
+        generation = pipeline.index_generation
+        if self._checked_generations.get(name) == generation:
+            return
+        self._checked_generations[name] = generation
+        if self.answers.stale(name, generation):
+            self.refresh_precomputed(name)
+    
+    def _get_recommendations(self, user_query, top_k, profile, use_fast_path, llm_followup,
+                             priority, on_queue_position, on_token, pipeline=None):
+        pipeline = pipeline or self.pipeline
+        request_start = time.perf_counter()
+        retrieved = pipeline.search_interventions(user_query, top_k=top_k, profile=profile)
+        timings = dict(retrieved.get('timings', {}))
+        
+        if not retrieved['interventions']:
+            timings['total_s'] = time.perf_counter() - request_start
+            REQUESTS.inc(kind='recommendation')
+            ANSWERS.inc(source='none')
+            record_timings(timings, keys=RAG_STAGES)
+            return {
+                "query": user_query,
+                "retrieved_interventions": [],
+                "recommendation": "No relevant interventions found for your query. Please try rephrasing or upload more intervention data.",
+                "answer_source": "none",
+                "timings": timings
+            }
+        
+        # Enhance retrieved interventions with full data
+        stage_start = time.perf_counter()
+        enhanced_interventions = self._enrich(retrieved['interventions'], pipeline)
+        timings['enrich_s'] = time.perf_counter() - stage_start
+        
+        result = {
             "query": user_query,
             "retrieved_interventions": enhanced_interventions,
-            "recommendation": response
-        }
\ No newline at end of file
+            "timings": timings
+        }
+        try:
+            if use_fast_path and self.is_decisive(retrieved['interventions']):
+                stage_start = time.perf_counter()
+                result['recommendation'] = self.extractive_answer(retrieved['interventions'][0])
+                result['answer_source'] = 'extractive'
+                timings['extractive_s'] = time.perf_counter() - stage_start
+                if llm_followup:
+                    result['detailed_recommendation'], result['usage'] = self._generate(
+                        user_query, retrieved['interventions'], timings, profile, priority, on_queue_position, on_token)
+            else:
+                result['recommendation'], result['usage'] = self._generate(
+                    user_query, retrieved['interventions'], timings, profile, priority, on_queue_position, on_token)
+                result['answer_source'] = 'llm'
+        except AdmissionRejected as e:
+            result['recommendation'] = f"The AI model is busy right now ({str(e)}). Please try again in a moment."
+            result['answer_source'] = 'rejected'
+        except BackendError as e:
+            if result.get('answer_source') == 'extractive':
+                result['followup_error'] = str(e)
+            else:
+                result['recommendation'] = str(e)
+                result['answer_source'] = 'error'
+        
+        timings['total_s'] = time.perf_counter() - request_start
+        REQUESTS.inc(kind='recommendation')
+        ANSWERS.inc(source=result['answer_source'])
+        record_timings(timings, keys=RAG_STAGES)
+        return result
+    
+    def explain(self, result, profile=False, priority=1, on_queue_position=None):
+        """Run the LLM for a result answered on the fast path and attach it as 'detailed_recommendation'.
+        
+        Follow-ups queue behind first answers by default; raises AdmissionRejected when busy
+        and BackendError when the generator fails.
+        """
+        timings = result.setdefault('timings', {})
+        result['detailed_recommendation'], result['usage'] = self._generate(
+            result['query'], result['retrieved_interventions'], timings, profile, priority, on_queue_position)
+        record_timings(timings, keys=('context_build_s', 'prompt_build_s', 'queue_s', 'ttft_s', 'generation_s', 'llm_s'))
+        return result['detailed_recommendation']
@@ -0,0 +1,132 @@
+"""Opt-in, sampled profiling of hot paths.
+
+Off by default. When disabled, PROFILER.profile() returns a shared no-op context,
+so the cost is one attribute check per call. Enable it with environment variables:
+
+    ROAD_SAFETY_PROFILE=1            turn sampling on
+    ROAD_SAFETY_PROFILE_RATE=0.01    fraction of calls to capture (default 1%)
+    ROAD_SAFETY_PROFILE_DIR=./profiles
+    ROAD_SAFETY_PROFILE_MEMORY=1     also take tracemalloc snapshots
+
+A single call can also be captured with `profile=True` on search_interventions,
+query_ollama or get_recommendations. Each capture writes:
+
+    <name>.prof          cProfile stats (snakeviz, gprof2dot, flameprof)
+    <name>.folded        sampled stacks in collapsed format (flamegraph.pl, speedscope, inferno)
+    <name>.tracemalloc   tracemalloc snapshot plus a <name>.alloc.txt top-allocations summary
+"""
+import contextlib
+import cProfile
+import os
+import random
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+
+_NULL_CONTEXT = contextlib.nullcontext()
+
+
+def _env_flag(name):
+    return os.getenv(name, '').strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+class _StackSampler:
+    """Samples one thread's stack at a fixed interval and counts folded stacks"""
+
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            names = []
+            while frame is not None:
+                code = frame.f_code
+                names.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                frame = frame.f_back
+            self.stacks[';'.join(reversed(names))] += 1
+
+
+class HotPathProfiler:
+    def __init__(self, enabled=None, sample_rate=None, output_dir=None, trace_memory=None, sampling_interval=0.001):
+        self.enabled = _env_flag('ROAD_SAFETY_PROFILE') if enabled is None else enabled
+        self.sample_rate = float(os.getenv('ROAD_SAFETY_PROFILE_RATE', '0.01')) if sample_rate is None else sample_rate
+        self.output_dir = output_dir or os.getenv('ROAD_SAFETY_PROFILE_DIR', './profiles')
+        self.trace_memory = _env_flag('ROAD_SAFETY_PROFILE_MEMORY') if trace_memory is None else trace_memory
+        self.sampling_interval = sampling_interval
+        # cProfile allows one active profiler per process, so captures don't overlap
+        self._capture_lock = threading.Lock()
+        self._sequence = 0
+
+    def profile(self, name, force=False):
+        """Context manager that captures the block for a sampled fraction of calls"""
+        if not force and not self.enabled:
+            return _NULL_CONTEXT
+        if not force and random.random() >= self.sample_rate:
+            return _NULL_CONTEXT
+        return self._capture(name)
+
+    @contextlib.contextmanager
+    def _capture(self, name):
+        if not self._capture_lock.acquire(blocking=False):
+            # Another capture is running; skip this one rather than queueing
+            yield
+            return
+        try:
+            self._sequence += 1
+            prefix = os.path.join(
+                self.output_dir,
+                f"{time.strftime('%Y%m%d-%H%M%S')}_{name}_{os.getpid()}_{self._sequence}"
+            )
+            started_tracemalloc = False
+            if self.trace_memory and not tracemalloc.is_tracing():
+                tracemalloc.start(25)
+                started_tracemalloc = True
+            sampler = _StackSampler(threading.get_ident(), self.sampling_interval)
+            profiler = cProfile.Profile()
+            sampler.start()
+            profiler.enable()
+            try:
+                yield
+            finally:
+                profiler.disable()
+                sampler.stop()
+                snapshot = tracemalloc.take_snapshot() if tracemalloc.is_tracing() else None
+                if started_tracemalloc:
+                    tracemalloc.stop()
+                self._write(prefix, profiler, sampler, snapshot)
+        finally:
+            self._capture_lock.release()
+
+    def _write(self, prefix, profiler, sampler, snapshot):
+        try:
+            os.makedirs(self.output_dir, exist_ok=True)
+            profiler.dump_stats(prefix + '.prof')
+            with open(prefix + '.folded', 'w', encoding='utf-8') as f:
+                for stack, count in sampler.stacks.most_common():
+                    f.write(f"{stack} {count}\n")
+            if snapshot is not None:
+                snapshot.dump(prefix + '.tracemalloc')
+                with open(prefix + '.alloc.txt', 'w', encoding='utf-8') as f:
+                    for stat in snapshot.statistics('lineno')[:25]:
+                        f.write(f"{stat}\n")
+        except OSError as e:
+            print(f"⚠️ Could not write profile {prefix}: {str(e)}")
+
+
+PROFILER = HotPathProfiler()
@@ -0,0 +1,179 @@
+import json
+import os
+import re
+import threading
+import unicodedata
+from collections import OrderedDict
+
+# "IRC 67", "irc:67-2022", "IRC SP 84", "IRC:SP:84-2019"
+IRC_CODE = re.compile(r'\birc\s*[:\-]?\s*(sp\s*[:\-]?\s*)?(\d+)(?:\s*[-:/]\s*((?:19|20)\d{2}))?\b', re.IGNORECASE)
+# A word, keeping punctuation inside it: "3.2.1", "0.9", "km/h", "60-70", "driver's"
+TOKEN = re.compile(r"\w+(?:[./:'\-]\w+)*")
+
+# Filler words dropped from the cache key only; the encoded text keeps them.
+# Negations stay, since "no sign" and "sign" are different questions.
+KEY_STOPWORDS = frozenset(
+    'a an the what which how is are was be do does i we to for of on in at with and or my our any should '
+    'can please about'.split())
+
+# variant -> term the corpus uses; only applied when the variant is absent from
+# the corpus and the replacement is present (see QueryNormalizer.for_corpus)
+DEFAULT_SYNONYMS = {
+    'speed bump': 'speed hump',
+    'speed bumps': 'speed humps',
+    'sleeping policeman': 'speed hump',
+    'crosswalk': 'pedestrian crossing',
+    'signage': 'sign',
+    'signboard': 'sign',
+    'sign board': 'sign',
+    'cat eyes': 'road studs',
+    'cats eyes': 'road studs',
+    'raised pavement markers': 'road studs',
+    'lane markings': 'road markings',
+    'lane marking': 'road marking',
+    'guardrail': 'crash barrier',
+    'guard rail': 'crash barrier',
+    'bend': 'curve'
+}
+
+
+def _code_parts(code):
+    match = IRC_CODE.fullmatch(code.strip())
+    if match is None:
+        return None
+    return bool(match.group(1)), int(match.group(2)), match.group(3)
+
+
+def _format_code(special, number, year):
+    code = f"IRC:{'SP:' if special else ''}{number}"
+    return f"{code}-{year}" if year else code
+
+
+def load_synonyms(setting=None):
+    """QUERY_SYNONYMS: unset/0 disables, 1 uses DEFAULT_SYNONYMS, a path adds a JSON {variant: term} map"""
+    setting = (os.getenv('QUERY_SYNONYMS', '') if setting is None else setting).strip()
+    if setting.lower() in ('', '0', 'false', 'no', 'off'):
+        return {}
+    synonyms = dict(DEFAULT_SYNONYMS)
+    if setting.lower() not in ('1', 'true', 'yes', 'on'):
+        with open(setting, 'r', encoding='utf-8') as f:
+            synonyms.update(json.load(f))
+    return synonyms
+
+
+class QueryNormalizer:
+    """Folds the many spellings of one question into a single form.
+
+    `normalize(query)` returns (text, key). `text` is what gets encoded:
+    the query as typed, with whitespace collapsed, IRC codes in the corpus's
+    own spelling ("irc 67" -> "IRC:67-2022") and synonyms mapped onto corpus
+    terms. `key` identifies the question for caching: lower case, punctuation
+    dropped except inside numbers and codes ("clause 3.2.1", "km/h"), filler
+    words removed and word order ignored, so "Damaged STOP Sign?" and "stop
+    sign damaged" share one cache entry. Numbers keep their order, so "60 to
+    30" and "30 to 60" don't.
+    """
+
+    def __init__(self, codes=(), synonyms=None):
+        # (special, number) -> newest edition in the corpus; (special, number, year) -> exact code
+        self.codes = {}
+        self.editions = {}
+        for code in codes:
+            parts = _code_parts(code)
+            if parts is None:
+                continue
+            special, number, year = parts
+            self.codes[parts] = code
+            latest = self.editions.get((special, number))
+            if latest is None or (year or '') > (_code_parts(latest)[2] or ''):
+                self.editions[(special, number)] = code
+        self.synonyms = {}
+        for variant, term in (synonyms or {}).items():
+            variant = self._fold(variant)
+            if variant:
+                self.synonyms[variant] = self._fold(term)
+        # Longest variants first, so "speed bumps" wins over "speed bump"
+        self._synonym_pattern = re.compile(
+            r'\b(' + '|'.join(re.escape(v) for v in sorted(self.synonyms, key=len, reverse=True)) + r')\b',
+            re.IGNORECASE
+        ) if self.synonyms else None
+
+    @classmethod
+    def for_corpus(cls, codes, text_index=None, synonyms=None):
+        """Normalizer for one index generation; synonyms are kept only where they map onto corpus vocabulary"""
+        synonyms = load_synonyms() if synonyms is None else synonyms
+        if synonyms and text_index is not None:
+            def in_corpus(term):
+                return text_index.search(term, limit=1)[1] > 0
+            synonyms = {v: t for v, t in synonyms.items() if not in_corpus(v) and in_corpus(t)}
+        return cls(codes=codes, synonyms=synonyms)
+
+    def _fold(self, text):
+        return ' '.join(TOKEN.findall(unicodedata.normalize('NFKC', text or '').lower()))
+
+    def _map_synonyms(self, text):
+        if self._synonym_pattern is None:
+            return text
+        return self._synonym_pattern.sub(lambda m: self.synonyms.get(m.group(1).lower(), m.group(1)), text)
+
+    def canonical_code(self, special, number, year=None):
+        if year:
+            return self.codes.get((special, number, year), _format_code(special, number, year))
+        return self.editions.get((special, number), _format_code(special, number, None))
+
+    def normalize(self, query):
+        """Return (text, key) for a raw query"""
+        text_pieces = []
+        key_pieces = []
+        position = 0
+        query = unicodedata.normalize('NFKC', query or '')
+        for match in IRC_CODE.finditer(query):
+            code = self.canonical_code(bool(match.group(1)), int(match.group(2)), match.group(3))
+            text_pieces += [query[position:match.start()], code]
+            key_pieces += [self._fold(query[position:match.start()]), code]
+            position = match.end()
+        text_pieces.append(query[position:])
+        key_pieces.append(self._fold(query[position:]))
+        text = self._map_synonyms(' '.join(''.join(text_pieces).split()))
+        folded = self._map_synonyms(' '.join(piece for piece in key_pieces if piece))
+        words = [word for word in folded.split() if word not in KEY_STOPWORDS]
+        terms = sorted(word for word in words if not any(c.isdigit() for c in word))
+        numbers = [word for word in words if any(c.isdigit() for c in word)]
+        key = ' '.join(terms + (['#'] + numbers if numbers else [])) or folded or text
+        return text, key
+
+    def key(self, query):
+        return self.normalize(query)[1]
+
+
+class LRUCache:
+    """Thread-safe least-recently-used map; `max_size` 0 disables it"""
+
+    def __init__(self, max_size=256):
+        self.max_size = max_size
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key in self._items:
+                self._items.move_to_end(key)
+                return self._items[key]
+        return None
+
+    def put(self, key, value):
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._items)
@@ -0,0 +1,61 @@
+"""Ingest-time normalization of intervention records.
+
+In the bundled data, `content` is built from the other fields:
+
+    Problem: {problem}. Category: {category}. Type: {type}. Data: {data}. Code: {code}. Clause: {clause}
+
+Keeping it doubles what each record stores, and embedding it alongside those
+fields makes every fact appear twice. Records whose `content` matches that
+template exactly have it dropped at ingest and marked in `_derived`.
+`expand_record` rebuilds it when a full record is needed. A hand-written
+`content` that doesn't match the template is kept as-is.
+"""
+
+DERIVED_KEY = '_derived'
+# The fields `content` is built from, in template order
+CONTENT_FIELDS = ('problem', 'category', 'type', 'data', 'code', 'clause')
+
+
+def canonical_content(record):
+    """The `content` string the source data derives from the other fields"""
+    return '. '.join(f"{field.capitalize()}: {record.get(field, '')}" for field in CONTENT_FIELDS)
+
+
+# Field name -> function that rebuilds it from the rest of the record
+DERIVABLE_FIELDS = {
+    'content': canonical_content
+}
+
+
+def is_derived(record, field):
+    """True if `field` is absent but rebuildable, or present and equal to its rebuild"""
+    if field in record.get(DERIVED_KEY, ()):
+        return True
+    value = record.get(field)
+    return bool(value) and value == DERIVABLE_FIELDS[field](record)
+
+
+def normalize_record(record):
+    """Return a copy of `record` without fields that can be rebuilt from the others"""
+    dropped = [field for field, derive in DERIVABLE_FIELDS.items()
+               if field in record and record[field] and record[field] == derive(record)]
+    if not dropped:
+        return record
+    normalized = {key: value for key, value in record.items() if key not in dropped}
+    normalized[DERIVED_KEY] = tuple(sorted(set(record.get(DERIVED_KEY, ())) | set(dropped)))
+    return normalized
+
+
+def normalize_records(records):
+    return [normalize_record(record) for record in records]
+
+
+def expand_record(record):
+    """Return the full record as it was ingested, rebuilding derived fields"""
+    derived = record.get(DERIVED_KEY)
+    if not derived:
+        return record
+    expanded = {key: value for key, value in record.items() if key != DERIVED_KEY}
+    for field in derived:
+        expanded[field] = DERIVABLE_FIELDS[field](expanded)
+    return expanded
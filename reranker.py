@@ -0,0 +1,109 @@
+import threading
+import time
+from collections import OrderedDict
+
+from metrics import REGISTRY, record_cache_lookup
+from model_registry import get_cross_encoder
+
+RERANK_SKIPPED = REGISTRY.counter(
+    'road_safety_rerank_skipped_total', 'Rerank passes skipped or abandoned', labels=('reason',))
+
+
+class CrossEncoderReranker:
+    """Re-scores a small bi-encoder candidate pool with a CPU cross-encoder.
+
+    Pair scores are cached (LRU) per (query, document key). Before scoring,
+    the cost of the uncached pairs is estimated from the observed per-pair
+    time. If that estimate, or the actual elapsed time, exceeds
+    `latency_budget_ms`, the pass is abandoned and the bi-encoder order is
+    kept. Once the estimate is older than `probe_interval_s`, a pass runs
+    anyway to re-measure it, so a single slow batch can't switch reranking
+    off for good.
+    """
+
+    def __init__(self, model_name='cross-encoder/ms-marco-MiniLM-L-6-v2', candidate_pool=20, batch_size=16,
+                 latency_budget_ms=200, cache_size=4096, model=None, probe_interval_s=30.0):
+        self.model_name = model_name
+        self.candidate_pool = candidate_pool
+        self.batch_size = batch_size
+        self.latency_budget_ms = latency_budget_ms
+        self.cache_size = cache_size
+        self._model = model
+        self._model_lock = threading.Lock()
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+        # Moving average of seconds per scored pair, learned as we go
+        self.pair_cost_s = None
+        self.probe_interval_s = probe_interval_s
+        self._measured_at = None
+
+    @property
+    def model(self):
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    model = get_cross_encoder(self.model_name)
+                    # The first predict pays one-off initialisation; keep it out of the cost estimate
+                    model.predict([('warm up', 'warm up')])
+                    self._model = model
+        return self._model
+
+    def _cache_get(self, key):
+        with self._cache_lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                return self._cache[key]
+        return None
+
+    def _cache_put(self, key, score):
+        with self._cache_lock:
+            self._cache[key] = score
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def rerank(self, query, candidates, texts, keys, top_k):
+        """Reorder [(index, similarity)] candidates; returns (ranked, rerank_scores) or None if skipped.
+
+        `texts` and `keys` are aligned with `candidates`. `keys` must identify the
+        document content, e.g. (index_version, row).
+        """
+        if not candidates:
+            return None
+        budget_s = self.latency_budget_ms / 1000.0
+        query_key = query.strip().lower()
+        scores = [None] * len(candidates)
+        missing = []
+        for i, key in enumerate(keys):
+            cached = self._cache_get((query_key, key))
+            record_cache_lookup('rerank', cached is not None)
+            if cached is None:
+                missing.append(i)
+            else:
+                scores[i] = cached
+
+        if missing and self.pair_cost_s is not None and len(missing) * self.pair_cost_s > budget_s:
+            if time.monotonic() - self._measured_at < self.probe_interval_s:
+                RERANK_SKIPPED.inc(reason='predicted_over_budget')
+                return None
+            # Stale estimate: score anyway and let the measured batches correct it
+
+        # Load outside the timed region so loading never counts as scoring cost
+        model = self.model
+        start = time.perf_counter()
+        for batch_start in range(0, len(missing), self.batch_size):
+            batch = missing[batch_start:batch_start + self.batch_size]
+            batch_began = time.perf_counter()
+            predicted = model.predict([(query, texts[i]) for i in batch], batch_size=self.batch_size)
+            per_pair = (time.perf_counter() - batch_began) / len(batch)
+            self.pair_cost_s = per_pair if self.pair_cost_s is None else 0.8 * self.pair_cost_s + 0.2 * per_pair
+            self._measured_at = time.monotonic()
+            for i, score in zip(batch, predicted):
+                scores[i] = float(score)
+                self._cache_put((query_key, keys[i]), scores[i])
+            if time.perf_counter() - start > budget_s and batch_start + self.batch_size < len(missing):
+                RERANK_SKIPPED.inc(reason='over_budget')
+                return None
+
+        order = sorted(range(len(candidates)), key=lambda i: scores[i], reverse=True)[:top_k]
+        return [candidates[i] for i in order], [scores[i] for i in order]
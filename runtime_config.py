@@ -0,0 +1,193 @@
+import os
+import sys
+import threading
+
+BLAS_ENV_VARS = ('OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS', 'VECLIB_MAXIMUM_THREADS',
+                 'NUMEXPR_NUM_THREADS')
+
+
+def parse_cpu_list(spec):
+    """'0-3,8' -> [0, 1, 2, 3, 8]"""
+    cpus = []
+    for part in (spec or '').split(','):
+        part = part.strip()
+        if not part:
+            continue
+        if '-' in part:
+            first, last = part.split('-', 1)
+            cpus.extend(range(int(first), int(last) + 1))
+        else:
+            cpus.append(int(part))
+    return sorted(set(cpus))
+
+
+def allowed_cpus():
+    """Sorted CPUs this process may run on.
+
+    Affinity is per thread on Linux, so this reads the main thread's mask
+    (its id is the pid) rather than whichever thread happens to call.
+    """
+    if hasattr(os, 'sched_getaffinity'):
+        return sorted(os.sched_getaffinity(os.getpid()))
+    return list(range(os.cpu_count() or 1))
+
+
+def available_cpus():
+    """Number of CPUs this process may run on; unlike os.cpu_count() this honours pinning"""
+    return len(allowed_cpus())
+
+
+def _thread_ids():
+    try:
+        return {int(tid) for tid in os.listdir('/proc/self/task')}
+    except OSError:
+        # No /proc: only the calling thread can be reached
+        return {0}
+
+
+def set_process_affinity(cpus):
+    """Pin every thread of the process to `cpus`, not just the caller.
+
+    sched_setaffinity(0, ...) only moves the calling thread and the threads
+    it starts later. Under Streamlit that is one script thread, while the
+    server, executor and torch threads already running keep the old mask.
+    Threads started while this runs are picked up by re-listing until no
+    new ones appear.
+    """
+    pinned = set()
+    while True:
+        pending = _thread_ids() - pinned
+        if not pending:
+            return
+        for tid in pending:
+            try:
+                os.sched_setaffinity(tid, cpus)
+            except ProcessLookupError:
+                pass  # exited since it was listed
+            pinned.add(tid)
+
+
+def _int_env(name):
+    value = os.getenv(name, '').strip()
+    return int(value) if value else None
+
+
+class RuntimeConfig:
+    """Thread and CPU layout for the encoder and the BLAS used by search.
+
+    None leaves a library's own default alone. `cpu_affinity` takes a CPU
+    list ('0-3,8'), or 'auto' to give this worker its share of the allowed
+    CPUs, using `worker_index` out of `num_workers`. Set it per process when
+    several API workers or Streamlit servers share a host, so they don't
+    oversubscribe the cores.
+    """
+
+    def __init__(self, intra_op_threads=None, inter_op_threads=None, blas_threads=None,
+                 tokenizers_parallelism=None, cpu_affinity=None, worker_index=0, num_workers=1):
+        self.intra_op_threads = intra_op_threads
+        self.inter_op_threads = inter_op_threads
+        self.blas_threads = blas_threads
+        self.tokenizers_parallelism = tokenizers_parallelism
+        self.cpu_affinity = cpu_affinity
+        self.worker_index = worker_index
+        self.num_workers = num_workers
+
+    @classmethod
+    def from_env(cls):
+        tokenizers = os.getenv('TOKENIZERS_PARALLELISM')
+        return cls(
+            intra_op_threads=_int_env('ROAD_SAFETY_INTRA_OP_THREADS'),
+            inter_op_threads=_int_env('ROAD_SAFETY_INTER_OP_THREADS'),
+            blas_threads=_int_env('ROAD_SAFETY_BLAS_THREADS'),
+            tokenizers_parallelism=None if tokenizers is None else tokenizers.lower() in ('1', 'true', 'yes'),
+            cpu_affinity=os.getenv('ROAD_SAFETY_CPU_AFFINITY') or None,
+            worker_index=_int_env('ROAD_SAFETY_WORKER_INDEX') or 0,
+            num_workers=_int_env('ROAD_SAFETY_WORKERS') or 1
+        )
+
+    def affinity_cpus(self):
+        """The CPUs this worker should be pinned to, or None to leave affinity alone"""
+        if not self.cpu_affinity:
+            return None
+        if self.cpu_affinity != 'auto':
+            return parse_cpu_list(self.cpu_affinity)
+        allowed = allowed_cpus()
+        share = max(1, len(allowed) // max(1, self.num_workers))
+        start = (self.worker_index % max(1, self.num_workers)) * share
+        return allowed[start:start + share] or allowed
+
+    def to_dict(self):
+        return {
+            'intra_op_threads': self.intra_op_threads,
+            'inter_op_threads': self.inter_op_threads,
+            'blas_threads': self.blas_threads,
+            'tokenizers_parallelism': self.tokenizers_parallelism,
+            'cpu_affinity': self.cpu_affinity,
+            'worker_index': self.worker_index,
+            'num_workers': self.num_workers
+        }
+
+    def apply(self):
+        """Apply every configured setting; returns {setting: applied value or error string}"""
+        applied = {}
+        cpus = self.affinity_cpus()
+        if cpus is not None:
+            if hasattr(os, 'sched_setaffinity'):
+                # Every existing thread is moved; threads any of them start later inherit the mask
+                set_process_affinity(cpus)
+                applied['cpu_affinity'] = cpus
+            else:
+                applied['cpu_affinity'] = 'unsupported on this platform'
+
+        if self.tokenizers_parallelism is not None:
+            os.environ['TOKENIZERS_PARALLELISM'] = 'true' if self.tokenizers_parallelism else 'false'
+            applied['tokenizers_parallelism'] = self.tokenizers_parallelism
+
+        if self.blas_threads is not None:
+            # The variables only reach pools not yet started; threadpoolctl resizes running ones
+            for name in BLAS_ENV_VARS:
+                os.environ[name] = str(self.blas_threads)
+            try:
+                from threadpoolctl import threadpool_limits
+                threadpool_limits(limits=self.blas_threads, user_api='blas')
+                applied['blas_threads'] = self.blas_threads
+            except ImportError:
+                applied['blas_threads'] = f"{self.blas_threads} (environment only; install threadpoolctl)"
+
+        if self.intra_op_threads is not None or self.inter_op_threads is not None:
+            applied.update(self._apply_torch())
+        return applied
+
+    def _apply_torch(self):
+        applied = {}
+        try:
+            import torch
+        except ImportError:
+            return {'torch': 'not installed'}
+        if self.intra_op_threads is not None:
+            torch.set_num_threads(self.intra_op_threads)
+            applied['intra_op_threads'] = torch.get_num_threads()
+        if self.inter_op_threads is not None:
+            try:
+                torch.set_num_interop_threads(self.inter_op_threads)
+                applied['inter_op_threads'] = self.inter_op_threads
+            except RuntimeError as e:
+                # Torch only allows this before its first parallel operation
+                applied['inter_op_threads'] = f"not applied: {str(e)}"
+        return applied
+
+
+_applied = None
+_apply_lock = threading.Lock()
+
+
+def apply_runtime_config(config=None):
+    """Apply `config` (default: from the environment) once per process; later calls return the first result"""
+    global _applied
+    with _apply_lock:
+        if _applied is None:
+            config = config or RuntimeConfig.from_env()
+            _applied = {'config': config.to_dict(), 'applied': config.apply()}
+            if _applied['applied']:
+                print(f"Runtime config applied: {_applied['applied']}", file=sys.stderr)
+        return _applied
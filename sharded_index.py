@@ -0,0 +1,306 @@
+"""Sharded exact search: the embedding matrix is split into row ranges searched in parallel.
+
+Local shards run on a thread pool. The matrix product releases the GIL, so
+shards use separate cores. Each shard returns its own top-k, and the results
+are merged with a heap. A shard can also live in another process or on
+another host behind a small RPC server:
+
+    python sharded_index.py --index road_safety_index.pkl --shard 0 --num-shards 2 --port 6001
+    python sharded_index.py --index road_safety_index.pkl --shard 1 --num-shards 2 --port 6002
+
+and then ShardedIndex.connect(['localhost:6001', 'localhost:6002']).
+
+Connections carry pickled requests, so servers and clients must share a
+secret in INDEX_SHARD_AUTHKEY; there is no default. Each server reports the
+index generation it loaded, and the pipeline only uses remote shards that
+serve the generation it has.
+"""
+import argparse
+import heapq
+import ipaddress
+import os
+import pickle
+import secrets
+import socket
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client, Listener
+
+import numpy as np
+
+from runtime_config import available_cpus
+
+
+def shard_authkey():
+    """The shared secret from INDEX_SHARD_AUTHKEY; raises ValueError when it is unset"""
+    authkey = os.getenv('INDEX_SHARD_AUTHKEY', '')
+    if not authkey:
+        raise ValueError("INDEX_SHARD_AUTHKEY is not set; remote shards need a shared secret")
+    return authkey.encode()
+
+
+def is_loopback(host):
+    try:
+        return all(ipaddress.ip_address(info[4][0]).is_loopback
+                   for info in socket.getaddrinfo(host, None, type=socket.SOCK_STREAM))
+    except (OSError, ValueError):
+        return False
+
+
+def _unit_rows(embeddings):
+    """Embeddings with unit-length rows, copying only if they aren't already"""
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    sample = embeddings[:min(len(embeddings), 256)]
+    if len(sample) and np.allclose(np.linalg.norm(sample, axis=1), 1.0, atol=1e-3):
+        return embeddings
+    return embeddings / (np.linalg.norm(embeddings, axis=1, keepdims=True) + 1e-8)
+
+
+def shard_bounds(num_rows, num_shards):
+    """Contiguous [start, stop) row ranges of near-equal size"""
+    edges = np.linspace(0, num_rows, num_shards + 1).astype(int)
+    return [(int(a), int(b)) for a, b in zip(edges[:-1], edges[1:]) if b > a]
+
+
+class LocalShard:
+    """Rows [offset, offset + len(embeddings)) of the index, held in this process"""
+
+    def __init__(self, embeddings, offset=0):
+        self.embeddings = embeddings
+        self.offset = offset
+
+    def __len__(self):
+        return len(self.embeddings)
+
+    def search(self, query_embedding, top_k):
+        """Return [(similarity, global_row)] for this shard's best `top_k` rows, unordered"""
+        similarities = self.embeddings @ query_embedding
+        if top_k < len(similarities):
+            top = np.argpartition(-similarities, top_k - 1)[:top_k]
+        else:
+            top = np.arange(len(similarities))
+        return [(float(similarities[i]), int(i) + self.offset) for i in top]
+
+
+class RemoteShard:
+    """Client for a shard served by ShardServer; one connection per calling thread"""
+
+    def __init__(self, address, authkey=None):
+        host, _, port = address.rpartition(':')
+        self.address = (host or 'localhost', int(port))
+        self.authkey = authkey or shard_authkey()
+        self._local = threading.local()
+        # Every thread's connection, so close() can reach them all
+        self._conns = []
+        self._conns_lock = threading.Lock()
+        info = self._call(('info',))
+        self.offset = info['offset']
+        self.size = info['size']
+        self.generation = info.get('generation')
+
+    def __len__(self):
+        return self.size
+
+    def _call(self, request):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = Client(self.address, authkey=self.authkey)
+            with self._conns_lock:
+                self._conns.append(conn)
+        try:
+            conn.send(request)
+            status, payload = conn.recv()
+        except (EOFError, OSError):
+            self._local.conn = None
+            self._drop(conn)
+            raise
+        if status != 'ok':
+            raise RuntimeError(f"Shard {self.address[0]}:{self.address[1]} failed: {payload}")
+        return payload
+
+    def search(self, query_embedding, top_k):
+        return self._call(('search', np.asarray(query_embedding, dtype=np.float32), top_k))
+
+    def _drop(self, conn):
+        with self._conns_lock:
+            if conn in self._conns:
+                self._conns.remove(conn)
+        try:
+            conn.close()
+        except OSError:
+            pass
+
+    def close(self):
+        with self._conns_lock:
+            conns = list(self._conns)
+        for conn in conns:
+            self._drop(conn)
+
+
+class ShardServer:
+    """Serves one LocalShard over multiprocessing.connection; a thread per client connection.
+
+    Without an authkey (argument or INDEX_SHARD_AUTHKEY) it only binds to a
+    loopback address, with a random key that in-process clients read from
+    `self.authkey`.
+    """
+
+    def __init__(self, shard, address=('localhost', 0), authkey=None, generation=None):
+        self.shard = shard
+        self.generation = generation
+        if authkey is None:
+            try:
+                authkey = shard_authkey()
+            except ValueError:
+                if not is_loopback(address[0]):
+                    raise
+                authkey = secrets.token_bytes(32)
+        self.authkey = authkey
+        self.listener = Listener(address, authkey=authkey)
+        self.address = self.listener.address
+        self._thread = None
+
+    def _handle(self, conn):
+        with conn:
+            while True:
+                try:
+                    request = conn.recv()
+                except (EOFError, OSError):
+                    return
+                try:
+                    if request[0] == 'search':
+                        conn.send(('ok', self.shard.search(request[1], request[2])))
+                    elif request[0] == 'info':
+                        conn.send(('ok', {'offset': self.shard.offset, 'size': len(self.shard),
+                                          'generation': self.generation}))
+                    else:
+                        conn.send(('error', f"unknown request {request[0]!r}"))
+                except Exception as e:
+                    conn.send(('error', str(e)))
+
+    def serve_forever(self):
+        while True:
+            try:
+                conn = self.listener.accept()
+            except AuthenticationError as e:
+                # A client without the shared secret; keep serving the others
+                print(f"⚠️ Rejected shard client: {str(e)}")
+                continue
+            except OSError:
+                return
+            threading.Thread(target=self._handle, args=(conn,), daemon=True).start()
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.listener.close()
+
+
+class ShardedIndex:
+    """Scatter a query to every shard in parallel and merge the per-shard top-k.
+
+    Pass a long-lived `executor` to share one thread pool across index
+    generations; otherwise the index owns a pool sized to its shards.
+    """
+
+    def __init__(self, shards, executor=None):
+        self.shards = shards
+        self.size = sum(len(shard) for shard in shards)
+        # The index generation every remote shard serves; None for local shards or a mixed set
+        generations = {getattr(shard, 'generation', None) for shard in shards}
+        self.generation = generations.pop() if len(generations) == 1 else None
+        self._owns_executor = executor is None and len(shards) > 1
+        if self._owns_executor:
+            executor = ThreadPoolExecutor(max_workers=len(shards), thread_name_prefix='shard')
+        self.executor = executor if len(shards) > 1 else None
+
+    @classmethod
+    def build(cls, embeddings, num_shards=None, executor=None):
+        num_shards = num_shards or available_cpus()
+        embeddings = _unit_rows(embeddings)
+        # Slices are views, so sharding doesn't copy the matrix
+        shards = [LocalShard(embeddings[a:b], offset=a) for a, b in shard_bounds(len(embeddings), num_shards)]
+        return cls(shards, executor=executor)
+
+    @classmethod
+    def connect(cls, addresses, authkey=None, executor=None):
+        shards = []
+        try:
+            for address in addresses:
+                shards.append(RemoteShard(address, authkey))
+        except BaseException:
+            for shard in shards:
+                shard.close()
+            raise
+        return cls(sorted(shards, key=lambda s: s.offset), executor=executor)
+
+    def check_coverage(self, num_rows):
+        """Raise RuntimeError unless the shards hold rows [0, num_rows) exactly once.
+
+        Matching the total isn't enough: two servers both serving shard 0 of 2
+        add up to the right size while half the rows are never searched.
+        """
+        expected = 0
+        for shard in sorted(self.shards, key=lambda s: s.offset):
+            if shard.offset > expected:
+                raise RuntimeError(f"no shard holds rows {expected}-{shard.offset}")
+            if shard.offset < expected:
+                raise RuntimeError(f"shards overlap at rows {shard.offset}-{expected}")
+            expected += len(shard)
+        if expected != num_rows:
+            raise RuntimeError(f"shards hold rows 0-{expected}, index has {num_rows}")
+
+    def search(self, query_embedding, top_k):
+        """Return [(row, similarity)] for the best `top_k` rows across all shards, best first"""
+        query = np.asarray(query_embedding, dtype=np.float32).reshape(-1)
+        if self.executor is None:
+            partials = [shard.search(query, top_k) for shard in self.shards]
+        else:
+            partials = list(self.executor.map(lambda shard: shard.search(query, top_k), self.shards))
+        best = heapq.nlargest(top_k, (hit for partial in partials for hit in partial))
+        return [(row, similarity) for similarity, row in best]
+
+    def close(self):
+        for shard in self.shards:
+            if isinstance(shard, RemoteShard):
+                shard.close()
+        if self._owns_executor:
+            self.executor.shutdown(wait=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve one shard of a saved index")
+    parser.add_argument('--index', default='road_safety_index.pkl')
+    parser.add_argument('--shard', type=int, required=True, help="Which shard of --num-shards to serve")
+    parser.add_argument('--num-shards', type=int, required=True)
+    parser.add_argument('--host', default='localhost')
+    parser.add_argument('--port', type=int, required=True)
+    args = parser.parse_args()
+
+    # Clients in other processes need the same secret, so a generated one is no use here
+    try:
+        authkey = shard_authkey()
+    except ValueError as e:
+        print(f"❌ {str(e)}")
+        sys.exit(1)
+
+    with open(args.index, 'rb') as f:
+        saved = pickle.load(f)
+    embeddings = _unit_rows(saved['embeddings'])
+    # Same fallback as RoadSafetyEmbeddingPipeline.load_database for indexes saved without one
+    stat = os.stat(args.index)
+    generation = saved.get('generation') or f"{stat.st_size:x}-{stat.st_mtime_ns:x}"
+    start, stop = shard_bounds(len(embeddings), args.num_shards)[args.shard]
+    server = ShardServer(LocalShard(embeddings[start:stop], offset=start), address=(args.host, args.port),
+                         authkey=authkey, generation=generation)
+    print(f"Serving rows {start}-{stop} of {len(embeddings)} (generation {generation}) on {args.host}:{args.port}")
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
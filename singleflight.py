@@ -0,0 +1,124 @@
+import threading
+
+from metrics import REGISTRY
+
+COALESCED = REGISTRY.counter(
+    'road_safety_coalesced_requests_total', 'Requests served by joining an identical in-flight computation',
+    labels=('kind',))
+
+
+class Flight:
+    """One in-flight computation; followers can wait on its result or replay its token stream"""
+
+    def __init__(self):
+        self.tokens = []
+        self.done = False
+        self.abandoned = False
+        self.result = None
+        self.error = None
+        self._cond = threading.Condition()
+
+    def publish(self, token):
+        with self._cond:
+            self.tokens.append(token)
+            self._cond.notify_all()
+
+    def finish(self, result=None, error=None, abandoned=False):
+        with self._cond:
+            self.result = result
+            self.error = error
+            self.abandoned = abandoned
+            self.done = True
+            self._cond.notify_all()
+
+    def stream(self):
+        """Yield every token published so far, then new ones until the flight ends"""
+        index = 0
+        while True:
+            with self._cond:
+                while index >= len(self.tokens) and not self.done:
+                    self._cond.wait()
+                pending = self.tokens[index:]
+                index = len(self.tokens)
+                finished = self.done
+            yield from pending
+            if finished and index >= len(self.tokens):
+                return
+
+    def wait(self):
+        with self._cond:
+            while not self.done:
+                self._cond.wait()
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+class SingleFlight:
+    """Runs at most one computation per key; concurrent callers with the same key share it"""
+
+    def __init__(self, kind='recommendation'):
+        self.kind = kind
+        self._flights = {}
+        self._lock = threading.Lock()
+
+    def in_flight(self):
+        with self._lock:
+            return len(self._flights)
+
+    def do(self, key, fn, on_token=None):
+        """Run fn(publish) once per key; returns (result, shared).
+
+        `publish` forwards streamed tokens to every caller's `on_token`.
+        Followers get shared=True and the leader's result object. Only an
+        Exception is shared with followers. If the leader dies of another
+        BaseException (Streamlit's RerunException/StopException,
+        KeyboardInterrupt), that belongs to the leader's own session, so
+        followers retry instead and one of them becomes the new leader.
+        """
+        delivered = 0
+        while True:
+            with self._lock:
+                flight = self._flights.get(key)
+                leader = flight is None
+                if leader:
+                    flight = self._flights[key] = Flight()
+            if leader:
+                break
+            if on_token:
+                # After a retry, skip what the abandoned flight already streamed to this caller
+                for index, token in enumerate(flight.stream()):
+                    if index >= delivered:
+                        on_token(token)
+                        delivered += 1
+            result = flight.wait()
+            if not flight.abandoned:
+                COALESCED.inc(kind=self.kind)
+                return result, True
+
+        published = 0
+
+        def publish(token):
+            nonlocal published
+            flight.publish(token)
+            published += 1
+            if on_token and published > delivered:
+                on_token(token)
+
+        try:
+            result = fn(publish)
+        except Exception as e:
+            self._land(key, flight, error=e)
+            raise
+        except BaseException:
+            self._land(key, flight, abandoned=True)
+            raise
+        self._land(key, flight, result=result)
+        return result, False
+
+    def _land(self, key, flight, **outcome):
+        # Leave the table before waking followers, so a retrying one can't rejoin this flight
+        with self._lock:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+        flight.finish(**outcome)
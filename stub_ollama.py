@@ -0,0 +1,206 @@
+"""Local stand-in for the Ollama HTTP API, for benchmarks and offline runs.
+
+Serves /api/generate and /api/chat (streaming NDJSON or a single JSON body),
+plus /api/tags and /api/version. Timing is simulated: a fixed latency, a
+prefill cost per prompt token, then tokens emitted at a fixed rate. `parallel`
+caps concurrent generations the same way OLLAMA_NUM_PARALLEL does. With
+`prefix_cache` on, each slot remembers its last prompt and only the tokens
+after the longest shared prefix are charged prefill time, like Ollama's KV cache.
+
+    python stub_ollama.py --port 11434 --token-rate 20 --latency 0.2
+"""
+import argparse
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+FILLER_WORDS = (
+    "Install the sign as per the IRC clause on the left side of the approach "
+    "with the specified height border and font size for the approach speed"
+).split()
+
+
+def estimate_tokens(text):
+    # Roughly four characters per token for English text
+    return max(1, len(text) // 4)
+
+
+class StubOllamaConfig:
+    def __init__(self, token_rate=20.0, latency=0.05, prefill_rate=500.0, response_tokens=64, parallel=1,
+                 prefix_cache=False):
+        self.token_rate = token_rate
+        self.latency = latency
+        self.prefill_rate = prefill_rate
+        self.response_tokens = response_tokens
+        self.parallel = parallel
+        self.prefix_cache = prefix_cache
+
+
+class StubOllamaHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, payload, status=200):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == '/api/version':
+            self._send_json({'version': 'stub'})
+        elif self.path == '/api/tags':
+            self._send_json({'models': [{'name': 'stub', 'model': 'stub'}]})
+        else:
+            self._send_json({'error': 'not found'}, status=404)
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        try:
+            request = json.loads(self.rfile.read(length) or b'{}')
+        except ValueError:
+            self._send_json({'error': 'invalid JSON'}, status=400)
+            return
+        if self.path == '/api/generate':
+            prompt = request.get('system', '') + request.get('prompt', '')
+            self._generate(request, prompt, chat=False)
+        elif self.path == '/api/chat':
+            prompt = ''.join(f"<{m.get('role', 'user')}>{m.get('content', '')}" for m in request.get('messages', []))
+            self._generate(request, prompt, chat=True)
+        else:
+            self._send_json({'error': 'not found'}, status=404)
+
+    def _prefill_seconds(self, prompt):
+        config = self.server.config
+        uncached = prompt
+        if config.prefix_cache:
+            with self.server.cache_lock:
+                slots = self.server.cached_prompts
+                best_slot, best_shared = 0, 0
+                for i, cached in enumerate(slots):
+                    shared = len(os.path.commonprefix([cached, prompt]))
+                    if shared > best_shared:
+                        best_slot, best_shared = i, shared
+                uncached = prompt[best_shared:]
+                if best_shared:
+                    slots.pop(best_slot)
+                elif len(slots) >= config.parallel:
+                    # Evict the least recently used slot
+                    slots.pop(0)
+                slots.append(prompt)
+        return estimate_tokens(uncached) / config.prefill_rate
+
+    def _generate(self, request, prompt, chat):
+        config = self.server.config
+        model = request.get('model', 'stub')
+        stream = request.get('stream', True)
+        num_predict = (request.get('options') or {}).get('num_predict') or config.response_tokens
+        prompt_tokens = estimate_tokens(prompt)
+
+        with self.server.slots:
+            started = time.perf_counter()
+            prefill_s = self._prefill_seconds(prompt)
+            time.sleep(config.latency + prefill_s)
+            if stream:
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/x-ndjson')
+                self.send_header('Transfer-Encoding', 'chunked')
+                self.end_headers()
+            tokens = []
+            for i in range(num_predict):
+                if config.token_rate > 0:
+                    time.sleep(1.0 / config.token_rate)
+                token = FILLER_WORDS[i % len(FILLER_WORDS)] + ' '
+                tokens.append(token)
+                if stream:
+                    self._write_chunk(self._message(model, token, chat, done=False))
+            final = self._message(model, '' if stream else ''.join(tokens), chat, done=True)
+            final.update({
+                'total_duration': int((time.perf_counter() - started) * 1e9),
+                'prompt_eval_count': prompt_tokens,
+                'prompt_eval_duration': int(prefill_s * 1e9),
+                'eval_count': num_predict
+            })
+            if stream:
+                self._write_chunk(final)
+                self.wfile.write(b'0\r\n\r\n')
+            else:
+                self._send_json(final)
+
+    def _message(self, model, text, chat, done):
+        payload = {'model': model, 'created_at': time.strftime('%Y-%m-%dT%H:%M:%SZ'), 'done': done}
+        if chat:
+            payload['message'] = {'role': 'assistant', 'content': text}
+        else:
+            payload['response'] = text
+        return payload
+
+    def _write_chunk(self, payload):
+        data = json.dumps(payload).encode('utf-8') + b'\n'
+        self.wfile.write(f"{len(data):x}\r\n".encode('ascii') + data + b'\r\n')
+        self.wfile.flush()
+
+
+class StubOllamaServer:
+    """Runs the stub in a background thread; use .url as OLLAMA_HOST"""
+
+    def __init__(self, host='127.0.0.1', port=0, config=None, handler_class=StubOllamaHandler):
+        self.config = config or StubOllamaConfig()
+        self.httpd = ThreadingHTTPServer((host, port), handler_class)
+        self.httpd.daemon_threads = True
+        self.httpd.config = self.config
+        self.httpd.slots = threading.BoundedSemaphore(self.config.parallel)
+        self.httpd.cache_lock = threading.Lock()
+        self.httpd.cached_prompts = []
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stub Ollama server")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=11434)
+    parser.add_argument('--token-rate', type=float, default=20.0, help="Generated tokens per second")
+    parser.add_argument('--latency', type=float, default=0.05, help="Fixed delay before prefill, in seconds")
+    parser.add_argument('--prefill-rate', type=float, default=500.0, help="Prompt tokens processed per second")
+    parser.add_argument('--response-tokens', type=int, default=64)
+    parser.add_argument('--parallel', type=int, default=1, help="Concurrent generations allowed")
+    parser.add_argument('--prefix-cache', action='store_true', help="Simulate KV reuse for shared prompt prefixes")
+    args = parser.parse_args()
+    config = StubOllamaConfig(args.token_rate, args.latency, args.prefill_rate, args.response_tokens, args.parallel,
+                              prefix_cache=args.prefix_cache)
+    server = StubOllamaServer(args.host, args.port, config)
+    print(f"Stub Ollama listening on {server.url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+"""Test that the LLM admission queue never keeps a waiter whose caller went away"""
+import sys
+import threading
+import time
+
+from admission import AdmissionController, AdmissionRejected
+
+# Fix Windows encoding
+if sys.platform == 'win32':
+    sys.stdout.reconfigure(encoding='utf-8')
+
+
+class CallerGone(BaseException):
+    """Stands in for Streamlit's StopException/RerunException or KeyboardInterrupt"""
+
+
+def hold_slot(controller, release):
+    with controller.acquire():
+        release.wait()
+
+
+def test_raising_position_callback_leaves_queue():
+    controller = AdmissionController(max_concurrency=1, queue_timeout=5)
+    release = threading.Event()
+    holder = threading.Thread(target=hold_slot, args=(controller, release))
+    holder.start()
+    while controller.stats()['active'] == 0:
+        time.sleep(0.01)
+
+    def on_position(position):
+        raise CallerGone()
+
+    try:
+        with controller.acquire(on_position=on_position):
+            pass
+        raise AssertionError("acquire should have propagated the callback's exception")
+    except CallerGone:
+        pass
+    assert controller.stats()['queued'] == 0, controller.stats()
+
+    release.set()
+    holder.join()
+    # With the dead waiter gone, a fresh request is admitted at once
+    start = time.perf_counter()
+    with controller.acquire(timeout=1) as waited_s:
+        assert waited_s == 0.0
+    assert time.perf_counter() - start < 0.5
+    assert controller.stats()['active'] == 0
+
+
+def test_rejected_waiter_leaves_queue():
+    controller = AdmissionController(max_concurrency=1, queue_timeout=0.2)
+    release = threading.Event()
+    holder = threading.Thread(target=hold_slot, args=(controller, release))
+    holder.start()
+    while controller.stats()['active'] == 0:
+        time.sleep(0.01)
+    try:
+        with controller.acquire():
+            pass
+        raise AssertionError("acquire should have been rejected")
+    except AdmissionRejected as e:
+        assert e.reason == 'deadline'
+    assert controller.stats()['queued'] == 0
+    release.set()
+    holder.join()
+
+
+if __name__ == '__main__':
+    print("=" * 60)
+    print("Testing LLM Admission Control")
+    print("=" * 60)
+    for name, test in [(n, t) for n, t in list(globals().items()) if n.startswith('test_')]:
+        test()
+        print(f"   [OK] {name}")
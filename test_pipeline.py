@@ -42,8 +42,7 @@ for query in test_queries:
 
 # Test full RAG system
 print("\n4. Testing full RAG system with Ollama...")
-rag = RoadSafetyRAG()
-rag.pipeline = pipeline
+rag = RoadSafetyRAG(pipeline=pipeline)
 
 test_query = "How to fix a damaged STOP sign?"
 print(f"\n   Query: '{test_query}'")
@@ -0,0 +1,80 @@
+"""Test that coalesced requests never receive another session's control-flow exception"""
+import sys
+import threading
+import time
+
+from singleflight import SingleFlight
+
+# Fix Windows encoding
+if sys.platform == 'win32':
+    sys.stdout.reconfigure(encoding='utf-8')
+
+
+class RerunRequested(BaseException):
+    """Stands in for Streamlit's RerunException/StopException raised in the leader's session"""
+
+
+def start_leader(flights, key, fn):
+    outcome = {}
+
+    def run():
+        try:
+            outcome['result'] = flights.do(key, fn)
+        except BaseException as e:
+            outcome['error'] = e
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    return thread, outcome
+
+
+def test_follower_retries_when_leader_is_interrupted():
+    flights = SingleFlight(kind='test')
+    streaming = threading.Event()
+
+    def interrupted(publish):
+        publish('first ')
+        streaming.set()
+        time.sleep(0.2)
+        raise RerunRequested()
+
+    leader, outcome = start_leader(flights, 'q', interrupted)
+    streaming.wait()
+    tokens = []
+    result, shared = flights.do('q', lambda publish: (publish('first '), publish('second'), 'answer')[-1],
+                                on_token=tokens.append)
+    leader.join()
+    assert isinstance(outcome['error'], RerunRequested)
+    # The follower re-ran the work itself and saw each token once
+    assert (result, shared) == ('answer', False)
+    assert tokens == ['first ', 'second'], tokens
+    assert flights.in_flight() == 0
+
+
+def test_follower_shares_leader_error():
+    flights = SingleFlight(kind='test')
+    running = threading.Event()
+
+    def failing(publish):
+        running.set()
+        time.sleep(0.2)
+        raise ValueError('backend down')
+
+    leader, outcome = start_leader(flights, 'q', failing)
+    running.wait()
+    try:
+        flights.do('q', lambda publish: 'unused')
+        raise AssertionError("the follower should have received the leader's error")
+    except ValueError as e:
+        assert str(e) == 'backend down'
+    leader.join()
+    assert isinstance(outcome['error'], ValueError)
+
+
+if __name__ == '__main__':
+    print("=" * 60)
+    print("Testing Request Coalescing")
+    print("=" * 60)
+    for name, test in [(n, t) for n, t in list(globals().items()) if n.startswith('test_')]:
+        test()
+        print(f"   [OK] {name}")
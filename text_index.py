@@ -0,0 +1,123 @@
+import sqlite3
+import threading
+from collections import defaultdict
+
+
+def _problem_text(record):
+    problem = record.get('problem', '')
+    return ', '.join(problem) if isinstance(problem, list) else problem or ''
+
+
+# Searchable field -> how to read it from a record (both data formats)
+TEXT_FIELDS = {
+    'name': lambda r: r.get('type') or r.get('name', ''),
+    'description': lambda r: r.get('data') or r.get('description', ''),
+    'problem': _problem_text,
+    'category': lambda r: r.get('category', '')
+}
+
+
+def _fts5_trigram_available():
+    try:
+        conn = sqlite3.connect(':memory:')
+        conn.execute("CREATE VIRTUAL TABLE probe USING fts5(body, tokenize='trigram')")
+        conn.close()
+        return True
+    except sqlite3.Error:
+        return False
+
+
+class TextIndex:
+    """Case-insensitive substring search over record text fields, built once at ingest.
+
+    Uses an in-memory SQLite FTS5 table with the trigram tokenizer when the
+    SQLite build has it (3.34+), otherwise a Python trigram posting index.
+    Both return row numbers in corpus order, matching a plain
+    `term in field.lower()` filter, so paging is stable; `after` is a
+    keyset cursor (the last row of the previous page). `add` appends rows
+    in place. Callers pass `max_row` so a reader holding an older, shorter
+    generation never sees rows it doesn't have.
+    """
+
+    def __init__(self, records=None, backend=None):
+        if backend is None:
+            backend = 'fts5' if _fts5_trigram_available() else 'python'
+        self.backend = backend
+        self.size = 0
+        self._lock = threading.Lock()
+        if backend == 'fts5':
+            self._conn = sqlite3.connect(':memory:', check_same_thread=False)
+            columns = ', '.join(TEXT_FIELDS)
+            self._conn.execute(f"CREATE VIRTUAL TABLE records USING fts5({columns}, tokenize='trigram')")
+        else:
+            self._texts = {field: [] for field in TEXT_FIELDS}
+            self._postings = {field: defaultdict(list) for field in TEXT_FIELDS}
+        if records:
+            self.add(records)
+
+    def add(self, records):
+        with self._lock:
+            if self.backend == 'fts5':
+                placeholders = ', '.join('?' * (len(TEXT_FIELDS) + 1))
+                rows = [(self.size + i, *(read(r) for read in TEXT_FIELDS.values())) for i, r in enumerate(records)]
+                self._conn.executemany(f"INSERT INTO records (rowid, {', '.join(TEXT_FIELDS)}) VALUES ({placeholders})", rows)
+                self._conn.commit()
+            else:
+                for i, record in enumerate(records):
+                    row = self.size + i
+                    for field, read in TEXT_FIELDS.items():
+                        text = read(record).lower()
+                        self._texts[field].append(text)
+                        for gram in {text[j:j + 3] for j in range(len(text) - 2)}:
+                            self._postings[field][gram].append(row)
+            self.size += len(records)
+
+    def search(self, term, fields=None, limit=20, offset=0, max_row=None, after=None):
+        """Return (rows, total_count) for records whose `fields` contain `term`.
+
+        total_count covers every match, not just those after the cursor.
+        """
+        fields = [f for f in (fields or TEXT_FIELDS) if f in TEXT_FIELDS]
+        max_row = self.size if max_row is None else min(max_row, self.size)
+        start = 0 if after is None else after + 1
+        term = (term or '').strip().lower()
+        if not term:
+            return list(range(start + offset, min(start + offset + limit, max_row))), max_row
+        if not fields:
+            return [], 0
+        with self._lock:
+            if self.backend == 'fts5':
+                return self._search_fts5(term, fields, limit, offset, max_row, start)
+            return self._search_python(term, fields, limit, offset, max_row, start)
+
+    def _search_fts5(self, term, fields, limit, offset, max_row, start=0):
+        if len(term) >= 3:
+            # A quoted phrase with the trigram tokenizer is a substring match
+            quoted = '"' + term.replace('"', '""') + '"'
+            where = "records MATCH ?"
+            params = [f"{{{' '.join(fields)}}} : {quoted}"]
+        else:
+            # Too short for trigrams; LIKE still runs inside SQLite
+            escaped = term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+            where = '(' + ' OR '.join(f"{f} LIKE ? ESCAPE '\\'" for f in fields) + ')'
+            params = [f"%{escaped}%"] * len(fields)
+        where += " AND rowid < ?"
+        params.append(max_row)
+        total = self._conn.execute(f"SELECT count(*) FROM records WHERE {where}", params).fetchone()[0]
+        rows = self._conn.execute(f"SELECT rowid FROM records WHERE {where} AND rowid >= ? ORDER BY rowid LIMIT ? OFFSET ?",
+                                  params + [start, limit, offset]).fetchall()
+        return [row for (row,) in rows], total
+
+    def _search_python(self, term, fields, limit, offset, max_row, start=0):
+        matches = set()
+        for field in fields:
+            texts = self._texts[field]
+            if len(term) < 3:
+                candidates = range(max_row)
+            else:
+                postings = sorted((self._postings[field].get(term[j:j + 3], []) for j in range(len(term) - 2)), key=len)
+                candidates = set(postings[0]).intersection(*postings[1:]) if postings[0] else ()
+            matches.update(row for row in candidates if row < max_row and term in texts[row])
+        ordered = sorted(matches)
+        page = [row for row in ordered if row >= start] if start else ordered
+        return page[offset:offset + limit], len(ordered)
@@ -0,0 +1,90 @@
+"""Warm-up job: precompute recommendations for frequent queries against the current index.
+
+Takes the web interface's quick examples, a file of queries (one per line)
+and/or the most asked queries mined from the query log (QUERY_LOG_PATH). It
+stores the answers in the precomputed answer store (PRECOMPUTED_ANSWERS_PATH),
+and the app serves them instantly until the index changes; it then refreshes
+them in the background.
+
+    python warm_answers.py
+    python warm_answers.py --from-log --top 100 --collection agency-a
+    python warm_answers.py --queries-file faq.txt --no-examples --top-k 5
+"""
+import argparse
+import sys
+import time
+
+from answer_store import QUICK_EXAMPLES
+from collection_manager import DEFAULT_COLLECTION, CollectionManager
+from ollama_integration import RoadSafetyRAG
+
+# Fix Windows encoding
+if sys.platform == 'win32':
+    sys.stdout.reconfigure(encoding='utf-8')
+
+
+def collect_queries(rag, pipeline, args):
+    """Frequent queries to warm, one spelling per normalized key, in priority order"""
+    candidates = [] if args.no_examples else list(QUICK_EXAMPLES)
+    if args.queries_file:
+        with open(args.queries_file, 'r', encoding='utf-8') as f:
+            candidates.extend(line.strip() for line in f)
+    if args.from_log:
+        mined = rag.query_log.top_queries(pipeline.query_key, limit=args.top, collection=args.collection)
+        if not mined:
+            print("⚠️ No queries found in the query log (set QUERY_LOG_PATH)")
+        candidates.extend(query for query, _ in mined)
+
+    queries = []
+    seen = set()
+    for query in candidates:
+        key = pipeline.query_key(query) if query else None
+        if key and key not in seen:
+            seen.add(key)
+            queries.append(query)
+    return queries
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--collection', default=DEFAULT_COLLECTION)
+    parser.add_argument('--queries-file', help="Extra queries, one per line")
+    parser.add_argument('--from-log', action='store_true', help="Add the most asked queries from QUERY_LOG_PATH")
+    parser.add_argument('--top', type=int, default=100, help="How many logged queries to take")
+    parser.add_argument('--no-examples', action='store_true', help="Skip the web interface's quick examples")
+    parser.add_argument('--top-k', type=int, default=3, help="Must match the app's 'Results to Retrieve' setting")
+    parser.add_argument('--fast-path', choices=['on', 'off'], help="Default: RAG_FAST_PATH")
+    parser.add_argument('--llm-followup', action='store_true')
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("Precomputed Answer Warm-up")
+    print("=" * 60)
+
+    rag = RoadSafetyRAG(collections=CollectionManager())
+    pipeline = rag.pipeline_for(None if args.collection == DEFAULT_COLLECTION else args.collection)
+    if not pipeline.data:
+        print(f"❌ Collection '{args.collection}' is empty; index some interventions first")
+        sys.exit(1)
+    # Precomputing must never be answered from the store it is filling
+    rag.precomputed_enabled = False
+
+    queries = collect_queries(rag, pipeline, args)
+    print(f"Collection: {args.collection} ({len(pipeline.data)} interventions, generation {pipeline.index_generation})")
+    print(f"Model: {rag.backend.model}, {len(queries)} queries to warm\n")
+
+    fast_path = None if args.fast_path is None else args.fast_path == 'on'
+    stored = 0
+    start = time.perf_counter()
+    for i, query in enumerate(queries, 1):
+        began = time.perf_counter()
+        stored += rag.precompute([query], collection=args.collection, top_k=args.top_k, fast_path=fast_path,
+                                 llm_followup=args.llm_followup)
+        print(f"   [{i}/{len(queries)}] {query} ({time.perf_counter() - began:.1f}s)")
+
+    print(f"\n✅ Stored {stored}/{len(queries)} answers in {rag.answers.path} "
+          f"({time.perf_counter() - start:.1f}s)")
+
+
+if __name__ == '__main__':
+    main()
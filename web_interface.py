@@ -1,5 +1,11 @@
 import streamlit as st
 from ollama_integration import RoadSafetyRAG
+from admission import AdmissionRejected
+from llm_backends import BackendError
+from answer_store import QUICK_EXAMPLES
+from index_worker import IndexingWorker
+from collection_manager import DEFAULT_COLLECTION, CollectionManager
+from metrics import start_metrics_server
 import json
 import os
 import time
@@ -566,7 +572,8 @@ st.markdown("""
 # ============================================================================
 @st.cache_resource
 def load_rag_system():
-    rag = RoadSafetyRAG()
+    # One process-wide set of collections sharing one encoder; the default one is the legacy index
+    rag = RoadSafetyRAG(collections=CollectionManager())
     script_dir = os.path.dirname(os.path.abspath(__file__))
     interventions_file_path = os.path.join(script_dir, "interventions.json")
     if os.path.exists(interventions_file_path) and not rag.pipeline.data:
@@ -581,6 +588,68 @@ def load_rag_system():
 
 rag_system = load_rag_system()
 
+@st.cache_resource
+def load_indexing_worker(_rag):
+    return IndexingWorker(_rag.pipeline)
+
+indexing_worker = load_indexing_worker(rag_system)
+
+# Per-session results keyed by request, newest first in `history`
+MAX_HISTORY = 20
+st.session_state.setdefault('results', {})
+st.session_state.setdefault('history', [])
+st.session_state.setdefault('active_request', None)
+st.session_state.setdefault('inflight_request', None)
+# (key, entry) of an answer whose run was interrupted before it could be shown
+st.session_state.setdefault('pending_result', None)
+st.session_state.setdefault('collection', DEFAULT_COLLECTION)
+
+def active_pipeline():
+    """The pipeline of the collection this session has selected"""
+    try:
+        return rag_system.pipeline_for(st.session_state['collection'])
+    except KeyError:
+        st.session_state['collection'] = DEFAULT_COLLECTION
+        return rag_system.pipeline
+
+@st.cache_resource
+def load_metrics_exporter():
+    # Prometheus scrape endpoint, only when METRICS_PORT is set
+    port = os.getenv('METRICS_PORT')
+    if not port:
+        return None
+    try:
+        return start_metrics_server(int(port))
+    except OSError as e:
+        print(f"⚠️ Could not start metrics exporter: {str(e)}")
+        return None
+
+load_metrics_exporter()
+
+@st.fragment(run_every=1)
+def render_indexing_status():
+    job_id = st.session_state.get('indexing_job_id')
+    job = indexing_worker.get_job(job_id) if job_id else None
+    if job is None:
+        return
+    if job.status == 'queued':
+        st.info(f"⏳ Queued: {job.label}")
+    elif job.status == 'running':
+        st.progress(job.progress, text=f"🔄 Indexing {job.label}: {job.processed}/{job.total}")
+    elif job.status == 'done':
+        st.success(f"✅ Loaded {job.total} interventions")
+    else:
+        st.error(f"Error: {job.error}")
+    # Rerun the full app once so the status panel picks up the new index
+    if job.finished and st.session_state.get('indexing_job_seen') != job.job_id:
+        st.session_state['indexing_job_seen'] = job.job_id
+        # The finished collection may have pushed the loaded set over the memory budget
+        rag_system.collections.enforce_budget()
+        # Answers precomputed against the old index are recomputed in the background
+        if job.status == 'done':
+            rag_system.refresh_precomputed(st.session_state.get('indexing_job_collection'))
+        st.rerun()
+
 # ============================================================================
 # SIDEBAR - ENTERPRISE DESIGN
 # ============================================================================
@@ -592,20 +661,18 @@ with st.sidebar:
         </h2>
     """, unsafe_allow_html=True)
     
-    if rag_system.pipeline.data and len(rag_system.pipeline.data) > 0:
+    st.selectbox("Collection", rag_system.collections.names(), key="collection",
+                 help="Each collection is a separate intervention index, e.g. per agency or manual edition")
+    corpus_stats = active_pipeline().stats()
+    if corpus_stats['total'] > 0:
         st.markdown(f"""
         <div class="status-indicator status-success">
-            ✅ <strong>{len(rag_system.pipeline.data)}</strong> Interventions Loaded
+            ✅ <strong>{corpus_stats['total']}</strong> Interventions Loaded
         </div>
         """, unsafe_allow_html=True)
         
-        categories = set()
-        problems = set()
-        for intervention in rag_system.pipeline.data:
-            if intervention.get('category'):
-                categories.add(intervention.get('category'))
-            if intervention.get('problem'):
-                problems.add(intervention.get('problem'))
+        categories = corpus_stats['categories']
+        problems = corpus_stats['problems']
         
         st.markdown(f"""
         <div style="margin-top: 1rem;">
@@ -633,15 +700,25 @@ with st.sidebar:
         </h3>
     """, unsafe_allow_html=True)
     
+    target_collection = st.text_input("Target Collection", value=st.session_state['collection'],
+                                      help="Uploads replace this collection; a new name creates it")
     uploaded_file = st.file_uploader("Upload Interventions JSON", type=['json'], label_visibility="collapsed")
     if uploaded_file:
-        try:
-            interventions_data = json.load(uploaded_file)
-            if rag_system.pipeline.add_interventions_to_db(interventions_data):
-                st.success(f"✅ Loaded {len(interventions_data)} interventions")
-                st.rerun()
-        except Exception as e:
-            st.error(f"Error: {str(e)}")
+        # The uploader keeps its file across reruns, so only queue each upload once
+        upload_key = f"{target_collection}:{uploaded_file.name}:{uploaded_file.size}"
+        if st.session_state.get('indexing_upload_key') != upload_key:
+            try:
+                interventions_data = json.load(uploaded_file)
+                target = rag_system.collections.create(target_collection.strip())
+                job = indexing_worker.submit(interventions_data, label=f"{uploaded_file.name} → {target_collection}",
+                                             pipeline=target)
+                st.session_state['indexing_upload_key'] = upload_key
+                st.session_state['indexing_job_id'] = job.job_id
+                st.session_state['indexing_job_collection'] = target_collection.strip()
+            except Exception as e:
+                st.error(f"Error: {str(e)}")
+    
+    render_indexing_status()
     
     st.markdown("</div>", unsafe_allow_html=True)
     
@@ -656,6 +733,8 @@ with st.sidebar:
     ollama_model = st.text_input("Ollama Model", value=rag_system.ollama_model, help="Local Ollama model name")
     if ollama_model != rag_system.ollama_model:
         rag_system.ollama_model = ollama_model
+    fast_path = st.toggle("⚡ Instant Answers", value=rag_system.fast_path_enabled, help="Answer directly from the best-matching intervention when it clearly fits, skipping the LLM")
+    detailed_followup = st.checkbox("Add detailed AI explanation", value=False, disabled=not fast_path, help="After an instant answer, also generate the full LLM explanation")
     
     st.markdown("</div>", unsafe_allow_html=True)
 
@@ -693,11 +772,8 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 col1, col2, col3 = st.columns(3)
-examples = [
-    "How to fix a damaged STOP sign?",
-    "What are speed hump requirements?",
-    "Missing road markings on highway"
-]
+# warm_answers.py precomputes these, so the chips answer instantly
+examples = QUICK_EXAMPLES
 
 for i, example in enumerate(examples):
     with [col1, col2, col3][i]:
@@ -707,195 +783,317 @@ for i, example in enumerate(examples):
 
 st.markdown("</div>", unsafe_allow_html=True)
 
-# Action Button
-st.markdown("<br>", unsafe_allow_html=True)
-if st.button("🚀 Generate AI Recommendation", type="primary", use_container_width=True):
-    if user_query:
-        start_time = time.time()
-        
-        with st.spinner("🔍 Processing: Semantic Search → Context Building → AI Generation..."):
-            try:
-                result = rag_system.get_recommendations(user_query, top_k=top_k)
-                elapsed_time = time.time() - start_time
-                
-                # ========================================================================
-                # RAG OUTPUT BOX - ENTERPRISE DESIGN
-                # ========================================================================
-                st.markdown("""
-                <div class="rag-output-container">
-                    <div class="rag-output-header">
-                        <div>
-                            <div class="rag-badge-modern">🤖 RAG-Generated Output</div>
-                            <h2 class="rag-title-modern" style="margin-top: 0.75rem; margin-bottom: 0;">
-                                ✨ AI-Powered Recommendation
-                            </h2>
-                        </div>
+# Source cards render in their own fragment, so opening one reruns only this
+# block and the heavy detail markup is built only for the cards that are open
+@st.fragment
+def render_source_interventions(interventions):
+    for idx, intervention in enumerate(interventions):
+        name = intervention.get('name', 'N/A')
+        category = intervention.get('category', 'N/A')
+        score = intervention.get('similarity_score', 0)
+
+        st.markdown(f"""
+        <div class="intervention-card-modern">
+            <div class="intervention-header">
+                <div>
+                    <div class="intervention-title">
+                        {idx+1}. {name}
                     </div>
-                    <div class="rag-content-box">
-                        <div class="rag-content-inner">
+                </div>
+                <div class="intervention-meta">
+                    <span class="meta-badge">📂 {category}</span>
+                    <span class="meta-badge highlight">⭐ {score:.3f}</span>
+                </div>
+            </div>
+            <div class="intervention-body">
+        """, unsafe_allow_html=True)
+
+        key = f"{idx}_{intervention.get('S. No.', '')}"
+        if st.toggle("Show details", value=idx == 0, key=f"src_detail_{key}"):
+            col_a, col_b = st.columns(2)
+
+            with col_a:
+                st.markdown("""
+                <div class="detail-section">
+                    <div class="detail-label">📝 Description</div>
+                    <div class="detail-content">
                 """, unsafe_allow_html=True)
-                
-                # Display AI recommendation
-                if result.get('recommendation'):
-                    st.markdown(result['recommendation'])
-                else:
-                    st.markdown("No recommendation generated. Please check your query and try again.")
-                
+                description = intervention.get('description') or intervention.get('data', 'N/A')
+                st.write(description)
+                st.markdown("</div></div>", unsafe_allow_html=True)
+
                 st.markdown("""
-                        </div>
-                    </div>
-                </div>
+                <div class="detail-section">
+                    <div class="detail-label">🎯 Problem Type</div>
+                    <div class="detail-content">
                 """, unsafe_allow_html=True)
-                
-                # ========================================================================
-                # METRICS STRIP - MODERN DESIGN
-                # ========================================================================
+                problems = intervention.get('problem_type', [])
+                if not problems and intervention.get('problem'):
+                    problems = [intervention.get('problem')]
+                st.write(", ".join(problems) if problems else "N/A")
+                st.markdown("</div></div>", unsafe_allow_html=True)
+
+            with col_b:
                 st.markdown("""
-                <div class="metrics-strip">
+                <div class="detail-section">
+                    <div class="detail-label">📊 Technical Details</div>
+                    <div class="detail-content">
                 """, unsafe_allow_html=True)
-                
-                col1, col2, col3, col4 = st.columns(4)
-                
-                with col1:
-                    st.markdown(f"""
-                    <div class="metric-card-modern">
-                        <div class="metric-label">Interventions Found</div>
-                        <div class="metric-value">{len(result['retrieved_interventions'])}</div>
-                    </div>
-                    """, unsafe_allow_html=True)
-                
-                with col2:
-                    st.markdown(f"""
-                    <div class="metric-card-modern">
-                        <div class="metric-label">Processing Time</div>
-                        <div class="metric-value">{elapsed_time:.2f}s</div>
-                    </div>
-                    """, unsafe_allow_html=True)
-                
-                with col3:
-                    if result['retrieved_interventions']:
-                        avg_score = sum(i.get('similarity_score', 0) for i in result['retrieved_interventions']) / len(result['retrieved_interventions'])
-                        st.markdown(f"""
-                        <div class="metric-card-modern">
-                            <div class="metric-label">Avg Relevance</div>
-                            <div class="metric-value">{avg_score:.3f}</div>
-                        </div>
-                        """, unsafe_allow_html=True)
+
+                details_html = "<div style='display: flex; flex-direction: column; gap: 0.5rem;'>"
+                if intervention.get('code'):
+                    details_html += f"<div><strong>Code:</strong> {intervention.get('code')}</div>"
+                if intervention.get('clause'):
+                    details_html += f"<div><strong>Clause:</strong> {intervention.get('clause')}</div>"
+                if intervention.get('S. No.'):
+                    details_html += f"<div><strong>S. No.:</strong> {intervention.get('S. No.')}</div>"
+                details_html += f"<div><strong>Relevance:</strong> {score:.4f}</div>"
+                details_html += "</div>"
+
+                st.markdown(details_html, unsafe_allow_html=True)
+                st.markdown("</div></div>", unsafe_allow_html=True)
+
+                if intervention.get('content') and st.toggle("📄 View Full Content", key=f"src_content_{key}"):
+                    st.write(intervention.get('content'))
+
+        st.markdown("</div></div>", unsafe_allow_html=True)
+
+def request_key(query):
+    """Identifies a result: same question and settings against the same index generation"""
+    # Same normalized key and persistent generation the RAG system coalesces and precomputes on
+    pipeline = active_pipeline()
+    return json.dumps([pipeline.query_key(query), top_k, fast_path, fast_path and detailed_followup,
+                       rag_system.ollama_model, st.session_state['collection'], pipeline.index_generation])
+
+def remember_result(key, entry):
+    """Store a finished result and move it to the front of this session's history"""
+    history = [k for k in st.session_state['history'] if k != key]
+    history.insert(0, key)
+    # Drop results that fell off the end of the history
+    for stale in history[MAX_HISTORY:]:
+        st.session_state['results'].pop(stale, None)
+    st.session_state['history'] = history[:MAX_HISTORY]
+    st.session_state['results'][key] = entry
+    st.session_state['active_request'] = key
+
+def render_result(entry):
+    result = entry['result']
+    elapsed_time = entry['elapsed_time']
+    if result.get('answer_source') in ('rejected', 'error'):
+        st.warning(f"⚠️ {result['recommendation']}")
+    
+    # ========================================================================
+    # RAG OUTPUT BOX - ENTERPRISE DESIGN
+    # ========================================================================
+    st.markdown("""
+    <div class="rag-output-container">
+        <div class="rag-output-header">
+            <div>
+                <div class="rag-badge-modern">🤖 RAG-Generated Output</div>
+                <h2 class="rag-title-modern" style="margin-top: 0.75rem; margin-bottom: 0;">
+                    ✨ AI-Powered Recommendation
+                </h2>
+            </div>
+        </div>
+        <div class="rag-content-box">
+            <div class="rag-content-inner">
+    """, unsafe_allow_html=True)
+
+    # Display AI recommendation
+    if result.get('recommendation'):
+        st.markdown(result['recommendation'])
+    else:
+        st.markdown("No recommendation generated. Please check your query and try again.")
+
+    if result.get('precomputed'):
+        st.caption("📌 Precomputed answer for a frequently asked question")
+    if result.get('answer_source') == 'extractive':
+        st.caption("⚡ Instant answer from the best-matching intervention")
+        if result.get('detailed_recommendation'):
+            st.markdown("---")
+            st.markdown(result['detailed_recommendation'])
+        elif entry.get('followup_error') or result.get('followup_error'):
+            st.warning(f"⚠️ Detailed explanation skipped: {entry.get('followup_error') or result['followup_error']}")
+
+    st.markdown("""
+            </div>
+        </div>
+    </div>
+    """, unsafe_allow_html=True)
+
+    # ========================================================================
+    # METRICS STRIP - MODERN DESIGN
+    # ========================================================================
+    st.markdown("""
+    <div class="metrics-strip">
+    """, unsafe_allow_html=True)
+
+    col1, col2, col3, col4 = st.columns(4)
+
+    with col1:
+        st.markdown(f"""
+        <div class="metric-card-modern">
+            <div class="metric-label">Interventions Found</div>
+            <div class="metric-value">{len(result['retrieved_interventions'])}</div>
+        </div>
+        """, unsafe_allow_html=True)
+
+    with col2:
+        st.markdown(f"""
+        <div class="metric-card-modern">
+            <div class="metric-label">Processing Time</div>
+            <div class="metric-value">{elapsed_time:.2f}s</div>
+        </div>
+        """, unsafe_allow_html=True)
+
+    with col3:
+        if result['retrieved_interventions']:
+            avg_score = sum(i.get('similarity_score', 0) for i in result['retrieved_interventions']) / len(result['retrieved_interventions'])
+            st.markdown(f"""
+            <div class="metric-card-modern">
+                <div class="metric-label">Avg Relevance</div>
+                <div class="metric-value">{avg_score:.3f}</div>
+            </div>
+            """, unsafe_allow_html=True)
+        else:
+            st.markdown("""
+            <div class="metric-card-modern">
+                <div class="metric-label">Avg Relevance</div>
+                <div class="metric-value">N/A</div>
+            </div>
+            """, unsafe_allow_html=True)
+
+    with col4:
+        st.markdown("""
+        <div class="metric-card-modern">
+            <div class="metric-label">RAG Status</div>
+            <div class="metric-value" style="font-size: 1.5rem;">✅</div>
+        </div>
+        """, unsafe_allow_html=True)
+
+    st.markdown("</div>", unsafe_allow_html=True)
+
+    if result.get('timings'):
+        with st.expander("⏱️ Stage Timings"):
+            stage_rows = {
+                stage[:-2].replace('_', ' ').title(): f"{value * 1000:.1f} ms"
+                for stage, value in result['timings'].items() if value is not None
+            }
+            usage = result.get('usage', {})
+            if usage.get('prompt_tokens'):
+                stage_rows['Prompt Tokens'] = usage['prompt_tokens']
+            if usage.get('completion_tokens'):
+                stage_rows['Completion Tokens'] = usage['completion_tokens']
+            st.table(stage_rows)
+
+    # ========================================================================
+    # SOURCE INTERVENTIONS - MODERN CARDS
+    # ========================================================================
+    if result['retrieved_interventions']:
+        st.markdown("""
+        <div style="margin-top: 3rem;">
+            <h2 class="section-title" style="margin-bottom: 0.75rem;">
+                📚 Source Interventions
+            </h2>
+            <p class="section-description" style="margin-bottom: 1.5rem;">
+                These interventions from your dataset were retrieved and used to generate the AI recommendation above.
+            </p>
+        </div>
+        """, unsafe_allow_html=True)
+
+        render_source_interventions(result['retrieved_interventions'])
+    else:
+        st.warning("⚠️ No relevant interventions found. Try rephrasing your query.")
+        if result.get('recommendation'):
+            st.info(result['recommendation'])
+
+# Action Button
+st.markdown("<br>", unsafe_allow_html=True)
+if st.button("🚀 Generate AI Recommendation", type="primary", use_container_width=True):
+    if user_query:
+        key = request_key(user_query)
+        cached = st.session_state['results'].get(key)
+        pending = st.session_state['pending_result']
+        if pending and pending[0] != key:
+            # Interrupted under other settings; keep it in the history rather than drop it
+            remember_result(*pending)
+            st.session_state['pending_result'] = None
+        pending = pending[1] if pending and pending[0] == key else None
+        if cached and cached['result'].get('answer_source') not in ('rejected', 'error'):
+            # Already answered in this session: show it again instead of paying for the LLM
+            remember_result(key, cached)
+        else:
+            if pending is None and st.session_state.get('inflight_request') == key:
+                # A press interrupted the run computing this; the RAG layer joins that in-flight call
+                st.info("⏳ This request is already running, waiting for its result...")
+            st.session_state['inflight_request'] = key
+            start_time = time.time()
+            
+            queue_status = st.empty()
+            
+            def show_queue_position(position):
+                queue_status.info(f"⏳ The AI model is busy. Your request is number {position} in the queue...")
+            
+            with st.spinner("🔍 Processing: Semantic Search → Context Building → AI Generation..."):
+                try:
+                    if pending is not None:
+                        # The run that got this answer was interrupted before showing it; don't ask the LLM again
+                        entry = pending
                     else:
-                        st.markdown("""
-                        <div class="metric-card-modern">
-                            <div class="metric-label">Avg Relevance</div>
-                            <div class="metric-value">N/A</div>
-                        </div>
-                        """, unsafe_allow_html=True)
-                
-                with col4:
-                    st.markdown("""
-                    <div class="metric-card-modern">
-                        <div class="metric-label">RAG Status</div>
-                        <div class="metric-value" style="font-size: 1.5rem;">✅</div>
-                    </div>
-                    """, unsafe_allow_html=True)
-                
-                st.markdown("</div>", unsafe_allow_html=True)
-                
-                # ========================================================================
-                # SOURCE INTERVENTIONS - MODERN CARDS
-                # ========================================================================
-                if result['retrieved_interventions']:
-                    st.markdown("""
-                    <div style="margin-top: 3rem;">
-                        <h2 class="section-title" style="margin-bottom: 0.75rem;">
-                            📚 Source Interventions
-                        </h2>
-                        <p class="section-description" style="margin-bottom: 1.5rem;">
-                            These interventions from your dataset were retrieved and used to generate the AI recommendation above.
-                        </p>
-                    </div>
-                    """, unsafe_allow_html=True)
-                    
-                    for idx, intervention in enumerate(result['retrieved_interventions']):
-                        name = intervention.get('name', 'N/A')
-                        category = intervention.get('category', 'N/A')
-                        score = intervention.get('similarity_score', 0)
-                        problem = intervention.get('problem', 'N/A')
-                        
-                        st.markdown(f"""
-                        <div class="intervention-card-modern">
-                            <div class="intervention-header">
-                                <div>
-                                    <div class="intervention-title">
-                                        {idx+1}. {name}
-                                    </div>
-                                </div>
-                                <div class="intervention-meta">
-                                    <span class="meta-badge">📂 {category}</span>
-                                    <span class="meta-badge highlight">⭐ {score:.3f}</span>
-                                </div>
-                            </div>
-                            <div class="intervention-body">
-                        """, unsafe_allow_html=True)
-                        
-                        col_a, col_b = st.columns(2)
-                        
-                        with col_a:
-                            st.markdown("""
-                            <div class="detail-section">
-                                <div class="detail-label">📝 Description</div>
-                                <div class="detail-content">
-                            """, unsafe_allow_html=True)
-                            description = intervention.get('description') or intervention.get('data', 'N/A')
-                            st.write(description)
-                            st.markdown("</div></div>", unsafe_allow_html=True)
-                            
-                            st.markdown("""
-                            <div class="detail-section">
-                                <div class="detail-label">🎯 Problem Type</div>
-                                <div class="detail-content">
-                            """, unsafe_allow_html=True)
-                            problems = intervention.get('problem_type', [])
-                            if not problems and intervention.get('problem'):
-                                problems = [intervention.get('problem')]
-                            st.write(", ".join(problems) if problems else "N/A")
-                            st.markdown("</div></div>", unsafe_allow_html=True)
-                        
-                        with col_b:
-                            st.markdown("""
-                            <div class="detail-section">
-                                <div class="detail-label">📊 Technical Details</div>
-                                <div class="detail-content">
-                            """, unsafe_allow_html=True)
-                            
-                            details_html = "<div style='display: flex; flex-direction: column; gap: 0.5rem;'>"
-                            if intervention.get('code'):
-                                details_html += f"<div><strong>Code:</strong> {intervention.get('code')}</div>"
-                            if intervention.get('clause'):
-                                details_html += f"<div><strong>Clause:</strong> {intervention.get('clause')}</div>"
-                            if intervention.get('S. No.'):
-                                details_html += f"<div><strong>S. No.:</strong> {intervention.get('S. No.')}</div>"
-                            details_html += f"<div><strong>Relevance:</strong> {score:.4f}</div>"
-                            details_html += "</div>"
-                            
-                            st.markdown(details_html, unsafe_allow_html=True)
-                            st.markdown("</div></div>", unsafe_allow_html=True)
-                            
-                            if intervention.get('content'):
-                                with st.expander("📄 View Full Content"):
-                                    st.write(intervention.get('content'))
-                        
-                        st.markdown("</div></div>", unsafe_allow_html=True)
-                else:
-                    st.warning("⚠️ No relevant interventions found. Try rephrasing your query.")
-                    if result.get('recommendation'):
-                        st.info(result['recommendation'])
-                
-            except Exception as e:
-                st.error(f"❌ Error: {str(e)}")
-                with st.expander("🔍 Error Details"):
-                    st.exception(e)
+                        result = rag_system.get_recommendations(user_query, top_k=top_k, fast_path=fast_path,
+                                                                on_queue_position=show_queue_position,
+                                                                collection=st.session_state['collection'])
+                        entry = {'query': user_query, 'result': result, 'elapsed_time': time.time() - start_time,
+                                 'timestamp': datetime.now().strftime('%H:%M:%S')}
+                        # Saved before any st call: another press raises RerunException at the next one
+                        st.session_state['pending_result'] = (key, entry)
+                    result = entry['result']
+                    queue_status.empty()
+                    if (result.get('answer_source') == 'extractive' and detailed_followup
+                            and not result.get('detailed_recommendation') and not entry.get('followup_error')):
+                        try:
+                            with st.spinner("🤖 Generating detailed explanation..."):
+                                rag_system.explain(result, on_queue_position=show_queue_position)
+                        except AdmissionRejected as e:
+                            entry['followup_error'] = f"the AI model is busy ({str(e)})"
+                        except BackendError as e:
+                            entry['followup_error'] = str(e)
+                        queue_status.empty()
+                        entry['elapsed_time'] = time.time() - start_time
+                    remember_result(key, entry)
+                    st.session_state['pending_result'] = None
+                    st.session_state['inflight_request'] = None
+                except Exception as e:
+                    # Not a finally: a RerunException must leave the marker for the rerun to find
+                    st.session_state['inflight_request'] = None
+                    st.error(f"❌ Error: {str(e)}")
+                    with st.expander("🔍 Error Details"):
+                        st.exception(e)
     else:
         st.warning("⚠️ Please enter a query in the text area above")
 
+# An answer whose run another widget interrupted is kept as it is, without its follow-up
+if st.session_state['pending_result'] is not None:
+    remember_result(*st.session_state['pending_result'])
+    st.session_state['pending_result'] = None
+    st.session_state['inflight_request'] = None
+
+# Past queries from this session re-render from session state without recomputing
+if len(st.session_state['history']) > 1:
+    with st.expander(f"🕘 Recent Queries ({len(st.session_state['history'])})"):
+        for i, key in enumerate(st.session_state['history']):
+            entry = st.session_state['results'][key]
+            label = f"{entry['timestamp']} · {entry['query'][:60]}"
+            if st.button(label, key=f"history_{i}", use_container_width=True,
+                         disabled=key == st.session_state['active_request']):
+                remember_result(key, entry)
+                st.rerun()
+
+# The active result survives reruns triggered by any other widget
+active_entry = st.session_state['results'].get(st.session_state['active_request'])
+if active_entry:
+    render_result(active_entry)
+
 # ============================================================================
 # TABS SECTION
 # ============================================================================
@@ -903,7 +1101,9 @@ st.markdown("<div class='divider'></div>", unsafe_allow_html=True)
 
 tab1, tab2 = st.tabs(["📚 Database Explorer", "ℹ️ About & Documentation"])
 
-with tab1:
+@st.fragment
+def render_database_explorer():
+    """Stats, search and paging rerun on their own, without the rest of the page"""
     st.markdown("""
     <div style="margin-bottom: 2rem;">
         <h2 class="section-title">📚 Database Explorer</h2>
@@ -914,15 +1114,17 @@ with tab1:
     </div>
     """, unsafe_allow_html=True)
     
-    if rag_system.pipeline.data and len(rag_system.pipeline.data) > 0:
+    pipeline = active_pipeline()
+    corpus_stats = pipeline.stats()
+    if corpus_stats['total'] > 0:
         # Statistics Cards
         col1, col2 = st.columns(2)
         
         with col1:
-            category_counts = {}
-            for intervention in rag_system.pipeline.data:
-                cat = intervention.get('category', 'Unknown')
-                category_counts[cat] = category_counts.get(cat, 0) + 1
+            category_counts = dict(corpus_stats['categories'])
+            uncategorized = corpus_stats['total'] - sum(category_counts.values())
+            if uncategorized > 0:
+                category_counts['Unknown'] = uncategorized
             
             st.markdown("""
             <div class="metric-card-modern">
@@ -933,11 +1135,7 @@ with tab1:
             st.markdown("</div>", unsafe_allow_html=True)
         
         with col2:
-            problem_counts = {}
-            for intervention in rag_system.pipeline.data:
-                problem = intervention.get('problem', '')
-                if problem:
-                    problem_counts[problem] = problem_counts.get(problem, 0) + 1
+            problem_counts = corpus_stats['problems']
             
             st.markdown("""
             <div class="metric-card-modern">
@@ -951,31 +1149,47 @@ with tab1:
         st.markdown("<div class='divider'></div>", unsafe_allow_html=True)
         search_term = st.text_input("🔍 Search Database", placeholder="Search by name, problem, category, or description...", key="db_search")
         
-        filtered_data = rag_system.pipeline.data
+        page_size = 20
+        # Cursors of the pages before this one; start over whenever the term or the index changes
+        page_key = (search_term, st.session_state['collection'], pipeline.index_version)
+        if st.session_state.get('db_page_key') != page_key:
+            st.session_state['db_page_key'] = page_key
+            st.session_state['db_cursors'] = []
+        cursors = st.session_state['db_cursors']
+        cursor = cursors[-1] if cursors else None
+        found = pipeline.text_search(search_term, limit=page_size, cursor=cursor)
         if search_term:
-            search_lower = search_term.lower()
-            filtered_data = [
-                i for i in rag_system.pipeline.data
-                if (search_lower in (i.get('type') or i.get('name', '')).lower() or
-                    search_lower in (i.get('data') or i.get('description', '')).lower() or
-                    search_lower in (i.get('problem', '')).lower() or
-                    search_lower in (i.get('category', '')).lower())
-            ]
-            st.info(f"Found **{len(filtered_data)}** matching intervention(s)")
+            st.info(f"Found **{found['total_count']}** matching intervention(s)")
         
         # Display Results
-        st.markdown(f"<h3 style='margin-top: 2rem; margin-bottom: 1rem; font-size: 1.1rem; font-weight: 600;'>Showing {len(filtered_data[:20])} of {len(filtered_data)} results</h3>", unsafe_allow_html=True)
+        shown_from = len(cursors) * page_size + 1 if found['rows'] else 0
+        shown_to = len(cursors) * page_size + len(found['rows'])
+        st.markdown(f"<h3 style='margin-top: 2rem; margin-bottom: 1rem; font-size: 1.1rem; font-weight: 600;'>Showing {shown_from}–{shown_to} of {found['total_count']} results</h3>", unsafe_allow_html=True)
         
-        for intervention in filtered_data[:20]:
+        prev_col, next_col = st.columns(2)
+        with prev_col:
+            if st.button("← Previous", disabled=not cursors, key="db_prev"):
+                cursors.pop()
+                st.rerun(scope="fragment")
+        with next_col:
+            if st.button("Next →", disabled=found['next_cursor'] is None, key="db_next"):
+                cursors.append(found['next_cursor'])
+                st.rerun(scope="fragment")
+        
+        for row, intervention in zip(found['rows'], found['interventions']):
             name = intervention.get('type') or intervention.get('name', 'Unknown')
             category = intervention.get('category', 'N/A')
             problem = intervention.get('problem', 'N/A')
             
-            with st.expander(f"**{name}** | {category} | Problem: {problem}"):
-                st.json(intervention)
+            # Only the records someone opens are expanded and serialized
+            if st.toggle(f"**{name}** | {category} | Problem: {problem}", key=f"db_detail_{row}"):
+                st.json(pipeline.get_record(row))
     else:
         st.info("📤 Upload a JSON file to populate the database")
 
+with tab1:
+    render_database_explorer()
+
 with tab2:
     st.markdown("""
     <div style="max-width: 800px;">